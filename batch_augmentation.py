@@ -0,0 +1,173 @@
+"""
+Batch Augmentation untuk Training Segmentasi Karotis
+Augmentasi pada tensor satu batch penuh (B, 1, H, W) di device training, sebagai alternatif
+augmentasi albumentations per sampel di DataLoader worker.
+
+Padanan dengan get_augmentations() di training_model.py (probabilitas per sampel sama):
+    HorizontalFlip, ShiftScaleRotate, ElasticTransform  -> satu affine_grid + displacement
+                                                           field, satu grid_sample per batch
+    GaussianBlur (kernel 3)                             -> conv2d 3x3
+    GaussNoise (var 10-50 pada skala 0-255)             -> randn * std per sampel
+    RandomBrightnessContrast                            -> image * alpha + beta per sampel
+
+Elastic warp memakai displacement field acak resolusi rendah yang di-upsample bicubic
+(field halus tanpa konvolusi Gaussian sigma besar); image di-resample bilinear, mask nearest.
+Semua keputusan acak berupa mask per sampel di device (tanpa sync ke host per batch).
+"""
+
+import math
+
+import torch
+import torch.nn.functional as F
+
+
+class BatchAugmenter:
+    """Augmentasi acak per sampel, dihitung untuk seluruh batch sekaligus"""
+
+    def __init__(self, flip_prob=0.5, affine_prob=0.5, shift_limit=0.1, scale_limit=0.1, rotate_limit=10,
+                 blur_prob=0.3, noise_prob=0.3, noise_var_limit=(10, 50), brightness_contrast_prob=0.5,
+                 brightness_limit=0.2, contrast_limit=0.2, elastic_prob=0.3, elastic_alpha=8.0,
+                 elastic_grid=8):
+        """
+        Args:
+            flip_prob (float): Probabilitas flip horizontal
+            affine_prob (float): Probabilitas shift/scale/rotate
+            shift_limit (float): Shift maksimum (fraksi ukuran image)
+            scale_limit (float): Perubahan skala maksimum (1 +- scale_limit)
+            rotate_limit (float): Rotasi maksimum (derajat)
+            blur_prob (float): Probabilitas Gaussian blur 3x3
+            noise_prob (float): Probabilitas Gaussian noise
+            noise_var_limit (tuple): Rentang variance noise pada skala 0-255
+            brightness_contrast_prob (float): Probabilitas perubahan brightness/contrast
+            brightness_limit, contrast_limit (float): Rentang perubahan (+-)
+            elastic_prob (float): Probabilitas elastic warp
+            elastic_alpha (float): Displacement maksimum elastic warp (pixel)
+            elastic_grid (int): Resolusi displacement field sebelum di-upsample (makin kecil makin halus)
+        """
+        self.flip_prob = flip_prob
+        self.affine_prob = affine_prob
+        self.shift_limit = shift_limit
+        self.scale_limit = scale_limit
+        self.rotate_limit = rotate_limit
+        self.blur_prob = blur_prob
+        self.noise_prob = noise_prob
+        self.noise_var_limit = noise_var_limit
+        self.brightness_contrast_prob = brightness_contrast_prob
+        self.brightness_limit = brightness_limit
+        self.contrast_limit = contrast_limit
+        self.elastic_prob = elastic_prob
+        self.elastic_alpha = elastic_alpha
+        self.elastic_grid = elastic_grid
+        self._blur_kernels = {}
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Buat augmenter dari parameter augmentasi ala config.AUGMENTATION_PARAMS
+
+        Args:
+            params (dict): horizontal_flip_prob, rotation_limit, shift_scale_rotate_prob,
+                gaussian_blur_prob, gaussian_noise_prob, brightness_contrast_prob, elastic_transform_prob
+
+        Returns:
+            BatchAugmenter
+        """
+        return cls(flip_prob=params['horizontal_flip_prob'], affine_prob=params['shift_scale_rotate_prob'],
+                   rotate_limit=params['rotation_limit'], blur_prob=params['gaussian_blur_prob'],
+                   noise_prob=params['gaussian_noise_prob'],
+                   brightness_contrast_prob=params['brightness_contrast_prob'],
+                   elastic_prob=params['elastic_transform_prob'])
+
+    def __call__(self, images, masks):
+        """
+        Augmentasi satu batch
+
+        Args:
+            images (torch.Tensor): (B, C, H, W), range 0-1
+            masks (torch.Tensor): (B, 1, H, W), nilai 0/1
+
+        Returns:
+            tuple: (images, masks) hasil augmentasi, shape dan device sama
+        """
+        images, masks = self.geometric(images, masks)
+        return self.photometric(images), masks
+
+    def _chance(self, batch_size, prob, device):
+        """Bool (B,) - sampel mana yang mendapat augmentasi"""
+        return torch.rand(batch_size, device=device) < prob
+
+    def _uniform(self, batch_size, limit, device):
+        """Nilai acak U(-limit, limit) per sampel"""
+        return (torch.rand(batch_size, device=device) * 2 - 1) * limit
+
+    def geometric(self, images, masks):
+        """Flip, shift/scale/rotate dan elastic warp dengan satu grid_sample"""
+        batch_size, _, height, width = images.shape
+        device = images.device
+        dtype = images.dtype
+
+        flip = self._chance(batch_size, self.flip_prob, device)
+        affine = self._chance(batch_size, self.affine_prob, device)
+        elastic = self._chance(batch_size, self.elastic_prob, device)
+
+        # Output -> input sampling matrix (normalized coordinates, identity for untouched samples)
+        angle = torch.where(affine, self._uniform(batch_size, math.radians(self.rotate_limit), device),
+                            torch.zeros(batch_size, device=device))
+        scale = torch.where(affine, 1 + self._uniform(batch_size, self.scale_limit, device),
+                            torch.ones(batch_size, device=device))
+        shift = torch.where(affine[:, None], self._uniform(batch_size * 2, self.shift_limit * 2, device)
+                            .view(batch_size, 2), torch.zeros(batch_size, 2, device=device))
+        cos, sin = torch.cos(angle) / scale, torch.sin(angle) / scale
+        flip_sign = torch.where(flip, -torch.ones(batch_size, device=device), torch.ones(batch_size, device=device))
+        theta = torch.stack([
+            torch.stack([cos * flip_sign, -sin, shift[:, 0]], dim=1),
+            torch.stack([sin * flip_sign, cos, shift[:, 1]], dim=1)
+        ], dim=1).to(dtype)
+        grid = F.affine_grid(theta, (batch_size, 1, height, width), align_corners=False)
+
+        # Smooth random displacement: low-resolution noise upsampled to full resolution
+        noise = torch.rand(batch_size, 2, self.elastic_grid, self.elastic_grid, device=device, dtype=dtype) * 2 - 1
+        field = F.interpolate(noise, size=(height, width), mode="bicubic", align_corners=False)
+        # Pixels -> normalized coordinates (x uses width, y uses height)
+        pixel_scale = torch.tensor([2.0 / width, 2.0 / height], device=device, dtype=dtype).view(1, 2, 1, 1)
+        field = field * self.elastic_alpha * pixel_scale * elastic.view(batch_size, 1, 1, 1).to(dtype)
+        grid = grid + field.permute(0, 2, 3, 1)
+
+        images = F.grid_sample(images, grid, mode="bilinear", padding_mode="reflection", align_corners=False)
+        masks = F.grid_sample(masks, grid.to(masks.dtype), mode="nearest", padding_mode="reflection",
+                              align_corners=False)
+        return images, masks
+
+    def _blur_kernel(self, channels, device, dtype):
+        """Kernel binomial 3x3 (Gaussian sigma ~0.7) per channel, di-cache per device/dtype"""
+        key = (channels, device, dtype)
+        if key not in self._blur_kernels:
+            weights = torch.tensor([0.25, 0.5, 0.25], device=device, dtype=dtype)
+            kernel = (weights[:, None] * weights[None, :]).expand(channels, 1, 3, 3).contiguous()
+            self._blur_kernels[key] = kernel
+        return self._blur_kernels[key]
+
+    def photometric(self, images):
+        """Blur, noise dan brightness/contrast (hanya image)"""
+        batch_size, channels = images.shape[:2]
+        device = images.device
+        dtype = images.dtype
+
+        blur = self._chance(batch_size, self.blur_prob, device)
+        blurred = F.conv2d(F.pad(images, (1, 1, 1, 1), mode="reflect"),
+                           self._blur_kernel(channels, device, dtype), groups=channels)
+        images = torch.where(blur.view(-1, 1, 1, 1), blurred, images)
+
+        noise = self._chance(batch_size, self.noise_prob, device)
+        low, high = self.noise_var_limit
+        std = (torch.rand(batch_size, device=device, dtype=dtype) * (high - low) + low).sqrt() / 255.0
+        images = images + torch.randn_like(images) * (std * noise.to(dtype)).view(-1, 1, 1, 1)
+
+        brightness_contrast = self._chance(batch_size, self.brightness_contrast_prob, device)
+        alpha = 1 + self._uniform(batch_size, self.contrast_limit, device).to(dtype)
+        beta = self._uniform(batch_size, self.brightness_limit, device).to(dtype)
+        alpha = torch.where(brightness_contrast, alpha, torch.ones_like(alpha))
+        beta = torch.where(brightness_contrast, beta, torch.zeros_like(beta))
+        images = images * alpha.view(-1, 1, 1, 1) + beta.view(-1, 1, 1, 1)
+
+        return images.clamp(0.0, 1.0)
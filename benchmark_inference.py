@@ -0,0 +1,383 @@
+"""
+Benchmark Inference untuk Segmentasi Karotis
+Benchmark yang bisa direproduksi tanpa data_uji dan tanpa checkpoint:
+1. Generate video sintetis mirip ultrasound (speckle noise + lumen elips yang berdenyut)
+2. Jalankan VideoProcessor dengan UNetCompatible berbobot random untuk setiap konfigurasi
+3. Ukur fps end-to-end, latency per tahap dan peak memory (tiap konfigurasi di subprocess sendiri)
+4. Simpan hasil sebagai JSON agar bisa dibandingkan antar run (subcommand compare)
+
+Usage:
+    python benchmark_inference.py run
+    python benchmark_inference.py run --config baseline --config input_384 --frames 300
+    python benchmark_inference.py compare benchmark_results/old.json benchmark_results/new.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import cv2
+
+DEFAULT_OUTPUT_DIR = "benchmark_results"
+
+# Konfigurasi VideoProcessor yang dibandingkan. "threads" diatur lewat torch.set_num_threads,
+# key lain diteruskan ke VideoProcessor(None, **config)
+BENCHMARK_CONFIGS = {
+    "baseline": {"input_size": 512},
+    "unfused": {"input_size": 512, "fuse": False},
+    "channels_last": {"input_size": 512, "channels_last": True},
+    "input_384": {"input_size": 384},
+    "input_256": {"input_size": 256},
+    "single_thread": {"input_size": 512, "threads": 1},
+    "lite": {"input_size": 512, "architecture": "UNetLite"},
+    "grayscale": {"input_size": 512, "n_channels": 1},
+    "two_tier": {"input_size": 512, "coarse_size": 256}
+}
+
+
+def generate_synthetic_video(video_path, width=640, height=480, frames=150, fps=30,
+                             seed=0, heart_rate_hz=1.2):
+    """
+    Generate video sintetis mirip ultrasound karotis
+
+    Jaringan dimodelkan sebagai speckle (noise Rayleigh multiplikatif) dengan atenuasi
+    terhadap kedalaman, lumen sebagai elips gelap yang berdenyut sesuai detak jantung,
+    dan dinding arteri sebagai cincin terang.
+
+    Args:
+        video_path (str): Path video output (.mp4)
+        width (int): Lebar frame
+        height (int): Tinggi frame
+        frames (int): Jumlah frame
+        fps (int): Frame rate video
+        seed (int): Seed random agar video identik antar run
+        heart_rate_hz (float): Frekuensi denyut lumen
+
+    Returns:
+        list: Diameter lumen sebenarnya (pixel) per frame
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+
+    # Background echogenicity: depth attenuation + a few horizontal tissue layers
+    depth = yy / height
+    tissue = (0.55 * np.exp(-1.2 * depth) + 0.25
+              + 0.12 * np.sin(2 * np.pi * depth * 6 + rng.uniform(0, np.pi)))
+    tissue = cv2.GaussianBlur(tissue.astype(np.float32), (0, 0), 3)
+
+    center_x, center_y = width * 0.5, height * 0.45
+    radius_x, radius_y = width * 0.12, height * 0.09
+
+    video_dir = os.path.dirname(video_path)
+    if video_dir:
+        os.makedirs(video_dir, exist_ok=True)
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot create video: {video_path}")
+
+    true_diameters = []
+    for frame_idx in range(frames):
+        scale = 1.0 + 0.08 * np.sin(2 * np.pi * heart_rate_hz * frame_idx / fps)
+        r = ((xx - center_x) / (radius_x * scale)) ** 2 + ((yy - center_y) / (radius_y * scale)) ** 2
+
+        echo = tissue.copy()
+        echo[(r >= 1.0) & (r < 1.3)] = 0.95   # Bright vessel wall
+        echo[r < 1.0] = 0.06                  # Anechoic lumen
+
+        speckle = rng.rayleigh(scale=1.0, size=(height, width)).astype(np.float32)
+        image = cv2.GaussianBlur(echo * speckle, (0, 0), 1.2)
+        image = np.clip(image * 120, 0, 255).astype(np.uint8)
+
+        writer.write(cv2.cvtColor(image, cv2.COLOR_GRAY2BGR))
+        true_diameters.append(2 * max(radius_x, radius_y) * scale)
+
+    writer.release()
+    return true_diameters
+
+
+def get_synthetic_video(output_dir, width, height, frames, fps, seed):
+    """Ambil video sintetis dari cache, generate jika belum ada. Returns path video"""
+    video_path = os.path.join(output_dir, "videos", f"synthetic_{width}x{height}_{frames}f_{fps}fps_seed{seed}.mp4")
+    if not os.path.exists(video_path):
+        print(f"[INFO] Generating synthetic video: {video_path}")
+        true_diameters = generate_synthetic_video(video_path, width, height, frames, fps, seed)
+        with open(os.path.splitext(video_path)[0] + "_truth.csv", "w", encoding="utf-8") as f:
+            f.write("Frame,Diameter (px)\n")
+            for frame_idx, diameter in enumerate(true_diameters):
+                f.write(f"{frame_idx},{diameter:.3f}\n")
+    return video_path
+
+
+def peak_memory_mb():
+    """Peak resident memory proses ini dalam MB (None jika tidak bisa diukur)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def build_processor(config):
+    """
+    Buat VideoProcessor berbobot random untuk satu konfigurasi benchmark
+
+    Args:
+        config (dict): Konfigurasi dari BENCHMARK_CONFIGS
+
+    Returns:
+        VideoProcessor: Processor siap pakai
+    """
+    import torch
+    from video_inference import VideoProcessor
+
+    options = dict(config)
+    threads = options.pop("threads", None)
+    if threads:
+        torch.set_num_threads(threads)
+
+    # Same random weights for every configuration
+    torch.manual_seed(0)
+    return VideoProcessor(None, **options)
+
+
+def run_config(name, config, video_path, run_dir, warmup=3):
+    """
+    Jalankan satu konfigurasi di proses ini (dipanggil oleh subcommand worker)
+
+    Returns:
+        dict: Hasil benchmark konfigurasi
+    """
+    # Benchmarks run headless; plots are only saved to disk
+    import matplotlib
+    matplotlib.use('Agg')
+    import torch
+
+    config_dir = os.path.join(run_dir, name)
+    os.makedirs(config_dir, exist_ok=True)
+
+    load_start = time.perf_counter()
+    processor = build_processor(config)
+    model_load_seconds = time.perf_counter() - load_start
+
+    # Warm-up so one-time allocations/kernel selection are not part of the measurement
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        raise RuntimeError(f"Cannot read synthetic video: {video_path}")
+    for _ in range(warmup):
+        processor.predict_mask(frame)
+
+    report_path = os.path.join(config_dir, "report.json")
+    processor.process_video_with_diameter(
+        video_path=video_path,
+        output_path=os.path.join(config_dir, "output.mp4"),
+        plot_path=os.path.join(config_dir, "diameter.png"),
+        csv_path=os.path.join(config_dir, "diameter.csv"),
+        event_log_path=os.path.join(config_dir, "events.jsonl"),
+        report_path=report_path
+    )
+
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+
+    result = {
+        "config": name,
+        "options": config,
+        "device": str(processor.device),
+        "torch_threads": torch.get_num_threads(),
+        "frames": report["frames"],
+        "elapsed_seconds": report["elapsed_seconds"],
+        "fps": report["fps"],
+        "model_load_seconds": round(model_load_seconds, 3),
+        "stages": report["stages"],
+        "peak_rss_mb": peak_memory_mb()
+    }
+    if torch.cuda.is_available() and processor.device.type == "cuda":
+        result["peak_cuda_mb"] = round(torch.cuda.max_memory_allocated() / (1024 * 1024), 1)
+    return result
+
+
+def run_benchmark(config_names, output_dir=DEFAULT_OUTPUT_DIR, width=640, height=480, frames=150,
+                  fps=30, seed=0, warmup=3, tag=None):
+    """
+    Jalankan benchmark untuk beberapa konfigurasi, masing-masing di subprocess terpisah
+    agar peak memory dan state torch (threads, cache) tidak saling mempengaruhi
+
+    Returns:
+        str: Path file JSON hasil benchmark
+    """
+    video_path = get_synthetic_video(output_dir, width, height, frames, fps, seed)
+
+    run_name = datetime.now().strftime("benchmark_%Y%m%d_%H%M%S")
+    run_dir = os.path.join(output_dir, run_name)
+    os.makedirs(run_dir, exist_ok=True)
+
+    results = []
+    for name in config_names:
+        result_path = os.path.join(run_dir, f"{name}_result.json")
+        log_path = os.path.join(run_dir, f"{name}.log")
+        print(f"[RUN] {name}: {BENCHMARK_CONFIGS[name]}")
+
+        with open(log_path, "w", encoding="utf-8") as log_file:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "worker", "--config", name,
+                 "--video", video_path, "--run_dir", run_dir, "--warmup", str(warmup),
+                 "--result", result_path],
+                stdout=log_file, stderr=subprocess.STDOUT
+            )
+
+        if completed.returncode != 0 or not os.path.exists(result_path):
+            print(f"[ERROR] {name} failed (exit code {completed.returncode}), see {log_path}")
+            results.append({"config": name, "options": BENCHMARK_CONFIGS[name], "error": log_path})
+            continue
+
+        with open(result_path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        results.append(result)
+        peak = f"{result['peak_rss_mb']:.0f} MB" if result.get("peak_rss_mb") else "-"
+        print(f"[OK] {name}: {result['fps']:.2f} fps, peak RSS {peak}")
+
+    import torch
+    summary = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "tag": tag,
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "opencv": cv2.__version__,
+        "video": {"path": video_path, "width": width, "height": height,
+                  "frames": frames, "fps": fps, "seed": seed},
+        "warmup": warmup,
+        "results": results
+    }
+
+    output_path = os.path.join(output_dir, f"{run_name}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print_results(summary)
+    print(f"\n[OK] Benchmark results saved to: {output_path}")
+    return output_path
+
+
+def print_results(summary):
+    """Tampilkan tabel hasil benchmark"""
+    print(f"\n=== Benchmark ({summary['video']['width']}x{summary['video']['height']}, "
+          f"{summary['video']['frames']} frames) ===")
+    print(f"{'Config':<16} {'FPS':>8} {'Peak RSS':>10} {'Slowest stage (p50)':>28}")
+    for result in summary["results"]:
+        if "error" in result:
+            print(f"{result['config']:<16} {'FAILED':>8}")
+            continue
+        stage, stats = max(result["stages"].items(), key=lambda item: item[1]["total_ms"])
+        slowest = f"{stage} {stats['p50_ms']:.2f}ms"
+        peak = f"{result['peak_rss_mb']:.0f} MB" if result.get("peak_rss_mb") else "-"
+        print(f"{result['config']:<16} {result['fps']:>8.2f} {peak:>10} {slowest:>28}")
+
+
+def compare_results(baseline_path, candidate_path):
+    """
+    Bandingkan dua file hasil benchmark (fps, memory dan p50 per tahap)
+
+    Args:
+        baseline_path (str): JSON hasil run lama
+        candidate_path (str): JSON hasil run baru
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(candidate_path, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    if baseline["video"] != candidate["video"]:
+        print("[WARN] Runs used different synthetic videos - comparison is not like-for-like")
+
+    baseline_results = {r["config"]: r for r in baseline["results"] if "error" not in r}
+    candidate_results = {r["config"]: r for r in candidate["results"] if "error" not in r}
+    common = [name for name in candidate_results if name in baseline_results]
+    if not common:
+        print("[WARN] No successful configurations in common")
+        return
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "-"
+
+    print(f"=== {os.path.basename(baseline_path)} -> {os.path.basename(candidate_path)} ===")
+    for name in common:
+        old, new = baseline_results[name], candidate_results[name]
+        print(f"\n{name}: {old['fps']:.2f} -> {new['fps']:.2f} fps ({change(old['fps'], new['fps'])})")
+        if old.get("peak_rss_mb") and new.get("peak_rss_mb"):
+            print(f"  peak RSS: {old['peak_rss_mb']:.0f} -> {new['peak_rss_mb']:.0f} MB "
+                  f"({change(old['peak_rss_mb'], new['peak_rss_mb'])})")
+        for stage, stats in new["stages"].items():
+            if stage in old["stages"]:
+                old_p50 = old["stages"][stage]["p50_ms"]
+                print(f"  {stage:<12} p50 {old_p50:>8.2f} -> {stats['p50_ms']:>8.2f} ms "
+                      f"({change(old_p50, stats['p50_ms'])})")
+
+
+def main():
+    """Main function untuk CLI benchmark"""
+    parser = argparse.ArgumentParser(description='Inference Benchmark with Synthetic Ultrasound Videos')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmark')
+    run_parser.add_argument('--config', choices=sorted(BENCHMARK_CONFIGS), action='append',
+                           help='Configuration to run (repeatable, default: all)')
+    run_parser.add_argument('--width', type=int, default=640)
+    run_parser.add_argument('--height', type=int, default=480)
+    run_parser.add_argument('--frames', type=int, default=150)
+    run_parser.add_argument('--fps', type=int, default=30)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--warmup', type=int, default=3, help='Warm-up predictions before timing')
+    run_parser.add_argument('--output_dir', type=str, default=DEFAULT_OUTPUT_DIR)
+    run_parser.add_argument('--tag', type=str, default=None, help='Label stored with the results')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two benchmark result files')
+    compare_parser.add_argument('baseline', type=str)
+    compare_parser.add_argument('candidate', type=str)
+
+    # Internal: one configuration in a fresh process
+    worker_parser = subparsers.add_parser('worker')
+    worker_parser.add_argument('--config', choices=sorted(BENCHMARK_CONFIGS), required=True)
+    worker_parser.add_argument('--video', type=str, required=True)
+    worker_parser.add_argument('--run_dir', type=str, required=True)
+    worker_parser.add_argument('--warmup', type=int, default=3)
+    worker_parser.add_argument('--result', type=str, required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        config_names = args.config or list(BENCHMARK_CONFIGS)
+        run_benchmark(config_names, args.output_dir, args.width, args.height, args.frames,
+                      args.fps, args.seed, args.warmup, args.tag)
+    elif args.command == 'compare':
+        compare_results(args.baseline, args.candidate)
+    elif args.command == 'worker':
+        result = run_config(args.config, BENCHMARK_CONFIGS[args.config], args.video,
+                            args.run_dir, args.warmup)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
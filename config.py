@@ -55,6 +55,14 @@ EPOCHS = 50
 VALIDATION_SPLIT = 0.15
 TEST_SPLIT = 0.15
 
+# DataLoader parameters (augmentasi albumentations berjalan di worker process)
+DATALOADER_PARAMS = {
+    'num_workers': min(4, os.cpu_count() or 1),
+    'prefetch_factor': 2,        # Batch yang disiapkan lebih dulu per worker
+    'persistent_workers': True,  # Worker tidak di-restart setiap epoch
+    'pin_memory': True           # Hanya berlaku saat training di CUDA
+}
+
 # Data augmentation parameters
 AUGMENTATION_PARAMS = {
     'horizontal_flip_prob': 0.5,
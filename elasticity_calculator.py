@@ -625,8 +625,12 @@ class ElasticityCalculator:
                 self.diameter_data = pd.read_csv(diameter_files[0])
                 print(f"DEBUG: Loaded diameter data: {len(self.diameter_data)} rows")
                 
-                # Try to load separate pressure data
-                self.load_separate_pressure_data(subject_name)
+                if 'pressure' in self.diameter_data.columns:
+                    # Pressure was fused by timestamp during inference
+                    print(f"DEBUG: Found pressure column in {os.path.basename(diameter_files[0])}")
+                else:
+                    # Try to load separate pressure data
+                    self.load_separate_pressure_data(subject_name)
             
             print(f"DEBUG: Diameter columns: {list(self.diameter_data.columns)}")
             
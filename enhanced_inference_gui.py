@@ -8,10 +8,13 @@ import sys
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
-import subprocess
 import glob
 from datetime import datetime
 import json
+import time
+from inference_service import InferenceClient
+from job_queue import JobQueue
+from inference_events import parse_event, format_progress
 
 class EnhancedInferenceGUI:
     """GUI untuk Enhanced Inference dengan Multiple Subject Selection"""
@@ -26,13 +29,20 @@ class EnhancedInferenceGUI:
         self.selected_subjects = {}  # Dictionary untuk menyimpan checkbox states
         self.selected_model = tk.StringVar()
         self.use_pressure = tk.BooleanVar(value=True)
+        self.write_overlay = tk.BooleanVar(value=True)
+        self.overlay_scale = tk.StringVar(value="1.0")
+        self.overlay_frame_step = tk.IntVar(value=1)
+        self.mask_output = tk.StringVar(value="none")
         self.processing = False
         self.progress_var = tk.StringVar(value="Ready")
+        self.throughput_var = tk.StringVar(value="")
+        self.job_queue = JobQueue()
         
         # Initialize GUI
         self.setup_gui()
         self.scan_subjects()
         self.scan_models()
+        self.report_pending_jobs()
         
     def setup_gui(self):
         """Setup GUI components"""
@@ -127,6 +137,9 @@ class EnhancedInferenceGUI:
         tk.Button(header_frame, text="Refresh Models", command=self.scan_models,
                  bg="lightblue", relief=tk.RAISED).pack(side=tk.RIGHT)
         
+        tk.Button(header_frame, text="Compare All Models", command=self.start_comparison,
+                 bg="lightyellow", relief=tk.RAISED).pack(side=tk.RIGHT, padx=5)
+        
         # Model list frame
         self.model_list_frame = tk.Frame(model_frame, bg="white", relief=tk.SUNKEN, bd=2)
         self.model_list_frame.pack(fill=tk.BOTH, expand=True, pady=10, padx=20)
@@ -190,6 +203,26 @@ class EnhancedInferenceGUI:
         tk.Checkbutton(output_frame, text="Create combined analysis report",
                       variable=self.save_combined, font=("Arial", 11)).pack(anchor=tk.W)
         
+        # Video outputs: smaller overlay and/or lossless masks for external compositing
+        video_frame = tk.LabelFrame(options_frame, text="Video Output",
+                                  padx=20, pady=15)
+        video_frame.pack(fill=tk.X, pady=(0, 20), padx=20)
+        
+        tk.Checkbutton(video_frame, text="Write overlay video",
+                      variable=self.write_overlay, font=("Arial", 11)).grid(row=0, column=0, columnspan=2, sticky=tk.W)
+        
+        tk.Label(video_frame, text="Overlay resolution scale:", font=("Arial", 10)).grid(row=1, column=0, sticky=tk.W, pady=3)
+        ttk.Combobox(video_frame, textvariable=self.overlay_scale, values=["1.0", "0.75", "0.5", "0.25"],
+                    width=8, state="readonly").grid(row=1, column=1, sticky=tk.W, padx=10)
+        
+        tk.Label(video_frame, text="Overlay every N-th frame:", font=("Arial", 10)).grid(row=2, column=0, sticky=tk.W, pady=3)
+        tk.Spinbox(video_frame, from_=1, to=30, textvariable=self.overlay_frame_step,
+                  width=8).grid(row=2, column=1, sticky=tk.W, padx=10)
+        
+        tk.Label(video_frame, text="Lossless mask output:", font=("Arial", 10)).grid(row=3, column=0, sticky=tk.W, pady=3)
+        ttk.Combobox(video_frame, textvariable=self.mask_output, values=["none", "video", "images"],
+                    width=8, state="readonly").grid(row=3, column=1, sticky=tk.W, padx=10)
+        
     def create_progress_tab(self, notebook):
         """Create progress monitoring tab"""
         progress_frame = ttk.Frame(notebook)
@@ -207,6 +240,11 @@ class EnhancedInferenceGUI:
                                    font=("Arial", 11), fg="blue")
         self.status_label.pack(pady=10)
         
+        # Live throughput from structured inference events
+        self.throughput_label = tk.Label(progress_container, textvariable=self.throughput_var,
+                                        font=("Consolas", 10), fg="darkgreen")
+        self.throughput_label.pack(pady=(0, 10))
+        
         # Progress bar
         self.progress_bar = ttk.Progressbar(progress_container, mode='indeterminate')
         self.progress_bar.pack(fill=tk.X, pady=10)
@@ -401,6 +439,14 @@ class EnhancedInferenceGUI:
         self.model_status_label.config(text=f"Found {len(model_files)} model files", fg="green")
         self.log_message(f"Model scan completed: Found {len(model_files)} models")
         
+    def report_pending_jobs(self):
+        """Log jobs that are still queued from an earlier session"""
+        stats = self.job_queue.stats()
+        running = stats["counts"].get("running", 0)
+        if stats["depth"] or running:
+            self.log_message(f"Job queue: {stats['depth']} queued, {running} running from earlier sessions "
+                             f"(they continue when the inference service or a worker is running)")
+        
     def select_all_subjects(self):
         """Select all subjects"""
         for var in self.selected_subjects.values():
@@ -432,7 +478,8 @@ class EnhancedInferenceGUI:
             'custom_model_path': self.custom_model_path.get(),
             'use_pressure': self.use_pressure.get(),
             'save_individual': self.save_individual.get(),
-            'save_combined': self.save_combined.get()
+            'save_combined': self.save_combined.get(),
+            'output_options': self.get_output_options()
         }
         
         filename = filedialog.asksaveasfilename(
@@ -478,6 +525,12 @@ class EnhancedInferenceGUI:
                     self.save_individual.set(config['save_individual'])
                 if 'save_combined' in config:
                     self.save_combined.set(config['save_combined'])
+                if 'output_options' in config:
+                    output_options = config['output_options']
+                    self.write_overlay.set(output_options.get('overlay', True))
+                    self.overlay_scale.set(str(output_options.get('overlay_scale', 1.0)))
+                    self.overlay_frame_step.set(output_options.get('overlay_frame_step', 1))
+                    self.mask_output.set(output_options.get('mask_output') or "none")
                 
                 self.log_message(f"Configuration loaded: {filename}")
                 messagebox.showinfo("Success", "Configuration loaded successfully!")
@@ -486,6 +539,20 @@ class EnhancedInferenceGUI:
                 self.log_message(f"Error loading configuration: {e}")
                 messagebox.showerror("Error", f"Failed to load configuration: {e}")
     
+    def get_output_options(self):
+        """Opsi output video/mask untuk process_selected_subject"""
+        try:
+            frame_step = max(1, int(self.overlay_frame_step.get()))
+        except (tk.TclError, ValueError):
+            frame_step = 1
+        mask_output = self.mask_output.get()
+        return {
+            "overlay": self.write_overlay.get(),
+            "overlay_scale": float(self.overlay_scale.get()),
+            "overlay_frame_step": frame_step,
+            "mask_output": None if mask_output == "none" else mask_output
+        }
+    
     def start_processing(self):
         """Start the inference processing"""
         # Validate selections
@@ -525,50 +592,88 @@ class EnhancedInferenceGUI:
         processing_thread.daemon = True
         processing_thread.start()
         
-    def run_processing(self, subjects, model_path):
-        """Run the actual processing"""
+    def run_processing(self, subjects, model_path, compare_model_paths=None):
+        """
+        Enqueue the selected subjects and follow them until they finish
+        
+        Args:
+            subjects (list): Subjek yang diproses
+            model_path (str): Model untuk inference
+            compare_model_paths (list): Jika diberikan, jalankan perbandingan model
+                (satu decode per subjek) alih-alih inference biasa
+        """
         try:
             total_subjects = len(subjects)
             completed = 0
+            failed = 0
             
-            self.update_progress(f"Starting processing of {total_subjects} subjects...")
-            
+            # Jobs are stored in the durable queue first, so closing this window
+            # or a crash does not lose the batch
+            job_ids = {}
+            output_options = self.get_output_options()
             for subject in subjects:
+                if compare_model_paths:
+                    job_ids[subject] = self.job_queue.enqueue("comparison", {
+                        "subject": subject,
+                        "model_paths": [os.path.abspath(path) for path in compare_model_paths]
+                    })
+                else:
+                    job_ids[subject] = self.job_queue.enqueue("inference", {
+                        "subject": subject,
+                        "model_path": os.path.abspath(model_path),
+                        "use_pressure": self.use_pressure.get(),
+                        "output_options": output_options
+                    })
+            self.update_progress(f"Enqueued {total_subjects} subjects (jobs {min(job_ids.values())}-{max(job_ids.values())})")
+            
+            # The inference service drains the queue with the model kept loaded
+            client = InferenceClient()
+            if not client.is_running():
+                self.update_progress("Starting inference service (loading model)...")
+                if not client.ensure_service():
+                    raise RuntimeError("Inference service did not start")
+            
+            pending = dict(job_ids)
+            last_progress = {}
+            while pending:
                 if not self.processing:  # Check if stopped
+                    cancelled = [subject for subject, job_id in pending.items() if self.job_queue.cancel(job_id)]
+                    if cancelled:
+                        self.log_message(f"[STOP] Cancelled queued jobs: {', '.join(cancelled)}")
                     break
-                    
-                self.update_progress(f"Processing {subject} ({completed + 1}/{total_subjects})...")
-                
-                # Build command
-                cmd = [sys.executable, "video_inference.py", "--subject", subject]
                 
-                if self.use_pressure.get():
-                    cmd.append("--use_pressure")
-                  # Run inference
-                try:
-                    # Set environment variable
-                    env = os.environ.copy()
-                    env['PYTHONPATH'] = os.getcwd()
+                for subject, job_id in list(pending.items()):
+                    job = self.job_queue.get(job_id)
                     
-                    result = subprocess.run(cmd, capture_output=True, text=True, 
-                                          cwd=os.getcwd(), env=env, timeout=3600)  # 1 hour timeout
+                    if job["progress"] and job["progress"] != last_progress.get(job_id):
+                        last_progress[job_id] = job["progress"]
+                        event = parse_event(job["progress"])
+                        if event is None:
+                            self.log_service_line(f"{subject}: {job['progress']}")
+                        else:
+                            self.show_progress_event(subject, event)
                     
-                    if result.returncode == 0:
-                        self.log_message(f"[OK] {subject}: Processing completed successfully")
+                    if job["status"] == "done":
+                        self.log_message(f"[OK] {subject}: Processing completed successfully ({job['duration']:.1f}s)")
+                        if compare_model_paths:
+                            self.log_comparison_result(subject, job["result"])
                         completed += 1
-                    else:
+                        del pending[subject]
+                    elif job["status"] in ("failed", "cancelled"):
                         self.log_message(f"[ERROR] {subject}: Processing failed")
-                        self.log_message(f"Error output: {result.stderr}")
-                        
-                except subprocess.TimeoutExpired:
-                    self.log_message(f"[TIMEOUT] {subject}: Processing timed out")
-                except Exception as e:
-                    self.log_message(f"[ERROR] {subject}: Exception occurred: {e}")
+                        self.log_message(f"Error output: {job['error']}")
+                        failed += 1
+                        del pending[subject]
+                    elif job["status"] == "queued" and job["attempts"] > 0 and job["error"]:
+                        if last_progress.get(("retry", job_id)) != job["attempts"]:
+                            last_progress[("retry", job_id)] = job["attempts"]
+                            self.log_message(f"[RETRY] {subject}: attempt {job['attempts']} failed ({job['error']}), retrying")
                 
-                # Update progress with more detail
-                progress_pct = ((completed) / total_subjects) * 100
-                elapsed_time = (completed / total_subjects) * 100 if completed > 0 else 0
-                self.update_progress(f"Progress: {completed}/{total_subjects} subjects ({progress_pct:.1f}%) completed")
+                progress_pct = ((completed + failed) / total_subjects) * 100
+                self.progress_var.set(f"Progress: {completed}/{total_subjects} subjects ({progress_pct:.1f}%) completed")
+                
+                if pending:
+                    time.sleep(1.0)
             
             # Final status
             if self.processing:  # Not stopped by user
@@ -591,8 +696,76 @@ class EnhancedInferenceGUI:
             self.start_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
     
+    def start_comparison(self):
+        """Bandingkan semua model yang ditemukan pada subjek terpilih (satu decode per subjek)"""
+        selected_subjects_list = [name for name, var in self.selected_subjects.items() if var.get()]
+        if not selected_subjects_list:
+            messagebox.showwarning("Warning", "Please select at least one subject to compare models on.")
+            return
+        
+        model_paths = sorted(glob.glob("*.pth"))
+        custom_model = self.custom_model_path.get()
+        if custom_model and os.path.exists(custom_model) and custom_model not in model_paths:
+            model_paths.append(custom_model)
+        if len(model_paths) < 2:
+            messagebox.showwarning("Warning", "Model comparison needs at least two .pth models.")
+            return
+        
+        # The selected model is the reference for Dice and diameter deltas
+        selected = self.selected_model.get()
+        if selected in model_paths:
+            model_paths.remove(selected)
+            model_paths.insert(0, selected)
+        self.log_message(f"Comparing {len(model_paths)} models (reference: {model_paths[0]})")
+        
+        self.processing = True
+        self.start_button.config(state=tk.DISABLED)
+        self.stop_button.config(state=tk.NORMAL)
+        self.progress_bar.start()
+        
+        comparison_thread = threading.Thread(
+            target=self.run_processing,
+            args=(selected_subjects_list, model_paths[0], model_paths)
+        )
+        comparison_thread.daemon = True
+        comparison_thread.start()
+    
+    def log_comparison_result(self, subject, result):
+        """Tampilkan ringkasan perbandingan model di log"""
+        if not result:
+            return
+        for label, stats in result.get("models", {}).items():
+            if "mean_dice" in stats:
+                self.log_message(f"  {subject} {label}: Dice {stats['mean_dice']:.4f}, "
+                                 f"|dD| {stats['mean_abs_delta_mm']:.3f} mm, "
+                                 f"{stats['forward_ms_per_frame']:.1f} ms/frame")
+            else:
+                self.log_message(f"  {subject} {label} (reference): mean diameter "
+                                 f"{stats['mean_diameter_mm']:.3f} mm, {stats['forward_ms_per_frame']:.1f} ms/frame")
+        csv_path = result.get("output_paths", {}).get("csv")
+        if csv_path:
+            self.log_message(f"  Comparison CSV: {csv_path}")
+    
+    def show_progress_event(self, subject, event):
+        """Render a structured progress event (fps, ETA, stage latency)"""
+        text = f"{subject}: {format_progress(event)}"
+        if event.get("event") == "frame":
+            latency = event.get("latency_ms") or {}
+            slowest = max(latency, key=latency.get) if latency else None
+            if slowest:
+                text += f" - slowest stage: {slowest} {latency[slowest]:.0f}ms"
+        self.throughput_var.set(text)
+        if event.get("event") != "frame":
+            self.log_message(text)
+        
+    def log_service_line(self, line):
+        """Forward progress lines from the inference service to the log"""
+        if "[PROGRESS]" in line:
+            self.progress_var.set(line)
+        self.log_message(line)
+        
     def stop_processing(self):
-        """Stop the processing"""
+        """Stop the processing (queued jobs are cancelled, the running one finishes)"""
         self.processing = False
         self.update_progress("Stopping processing...")
         self.log_message("🛑 Stop requested by user")
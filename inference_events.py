@@ -0,0 +1,149 @@
+"""
+Inference Events untuk Segmentasi Karotis
+Event progress terstruktur (JSON lines) dari proses inference video: frame index,
+fps, latency per tahap, ETA dan diameter. Event dikirim ke callback, ditulis ke
+file log (.jsonl) dan/atau stream (misalnya stdout sebagai pipe).
+
+Jenis event:
+    start  - info video (total_frames, fps video, resolusi)
+    frame  - satu frame selesai diproses
+    end    - ringkasan run (jumlah frame, waktu total, fps rata-rata)
+"""
+
+import json
+import time
+from collections import deque
+
+
+class ThroughputMeter:
+    """Hitung fps proses (jendela geser) dan ETA"""
+
+    def __init__(self, total_frames, window=50):
+        """
+        Args:
+            total_frames (int): Jumlah frame total (0 jika tidak diketahui)
+            window (int): Jumlah frame terakhir untuk menghitung fps
+        """
+        self.total_frames = total_frames
+        self.start_time = time.perf_counter()
+        self.times = deque(maxlen=window)
+        self.count = 0
+
+    def update(self):
+        """Catat satu frame selesai. Returns (fps, eta_seconds)"""
+        now = time.perf_counter()
+        self.times.append(now)
+        self.count += 1
+
+        if len(self.times) > 1:
+            fps = (len(self.times) - 1) / (self.times[-1] - self.times[0])
+        else:
+            elapsed = now - self.start_time
+            fps = 1.0 / elapsed if elapsed > 0 else 0.0
+
+        eta = None
+        if self.total_frames > 0 and fps > 0:
+            eta = max(self.total_frames - self.count, 0) / fps
+        return fps, eta
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+
+class InferenceEventEmitter:
+    """Kirim event progress ke callback, file log JSON lines dan/atau stream"""
+
+    def __init__(self, callback=None, log_path=None, stream=None):
+        """
+        Args:
+            callback (callable): Dipanggil dengan dict event (optional)
+            log_path (str): Path file .jsonl untuk menyimpan semua event (optional)
+            stream: File-like object untuk menulis event sebagai JSON lines (optional)
+        """
+        self.callback = callback
+        self.stream = stream
+        self.log_file = open(log_path, "w", encoding="utf-8") if log_path else None
+        self.log_path = log_path
+
+    def emit(self, event, **fields):
+        """
+        Kirim satu event
+
+        Args:
+            event (str): Jenis event ("start", "frame", "end")
+            **fields: Data event
+
+        Returns:
+            dict: Event yang dikirim
+        """
+        data = {"event": event, "time": time.time()}
+        data.update(fields)
+
+        if self.log_file or self.stream:
+            line = json.dumps(data) + "\n"
+            if self.log_file:
+                self.log_file.write(line)
+            if self.stream:
+                self.stream.write(line)
+                self.stream.flush()
+        if self.callback:
+            try:
+                self.callback(data)
+            except Exception as e:
+                # A broken consumer must not stop the inference run
+                print(f"[WARN] Progress callback failed: {e}")
+        return data
+
+    def close(self):
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+
+def format_eta(seconds):
+    """Format ETA dalam detik menjadi teks singkat (mis. 1m05s)"""
+    if seconds is None:
+        return "-"
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def format_progress(event):
+    """
+    Ubah event menjadi satu baris teks untuk ditampilkan di GUI/console
+
+    Args:
+        event (dict): Event dari InferenceEventEmitter
+
+    Returns:
+        str: Teks progress
+    """
+    kind = event.get("event")
+    if kind == "start":
+        return (f"[START] {event.get('total_frames', 0)} frames, "
+                f"{event.get('width')}x{event.get('height')} @ {event.get('video_fps')} FPS")
+    if kind == "end":
+        return (f"[DONE] {event.get('frames', 0)} frames in {event.get('elapsed_seconds', 0):.1f}s "
+                f"({event.get('fps', 0):.2f} fps)")
+
+    total = event.get("total_frames") or 0
+    frame_number = event.get("frame", 0) + 1
+    progress = f"{frame_number / total * 100:.1f}% ({frame_number}/{total})" if total else f"frame {frame_number}"
+    return (f"[PROGRESS] {progress} - {event.get('fps', 0):.2f} fps - "
+            f"ETA {format_eta(event.get('eta_seconds'))} - Diameter: {event.get('diameter_mm', 0):.2f}mm")
+
+
+def parse_event(text):
+    """Parse teks progress yang berisi event JSON. Returns dict atau None"""
+    if not text or not text.startswith("{"):
+        return None
+    try:
+        event = json.loads(text)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and "event" in event else None
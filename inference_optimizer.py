@@ -0,0 +1,309 @@
+"""
+Inference Optimizer untuk Segmentasi Karotis
+Optimasi graph UNetCompatible untuk inference (eval mode):
+1. Conv2d + BatchNorm2d di-fold menjadi satu Conv2d (BatchNorm diganti Identity)
+2. Optional: model dan input dalam memory format channels_last
+3. Parity check: output model hasil optimasi dibandingkan dengan model asli
+4. Konversi checkpoint 3 channel (RGB) menjadi 1 channel (grayscale): kernel konvolusi
+   pertama dijumlahkan antar channel sehingga frame USG tidak perlu di-expand ke RGB
+
+Usage:
+    python inference_optimizer.py --model UNet_25Mei_Sore.pth
+    python inference_optimizer.py --channels_last --runs 10      (model acak, juga cek konversi grayscale)
+    python inference_optimizer.py --model UNet_25Mei_Sore.pth --to_grayscale UNet_25Mei_Sore_gray.pth
+"""
+
+import copy
+import time
+import argparse
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+
+def fuse_conv_bn(model, channels_last=False):
+    """
+    Fold setiap pasangan Conv2d -> BatchNorm2d ke dalam bobot konvolusi
+
+    Model asli tidak diubah; hasilnya salinan dalam eval mode yang secara numerik
+    ekuivalen (selisih hanya pembulatan float). ReLU tetap in-place setelah konvolusi.
+
+    Args:
+        model (nn.Module): Model yang sudah ter-load (mis. UNetCompatible)
+        channels_last (bool): Konversi bobot ke memory format channels_last
+
+    Returns:
+        tuple: (fused_model, jumlah pasangan yang di-fold)
+    """
+    fused = copy.deepcopy(model).eval()
+    folded = 0
+
+    for module in fused.modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+        children = list(module._modules.items())
+        for (conv_name, conv), (bn_name, bn) in zip(children, children[1:]):
+            if (isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d)
+                    and bn.track_running_stats and bn.running_mean is not None):
+                module._modules[conv_name] = fuse_conv_bn_eval(conv, bn)
+                module._modules[bn_name] = nn.Identity()
+                folded += 1
+
+    if channels_last:
+        fused = fused.to(memory_format=torch.channels_last)
+    return fused, folded
+
+
+def collapse_rgb_input(model, rgb_mean, rgb_std, gray_mean, gray_std):
+    """
+    Ubah model dengan input RGB menjadi model dengan input 1 channel (grayscale)
+
+    Untuk frame grayscale ketiga channel RGB identik, sehingga konvolusi pertama bisa
+    dijumlahkan antar channel. Perbedaan normalisasi per channel ikut di-fold:
+    W' = sum_c W_c * gray_std / rgb_std_c dan b' = b + sum_c sum(W_c) * (gray_mean - rgb_mean_c) / rgb_std_c.
+    Hasilnya ekuivalen untuk semua pixel kecuali border padding (nilai nol padding
+    berbeda arti antar normalisasi; selisihnya kecil karena mean/std ImageNet hampir sama).
+
+    Args:
+        model (nn.Module): Model dengan konvolusi pertama 3 channel (groups=1)
+        rgb_mean, rgb_std (sequence): Normalisasi input 3 channel
+        gray_mean, gray_std (sequence): Normalisasi input 1 channel (satu nilai)
+
+    Returns:
+        nn.Module: Salinan model dengan konvolusi pertama 1 channel
+    """
+    converted = copy.deepcopy(model)
+
+    # First Conv2d in definition order (may be nested, e.g. enc1.0 of UNetCompatible)
+    for conv_name, conv in converted.named_modules():
+        if isinstance(conv, nn.Conv2d):
+            break
+    else:
+        raise ValueError("Model has no Conv2d layer")
+
+    if conv.in_channels != 3:
+        raise ValueError(f"First convolution has {conv.in_channels} input channels, expected 3")
+    if conv.groups != 1:
+        raise ValueError("First convolution is grouped (depthwise); train a single-channel model instead")
+
+    with torch.no_grad():
+        weight = conv.weight.double()
+        mean = torch.tensor(rgb_mean, dtype=torch.float64).view(1, 3, 1, 1)
+        std = torch.tensor(rgb_std, dtype=torch.float64).view(1, 3, 1, 1)
+        scale = gray_std[0] / std
+
+        new_weight = (weight * scale).sum(dim=1, keepdim=True)
+        bias_shift = (weight.sum(dim=(2, 3), keepdim=True) * (gray_mean[0] - mean) / std).sum(dim=(1, 2, 3))
+        new_bias = bias_shift if conv.bias is None else conv.bias.double() + bias_shift
+
+        collapsed = nn.Conv2d(1, conv.out_channels, conv.kernel_size, stride=conv.stride,
+                              padding=conv.padding, dilation=conv.dilation, bias=True,
+                              padding_mode=conv.padding_mode).to(conv.weight.device)
+        collapsed.weight.copy_(new_weight.to(conv.weight.dtype))
+        collapsed.bias.copy_(new_bias.to(conv.weight.dtype))
+
+    parent_name, _, name = conv_name.rpartition(".")
+    parent = converted
+    for part in parent_name.split(".") if parent_name else []:
+        parent = getattr(parent, part)
+    setattr(parent, name, collapsed)
+    return converted
+
+
+def check_grayscale_parity(original, converted, rgb_mean, rgb_std, gray_mean, gray_std,
+                           input_size=512, batch_size=2, threshold=0.5, seed=0):
+    """
+    Bandingkan model RGB (frame grayscale di-expand ke 3 channel) dengan hasil collapse_rgb_input
+
+    Returns:
+        dict: max_abs_diff dan mask_agreement (fraksi pixel biner yang sama)
+    """
+    device = next(original.parameters()).device
+    generator = torch.Generator().manual_seed(seed)
+    gray = torch.rand(batch_size, 1, input_size, input_size, generator=generator).to(device)
+    mean = torch.tensor(rgb_mean, device=device).view(1, 3, 1, 1)
+    std = torch.tensor(rgb_std, device=device).view(1, 3, 1, 1)
+
+    with torch.no_grad():
+        expected = original.eval()(((gray.expand(-1, 3, -1, -1)) - mean) / std)
+        actual = converted.eval()((gray - gray_mean[0]) / gray_std[0])
+
+    max_abs_diff = (expected - actual).abs().max().item()
+    mask_agreement = ((expected > threshold) == (actual > threshold)).float().mean().item()
+    return {"max_abs_diff": max_abs_diff, "mask_agreement": mask_agreement}
+
+
+def convert_to_grayscale(model_path, output_path, input_size=512):
+    """
+    Konversi checkpoint 3 channel menjadi model bundle 1 channel
+
+    Args:
+        model_path (str): Checkpoint asli
+        output_path (str): Path checkpoint hasil konversi
+        input_size (int): Ukuran input untuk parity check
+
+    Returns:
+        dict: Hasil parity check
+    """
+    from video_inference import load_model_bundle, save_model_bundle, device
+
+    model, metadata = load_model_bundle(model_path, map_location=device)
+    model = model.to(device).eval()
+    architecture = metadata["architecture"]
+
+    # Normalization comes from the bundle; the grayscale one is its per-channel average
+    preprocessing = metadata["preprocessing"]
+    rgb_mean, rgb_std = preprocessing["mean"], preprocessing["std"]
+    gray_mean, gray_std = (sum(rgb_mean) / 3,), (sum(rgb_std) / 3,)
+
+    converted = collapse_rgb_input(model, rgb_mean, rgb_std, gray_mean, gray_std)
+    parity = check_grayscale_parity(model, converted, rgb_mean, rgb_std, gray_mean, gray_std,
+                                    input_size, threshold=metadata["threshold"])
+
+    save_model_bundle(converted, output_path, architecture,
+                      model_config=dict(metadata["model_config"], n_channels=1),
+                      input_size=preprocessing["input_size"], mean=gray_mean, std=gray_std,
+                      threshold=metadata["threshold"], calibration=metadata["calibration"],
+                      source=model_path)
+    print(f"[OK] Single-channel {architecture} saved to: {output_path}")
+    return parity
+
+
+def check_parity(original, optimized, input_size=512, batch_size=2, channels_last=False,
+                 threshold=0.5, seed=0):
+    """
+    Bandingkan output model asli dan model hasil optimasi pada input random
+
+    Args:
+        original (nn.Module): Model asli (eval mode)
+        optimized (nn.Module): Model hasil fuse_conv_bn
+        input_size (int): Ukuran input
+        batch_size (int): Jumlah sampel
+        channels_last (bool): Input untuk model optimasi dalam channels_last
+        threshold (float): Threshold biner yang dipakai inference
+        seed (int): Seed input random
+
+    Returns:
+        dict: max_abs_diff dan mask_agreement (fraksi pixel biner yang sama)
+    """
+    from video_inference import model_input_channels
+
+    device = next(original.parameters()).device
+    generator = torch.Generator().manual_seed(seed)
+    n_channels = model_input_channels(original)
+    x = torch.randn(batch_size, n_channels, input_size, input_size, generator=generator).to(device)
+
+    with torch.no_grad():
+        expected = original.eval()(x)
+        x_optimized = x.contiguous(memory_format=torch.channels_last) if channels_last else x
+        actual = optimized(x_optimized)
+
+    max_abs_diff = (expected - actual).abs().max().item()
+    mask_agreement = ((expected > threshold) == (actual > threshold)).float().mean().item()
+    return {"max_abs_diff": max_abs_diff, "mask_agreement": mask_agreement}
+
+
+def benchmark_forward(model, input_size=512, runs=10, warmup=2, channels_last=False):
+    """
+    Ukur waktu forward pass (ms per frame, batch 1)
+
+    Returns:
+        float: Median ms per forward
+    """
+    from video_inference import model_input_channels
+
+    device = next(model.parameters()).device
+    n_channels = model_input_channels(model)
+    x = torch.randn(1, n_channels, input_size, input_size, device=device)
+    if channels_last:
+        x = x.contiguous(memory_format=torch.channels_last)
+
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + runs):
+            start = time.perf_counter()
+            model(x)
+            if device.type == "cuda":
+                torch.cuda.synchronize()
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    """Parity check dan benchmark before/after Conv-BN folding"""
+    parser = argparse.ArgumentParser(description='Conv-BN folding for UNetCompatible: parity check and benchmark')
+    parser.add_argument('--model', type=str, default=None,
+                       help='Checkpoint to load (default: random weights with randomized BatchNorm statistics)')
+    parser.add_argument('--input_size', type=int, default=512)
+    parser.add_argument('--channels_last', action='store_true')
+    parser.add_argument('--runs', type=int, default=10, help='Timed forward passes per model')
+    parser.add_argument('--atol', type=float, default=1e-3, help='Maximum allowed absolute logit difference')
+    parser.add_argument('--to_grayscale', type=str, default=None, metavar='OUTPUT',
+                       help='Convert --model to a single-channel checkpoint saved at OUTPUT')
+    args = parser.parse_args()
+
+    if args.to_grayscale:
+        if not args.model:
+            print("[ERROR] --to_grayscale requires --model")
+            raise SystemExit(1)
+        parity = convert_to_grayscale(args.model, args.to_grayscale, args.input_size)
+        print(f"Parity vs RGB model on grayscale input: max |diff| = {parity['max_abs_diff']:.2e}, "
+              f"mask agreement = {parity['mask_agreement'] * 100:.4f}%")
+        return
+
+    from video_inference import UNetCompatible, load_model_bundle, model_input_channels, device, IMAGENET_MEAN, IMAGENET_STD, \
+        GRAYSCALE_MEAN, GRAYSCALE_STD
+
+    if args.model:
+        model = load_model_bundle(args.model, map_location=device)[0].to(device)
+    else:
+        model = UNetCompatible().to(device)
+        # Non-trivial BatchNorm statistics so the fold is actually exercised
+        torch.manual_seed(0)
+        for module in model.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.5, 0.5)
+                module.running_var.uniform_(0.5, 2.0)
+                module.weight.data.uniform_(0.5, 1.5)
+                module.bias.data.uniform_(-0.2, 0.2)
+    model.eval()
+
+    fused, folded = fuse_conv_bn(model, channels_last=args.channels_last)
+    print(f"[OK] Folded {folded} Conv2d+BatchNorm2d pairs")
+
+    parity = check_parity(model, fused, args.input_size, channels_last=args.channels_last)
+    print(f"Parity: max |diff| = {parity['max_abs_diff']:.2e}, "
+          f"mask agreement = {parity['mask_agreement'] * 100:.4f}%")
+
+    before = benchmark_forward(model, args.input_size, args.runs)
+    after = benchmark_forward(fused, args.input_size, args.runs, channels_last=args.channels_last)
+    print(f"Forward {args.input_size}x{args.input_size} on {device}: "
+          f"{before:.1f} ms -> {after:.1f} ms ({before / after:.2f}x)")
+
+    if parity["max_abs_diff"] > args.atol:
+        print(f"[ERROR] Parity check failed (atol {args.atol})")
+        raise SystemExit(1)
+    print("[OK] Parity check passed")
+
+    if not args.model:
+        # Grayscale conversion self-check: the 1-channel model must match the RGB model on gray frames
+        gray_model = collapse_rgb_input(model, IMAGENET_MEAN, IMAGENET_STD, GRAYSCALE_MEAN, GRAYSCALE_STD)
+        if model_input_channels(gray_model) != 1:
+            print("[ERROR] Grayscale conversion did not produce a 1-channel input")
+            raise SystemExit(1)
+        gray_parity = check_grayscale_parity(model, gray_model, IMAGENET_MEAN, IMAGENET_STD,
+                                             GRAYSCALE_MEAN, GRAYSCALE_STD, args.input_size)
+        print(f"Grayscale parity: max |diff| = {gray_parity['max_abs_diff']:.2e}, "
+              f"mask agreement = {gray_parity['mask_agreement'] * 100:.4f}%")
+        # Zero padding at the border differs between the normalizations, so compare the masks
+        if gray_parity["mask_agreement"] < 0.999:
+            print("[ERROR] Grayscale parity check failed")
+            raise SystemExit(1)
+        print("[OK] Grayscale parity check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Inference Profiler untuk Segmentasi Karotis
+Timer per tahap (decode, preprocess, forward, postprocess, diameter, overlay, encode)
+dengan overhead rendah: setiap durasi hanya di-append ke list, statistik
+(p50/p95/p99/total) dihitung sekali di akhir run dan disimpan sebagai JSON run report.
+"""
+
+import json
+import os
+import platform
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+class StageTimer:
+    """Kumpulkan durasi per tahap inference"""
+
+    def __init__(self):
+        self.samples = {}
+        self.order = []
+        self._last = None
+        self._current = []
+
+    def start(self):
+        """Mulai (atau reset) titik acuan untuk mark(); tahap yang dicatat sesudahnya masuk last_ms()"""
+        self._current = []
+        self._last = time.perf_counter()
+        return self._last
+
+    def mark(self, stage):
+        """
+        Catat durasi sejak start()/mark() sebelumnya sebagai tahap `stage`
+
+        Args:
+            stage (str): Nama tahap
+
+        Returns:
+            float: Durasi tahap dalam detik
+        """
+        now = time.perf_counter()
+        if self._last is None:
+            self._last = now
+        elapsed = now - self._last
+        self._last = now
+        self.record(stage, elapsed)
+        return elapsed
+
+    def record(self, stage, seconds):
+        """Tambahkan satu sampel durasi (detik) untuk tahap `stage`"""
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = []
+            self.order.append(stage)
+        samples.append(seconds)
+        if stage not in self._current:
+            self._current.append(stage)
+
+    def last_ms(self):
+        """
+        Durasi per tahap dalam ms untuk tahap yang dicatat sejak start() terakhir (untuk event
+        progress); tahap yang dilewati frame ini (overlay, mask, refine, ...) tidak ikut
+        """
+        return {stage: round(self.samples[stage][-1] * 1000, 3) for stage in self._current}
+
+    def summary(self):
+        """
+        Statistik latency per tahap
+
+        Returns:
+            dict: {stage: {count, total_ms, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, share}}
+        """
+        totals = {stage: float(np.sum(self.samples[stage])) for stage in self.order}
+        grand_total = sum(totals.values())
+
+        stats = {}
+        for stage in self.order:
+            values_ms = np.asarray(self.samples[stage], dtype=np.float64) * 1000
+            p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+            stats[stage] = {
+                "count": int(values_ms.size),
+                "total_ms": round(totals[stage] * 1000, 3),
+                "mean_ms": round(float(values_ms.mean()), 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(values_ms.max()), 3),
+                "share": round(totals[stage] / grand_total, 4) if grand_total > 0 else 0.0
+            }
+        return stats
+
+    def format_table(self):
+        """Ringkasan statistik sebagai tabel teks untuk console"""
+        lines = [f"{'Stage':<12} {'p50':>9} {'p95':>9} {'p99':>9} {'total':>11} {'share':>7}"]
+        for stage, s in self.summary().items():
+            lines.append(f"{stage:<12} {s['p50_ms']:>7.2f}ms {s['p95_ms']:>7.2f}ms {s['p99_ms']:>7.2f}ms "
+                         f"{s['total_ms'] / 1000:>10.2f}s {s['share'] * 100:>6.1f}%")
+        return "\n".join(lines)
+
+
+def write_run_report(report_path, timer, **info):
+    """
+    Simpan JSON run report (info run + statistik per tahap)
+
+    Args:
+        report_path (str): Path file JSON
+        timer (StageTimer): Timer yang sudah berisi sampel
+        **info: Informasi tambahan (video, frames, elapsed_seconds, fps, ...)
+
+    Returns:
+        dict: Isi report
+    """
+    import torch
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads()
+    }
+    report.update(info)
+    report["stages"] = timer.summary()
+
+    report_dir = os.path.dirname(report_path)
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,435 @@
+"""
+Inference Service untuk Segmentasi Karotis
+Service lokal yang berjalan terus (HTTP di localhost) dan menjaga VideoProcessor
+tetap ter-load, sehingga GUI dan main.py tidak perlu memulai interpreter, torch
+dan model baru untuk setiap subjek. Job disimpan di JobQueue (SQLite), jadi
+service ini juga berfungsi sebagai worker untuk antrian tersebut.
+
+Endpoint:
+    GET  /health              - status service dan model yang sudah ter-load
+    GET  /jobs                - daftar semua job
+    POST /jobs                - submit job baru {"subject", "model_path", "use_pressure", "priority"}
+    GET  /jobs/<id>           - status dan output paths dari satu job
+    GET  /jobs/<id>/stream    - stream output dan event progress (JSON lines) sampai job selesai
+    POST /shutdown            - hentikan service
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from job_queue import JobQueue, QueueWorker, DEFAULT_DB_PATH, FINAL_STATUSES
+from inference_events import parse_event
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MODEL_PATH = "UNet_25Mei_Sore.pth"
+MAX_KEPT_LOGS = 50  # output of the most recent jobs kept in memory for streaming
+
+
+class InferenceService:
+    """Service yang menyimpan model ter-load dan mengerjakan job inference dari JobQueue"""
+
+    def __init__(self, job_queue, default_model_path=DEFAULT_MODEL_PATH):
+        """
+        Initialize InferenceService
+
+        Args:
+            job_queue (JobQueue): Antrian persisten tempat job disimpan
+            default_model_path (str): Model yang dipakai jika job tidak menyebutkan model
+        """
+        self.queue = job_queue
+        self.default_model_path = default_model_path
+        self.logs = OrderedDict()  # job_id -> stream items (output lines and events) of jobs run here
+        self.condition = threading.Condition()
+        self.started_at = datetime.now().isoformat()
+
+        # One worker thread: the loaded model is shared, so jobs run one at a time
+        self.worker = QueueWorker(job_queue, worker_id=f"service:{os.getpid()}",
+                                  kinds=("inference", "comparison"), poll_interval=1.0,
+                                  on_line=self.append_log, on_event=self.append_event)
+        self.worker_thread = threading.Thread(target=self.worker.run, daemon=True)
+        self.worker_thread.start()
+
+    def get_processor(self, model_path):
+        """Ambil VideoProcessor dari cache worker (load sekali per model)"""
+        return self.worker.get_processor(model_path)
+
+    def submit(self, subject, model_path=None, use_pressure=False, priority=0, output_options=None):
+        """
+        Tambahkan job inference ke antrian
+
+        Args:
+            output_options (dict): Opsi output video/mask untuk process_selected_subject (optional)
+
+        Returns:
+            dict: Snapshot job yang baru dibuat
+        """
+        payload = {
+            "subject": subject,
+            "model_path": model_path or os.path.abspath(self.default_model_path),
+            "use_pressure": bool(use_pressure)
+        }
+        if output_options:
+            payload["output_options"] = output_options
+        job_id = self.queue.enqueue("inference", payload, priority=priority)
+        return self.snapshot(self.queue.get(job_id))
+
+    def _append_item(self, job_id, item):
+        with self.condition:
+            if job_id not in self.logs:
+                self.logs[job_id] = []
+                while len(self.logs) > MAX_KEPT_LOGS:
+                    self.logs.popitem(last=False)
+            self.logs[job_id].append(item)
+            self.condition.notify_all()
+
+    def append_log(self, job, line):
+        """Simpan satu baris output job dan bangunkan client yang sedang stream"""
+        self._append_item(job["id"], {"type": "log", "line": line})
+
+    def append_event(self, job, event):
+        """Simpan satu event progress terstruktur (fps, ETA, latency) untuk di-stream"""
+        self._append_item(job["id"], {"type": "event", "event": event})
+
+    def snapshot(self, job, include_log=False):
+        """Ringkasan job yang aman untuk dikirim sebagai JSON"""
+        result = job["result"] or {}
+        data = {
+            "id": job["id"],
+            "kind": job["kind"],
+            "subject": job["payload"].get("subject"),
+            "model_path": job["payload"].get("model_path"),
+            "use_pressure": job["payload"].get("use_pressure", False),
+            "status": job["status"],
+            "priority": job["priority"],
+            "attempts": job["attempts"],
+            "progress": job["progress"],
+            "message": result.get("message") or job["error"] or "",
+            "output_paths": result.get("output_paths", {}),
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"]
+        }
+        if include_log:
+            with self.condition:
+                data["log"] = [item["line"] for item in self.logs.get(job["id"], []) if item["type"] == "log"]
+        return data
+
+    def iter_events(self, job_id, poll_seconds=1.0):
+        """
+        Generator event progress untuk satu job sampai job selesai
+
+        Yields:
+            dict: {"type": "log", "line": ...}, {"type": "event", "event": {...}}
+                lalu {"type": "result", ...}
+        """
+        sent = 0
+        last_progress = None
+        while True:
+            job = self.queue.get(job_id)
+            finished = job["status"] in FINAL_STATUSES
+
+            with self.condition:
+                local = job_id in self.logs
+                items = self.logs.get(job_id, [])
+                if sent >= len(items) and not finished:
+                    self.condition.wait(poll_seconds)
+                new_items = items[sent:]
+            sent += len(new_items)
+
+            if not local and sent == 0 and job["progress"] and job["progress"] != last_progress:
+                # Job runs in another worker process; only its latest progress is known
+                last_progress = job["progress"]
+                event = parse_event(job["progress"])
+                new_items = [{"type": "event", "event": event} if event else
+                             {"type": "log", "line": job["progress"]}]
+
+            for item in new_items:
+                yield item
+
+            if finished:
+                # The log stays for other streamers and GET /jobs/<id> until MAX_KEPT_LOGS evicts it
+                yield dict(self.snapshot(job), type="result")
+                return
+            if not new_items:
+                # Keep-alive so clients can detect a dead connection
+                yield {"type": "heartbeat", "status": job["status"]}
+
+    def health(self):
+        """Ringkasan status service"""
+        stats = self.queue.stats()
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "working_dir": os.getcwd(),
+            "started_at": self.started_at,
+            "queue_db": os.path.abspath(self.queue.db_path),
+            "loaded_models": list(self.worker.processors.keys()),
+            "queued": stats["depth"],
+            "running": stats["counts"].get("running", 0)
+        }
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler untuk InferenceService"""
+
+    server_version = "CarotidInference/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        # Keep stdout clean for job logs; request logs go to stderr
+        sys.stderr.write(f"[SERVICE] {self.address_string()} - {format % args}\n")
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+
+        if parts == ["health"]:
+            self.send_json(self.service.health())
+        elif parts == ["jobs"]:
+            jobs = [self.service.snapshot(job) for job in self.service.queue.list_jobs()]
+            self.send_json({"jobs": jobs})
+        elif len(parts) >= 2 and parts[0] == "jobs":
+            job = self.service.queue.get(int(parts[1])) if parts[1].isdigit() else None
+            if job is None:
+                self.send_json({"error": f"Unknown job: {parts[1]}"}, status=404)
+            elif len(parts) == 2:
+                self.send_json(self.service.snapshot(job, include_log=True))
+            elif parts[2:] == ["stream"]:
+                self.stream_job(job["id"])
+            else:
+                self.send_json({"error": f"Unknown path: {self.path}"}, status=404)
+        else:
+            self.send_json({"error": f"Unknown path: {self.path}"}, status=404)
+
+    def do_POST(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+
+        if parts == ["jobs"]:
+            try:
+                payload = self.read_json()
+            except ValueError as e:
+                self.send_json({"error": f"Invalid JSON: {e}"}, status=400)
+                return
+
+            subject = payload.get("subject")
+            if not subject:
+                self.send_json({"error": "Field 'subject' is required"}, status=400)
+                return
+
+            job = self.service.submit(subject,
+                                      model_path=payload.get("model_path"),
+                                      use_pressure=payload.get("use_pressure", False),
+                                      priority=int(payload.get("priority", 0)),
+                                      output_options=payload.get("output_options"))
+            self.send_json(job, status=202)
+        elif parts == ["shutdown"]:
+            self.send_json({"status": "shutting down"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self.send_json({"error": f"Unknown path: {self.path}"}, status=404)
+
+    def stream_job(self, job_id):
+        """Kirim event progress sebagai JSON lines sampai job selesai"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            for event in self.service.iter_events(job_id):
+                self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class InferenceClient:
+    """Client ringan untuk InferenceService, dipakai oleh GUI dan main.py"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=5):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.base_url = f"http://{host}:{port}"
+
+    def _request(self, method, path, payload=None, timeout=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def is_running(self):
+        """Cek apakah service sudah berjalan"""
+        try:
+            return self._request("GET", "/health").get("status") == "ok"
+        except (urllib.error.URLError, OSError, ValueError):
+            return False
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def ensure_service(self, wait_seconds=120):
+        """
+        Pastikan service berjalan, start sebagai proses background jika belum
+
+        Args:
+            wait_seconds (int): Batas waktu menunggu service siap
+
+        Returns:
+            bool: True jika service siap dipakai
+        """
+        if self.is_running():
+            return True
+
+        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_service.py")
+        kwargs = {}
+        if os.name == 'nt':
+            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+        else:
+            kwargs["start_new_session"] = True
+        subprocess.Popen([sys.executable, script_path, "--host", self.host, "--port", str(self.port)],
+                         cwd=os.getcwd(), **kwargs)
+
+        deadline = time.time() + wait_seconds
+        while time.time() < deadline:
+            if self.is_running():
+                return True
+            time.sleep(0.5)
+        return False
+
+    def submit(self, subject, model_path=None, use_pressure=False, priority=0, output_options=None):
+        """
+        Submit job inference ke antrian service
+
+        Returns:
+            int: ID job
+        """
+        payload = {"subject": subject, "use_pressure": bool(use_pressure), "priority": priority}
+        if model_path:
+            payload["model_path"] = os.path.abspath(model_path)
+        if output_options:
+            payload["output_options"] = output_options
+        return self._request("POST", "/jobs", payload)["id"]
+
+    def get_job(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def stream(self, job_id):
+        """
+        Generator event progress dari service
+
+        Yields:
+            dict: Event dengan key "type" ("log", "heartbeat" atau "result")
+        """
+        request = urllib.request.Request(f"{self.base_url}/jobs/{job_id}/stream")
+        with urllib.request.urlopen(request) as response:
+            for raw_line in response:
+                line = raw_line.decode("utf-8").strip()
+                if line:
+                    yield json.loads(line)
+
+    def run(self, subject, model_path=None, use_pressure=False, on_line=None, on_event=None,
+            output_options=None):
+        """
+        Submit job lalu tunggu sampai selesai
+
+        Args:
+            output_options (dict): Opsi output video/mask (optional)
+            on_line (callable): Dipanggil untuk setiap baris output (optional)
+            on_event (callable): Dipanggil untuk setiap event progress terstruktur (optional)
+
+        Returns:
+            dict: Snapshot job terakhir (status "done" jika sukses, plus message dan output_paths)
+        """
+        job_id = self.submit(subject, model_path=model_path, use_pressure=use_pressure,
+                             output_options=output_options)
+        result = None
+        for event in self.stream(job_id):
+            if event["type"] == "log" and on_line:
+                on_line(event["line"])
+            elif event["type"] == "event" and on_event:
+                on_event(event["event"])
+            elif event["type"] == "result":
+                result = event
+        return result or self.get_job(job_id)
+
+    def shutdown(self):
+        return self._request("POST", "/shutdown")
+
+
+def main():
+    """Main function untuk menjalankan inference service"""
+    parser = argparse.ArgumentParser(description='Persistent Inference Service for Carotid Segmentation')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                       help=f'Host to bind (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                       help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH,
+                       help=f'Model to preload (default: {DEFAULT_MODEL_PATH})')
+    parser.add_argument('--db', type=str, default=DEFAULT_DB_PATH,
+                       help=f'Job queue database (default: {DEFAULT_DB_PATH})')
+    args = parser.parse_args()
+
+    # Service runs without a display; plots are only saved to disk
+    import matplotlib
+    matplotlib.use('Agg')
+
+    job_queue = JobQueue(args.db)
+    recovered = job_queue.requeue_stale()
+    if recovered:
+        print(f"[INFO] Recovered {recovered} jobs left running by a previous worker")
+
+    service = InferenceService(job_queue, default_model_path=args.model)
+
+    # Preload the default model so the first job does not pay the startup cost
+    if os.path.exists(args.model):
+        try:
+            service.get_processor(args.model)
+        except Exception as e:
+            print(f"[WARN] Could not preload model {args.model}: {e}")
+    else:
+        print(f"[WARN] Default model not found: {args.model} (will load on first job)")
+
+    server = ThreadingHTTPServer((args.host, args.port), InferenceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+
+    print(f"[OK] Inference service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[STOP] Inference service stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
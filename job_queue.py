@@ -0,0 +1,680 @@
+"""
+Job Queue untuk Inference dan Analytics
+Antrian job berbasis SQLite yang tetap tersimpan walaupun GUI ditutup atau
+proses crash. Mendukung prioritas, retry, timing per job, dan beberapa worker
+process yang mengambil job secara bersamaan.
+
+Contoh CLI:
+    python job_queue.py enqueue --subject Subjek1 --use_pressure
+    python job_queue.py enqueue --kind analytics --subject 3 --priority 5
+    python job_queue.py worker --workers 2
+    python job_queue.py status
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_DB_PATH = "job_queue.db"
+DEFAULT_MODEL_PATH = "UNet_25Mei_Sore.pth"
+JOB_KINDS = ("inference", "analytics", "comparison")
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_retries INTEGER NOT NULL DEFAULT 2,
+    worker TEXT,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority DESC, available_at, id);
+"""
+
+
+class PermanentJobError(RuntimeError):
+    """Error yang tidak akan hilang dengan retry (misalnya file input tidak ada)"""
+
+
+def _json_default(value):
+    """Konversi nilai numpy/datetime ke tipe yang bisa di-serialize JSON"""
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class JobQueue:
+    """Antrian job persisten berbasis SQLite"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        """
+        Initialize JobQueue
+
+        Args:
+            db_path (str): Path ke file database SQLite
+        """
+        self.db_path = db_path
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        # Autocommit connection that is always closed, even on errors
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"]) if job["payload"] else {}
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        if job["started_at"] and job["finished_at"]:
+            job["duration"] = job["finished_at"] - job["started_at"]
+        else:
+            job["duration"] = None
+        return job
+
+    def enqueue(self, kind, payload, priority=0, max_retries=2):
+        """
+        Tambahkan job ke antrian
+
+        Args:
+            kind (str): Jenis job ("inference", "analytics" atau "comparison")
+            payload (dict): Parameter job
+            priority (int): Prioritas, nilai lebih besar diambil lebih dulu
+            max_retries (int): Jumlah retry setelah percobaan pertama gagal
+
+        Returns:
+            int: ID job
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind} (expected one of {JOB_KINDS})")
+
+        now = time.time()
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, payload, priority, max_retries, created_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), int(priority), int(max_retries), now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id, kinds=None):
+        """
+        Ambil satu job siap jalan secara atomik (aman untuk banyak worker)
+
+        Args:
+            worker_id (str): Identitas worker
+            kinds (tuple): Batasi jenis job yang diambil (optional)
+
+        Returns:
+            dict: Job yang diambil, atau None jika antrian kosong
+        """
+        kinds = tuple(kinds or JOB_KINDS)
+        placeholders = ",".join("?" * len(kinds))
+        now = time.time()
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE status = 'queued' AND available_at <= ? "
+                f"AND kind IN ({placeholders}) ORDER BY priority DESC, available_at, id LIMIT 1",
+                (now, *kinds)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, "
+                "started_at = ?, heartbeat_at = ?, finished_at = NULL, progress = NULL WHERE id = ?",
+                (worker_id, now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            return self._row_to_job(job)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _owner_clause(self, worker_id):
+        # Only the attempt that claimed the job may update it (a requeued attempt is superseded)
+        if worker_id is None:
+            return "", ()
+        return " AND status = 'running' AND worker = ?", (worker_id,)
+
+    def update_progress(self, job_id, message, worker_id=None):
+        """Simpan progress terakhir dan perbarui heartbeat job yang sedang berjalan"""
+        clause, params = self._owner_clause(worker_id)
+        with self._connection() as conn:
+            conn.execute("UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ? AND status = 'running'" + clause,
+                         (message, time.time(), job_id, *params))
+
+    def heartbeat(self, job_id, worker_id):
+        """
+        Perbarui heartbeat job yang sedang dijalankan worker_id
+
+        Returns:
+            bool: False jika job tidak lagi dipegang worker ini (di-requeue atau dibatalkan)
+        """
+        with self._connection() as conn:
+            cursor = conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running' AND worker = ?",
+                                  (time.time(), job_id, worker_id))
+            return cursor.rowcount > 0
+
+    def complete(self, job_id, result=None, worker_id=None):
+        """
+        Tandai job selesai dengan sukses
+
+        Args:
+            worker_id (str): Jika diberikan, hanya berlaku jika job masih 'running' di worker ini
+
+        Returns:
+            bool: True jika status job diperbarui
+        """
+        clause, params = self._owner_clause(worker_id)
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ? WHERE id = ?" + clause,
+                (json.dumps(result, default=_json_default), time.time(), job_id, *params))
+            return cursor.rowcount > 0
+
+    def fail(self, job_id, error, retry_delay=30, retry=True, worker_id=None):
+        """
+        Tandai job gagal, job dikembalikan ke antrian selama jatah retry masih ada
+
+        Args:
+            job_id (int): ID job
+            error (str): Pesan error
+            retry_delay (float): Jeda (detik) sebelum retry, dikali jumlah percobaan
+            retry (bool): False untuk langsung menandai gagal tanpa retry
+            worker_id (str): Jika diberikan, hanya berlaku jika job masih 'running' di worker ini
+
+        Returns:
+            str: Status baru job ("queued" atau "failed"), None jika job tidak diperbarui
+        """
+        now = time.time()
+        clause, params = self._owner_clause(worker_id)
+        with self._connection() as conn:
+            row = conn.execute("SELECT attempts, max_retries FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if retry and row["attempts"] <= row["max_retries"]:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, available_at = ? WHERE id = ?" + clause,
+                    (str(error), now + retry_delay * row["attempts"], job_id, *params)
+                )
+                return "queued" if cursor.rowcount else None
+            cursor = conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?" + clause,
+                                  (str(error), now, job_id, *params))
+            return "failed" if cursor.rowcount else None
+
+    def cancel(self, job_id):
+        """Batalkan job yang belum berjalan. Returns True jika berhasil dibatalkan"""
+        with self._connection() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                                  "WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+            return cursor.rowcount > 0
+
+    def requeue_stale(self, stale_seconds=600):
+        """
+        Kembalikan job 'running' yang worker-nya berhenti mengirim heartbeat (crash)
+
+        Worker mengirim heartbeat dari thread terpisah selama job berjalan (lihat
+        QueueWorker.heartbeat_interval), jadi job yang lama tidak mencetak output tidak ikut.
+
+        Returns:
+            int: Jumlah job yang dikembalikan ke antrian atau ditandai gagal
+        """
+        cutoff = time.time() - stale_seconds
+        with self._connection() as conn:
+            stale = [(row["id"], row["worker"]) for row in conn.execute(
+                "SELECT id, worker FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (cutoff,))]
+        recovered = 0
+        for job_id, worker_id in stale:
+            if self.fail(job_id, f"Worker stopped responding for more than {stale_seconds}s", retry_delay=0,
+                         worker_id=worker_id) is not None:
+                recovered += 1
+        return recovered
+
+    def get(self, job_id):
+        """Ambil satu job berdasarkan ID"""
+        with self._connection() as conn:
+            return self._row_to_job(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list_jobs(self, status=None, limit=50):
+        """Daftar job terbaru, bisa difilter berdasarkan status"""
+        with self._connection() as conn:
+            if status:
+                rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?",
+                                    (status, limit)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def stats(self, window_seconds=3600):
+        """
+        Statistik antrian: kedalaman per status dan throughput
+
+        Args:
+            window_seconds (int): Jendela waktu untuk menghitung throughput
+
+        Returns:
+            dict: Ringkasan statistik
+        """
+        since = time.time() - window_seconds
+        with self._connection() as conn:
+            counts = {row["status"]: row["n"] for row in conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+            finished = conn.execute(
+                "SELECT kind, COUNT(*) AS n, AVG(finished_at - started_at) AS avg_run, "
+                "AVG(started_at - created_at) AS avg_wait FROM jobs "
+                "WHERE status = 'done' AND finished_at >= ? GROUP BY kind", (since,)).fetchall()
+            workers = conn.execute(
+                "SELECT COUNT(DISTINCT worker) AS n FROM jobs WHERE status = 'running'").fetchone()["n"]
+
+        per_kind = {}
+        total_done = 0
+        for row in finished:
+            total_done += row["n"]
+            per_kind[row["kind"]] = {
+                "done": row["n"],
+                "avg_run_seconds": row["avg_run"],
+                "avg_wait_seconds": row["avg_wait"]
+            }
+
+        return {
+            "depth": counts.get("queued", 0),
+            "counts": counts,
+            "active_workers": workers,
+            "window_seconds": window_seconds,
+            "done_in_window": total_done,
+            "jobs_per_hour": total_done * 3600.0 / window_seconds,
+            "per_kind": per_kind
+        }
+
+
+class _ProgressWriter:
+    """Stream pengganti stdout yang meneruskan setiap baris output ke callback"""
+
+    def __init__(self, callback, original):
+        self.callback = callback
+        self.original = original
+        self.thread = threading.current_thread()
+        self.buffer = ""
+
+    def write(self, text):
+        self.original.write(text)
+        if threading.current_thread() is not self.thread:
+            # Output from other threads is not part of the job
+            return len(text)
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            if line.strip():
+                self.callback(line)
+        return len(text)
+
+    def flush(self):
+        self.original.flush()
+
+
+class QueueWorker:
+    """Worker yang mengambil dan menjalankan job dari JobQueue"""
+
+    def __init__(self, job_queue, worker_id=None, kinds=None, poll_interval=2.0,
+                 progress_interval=1.0, on_line=None, on_event=None, heartbeat_interval=30.0):
+        """
+        Initialize QueueWorker
+
+        Args:
+            job_queue (JobQueue): Antrian yang dikerjakan
+            worker_id (str): Identitas worker (default: host:pid:thread)
+            kinds (tuple): Jenis job yang dikerjakan (default: semua)
+            poll_interval (float): Jeda polling saat antrian kosong (detik)
+            progress_interval (float): Jeda minimum antar update progress ke database
+            on_line (callable): Dipanggil untuk setiap baris output job (optional)
+            on_event (callable): Dipanggil untuk setiap event progress terstruktur (optional)
+            heartbeat_interval (float): Jeda heartbeat (detik) selama job berjalan, terpisah dari output job
+        """
+        self.queue = job_queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.kinds = tuple(kinds or JOB_KINDS)
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.on_line = on_line
+        self.on_event = on_event
+        self.heartbeat_interval = heartbeat_interval
+        self.processors = {}  # model_path -> VideoProcessor
+        self.processors_lock = threading.Lock()  # the service preloads models from another thread
+        self.running = True
+
+    def get_processor(self, model_path):
+        """Ambil VideoProcessor dari cache, load model hanya sekali per worker"""
+        model_path = os.path.abspath(model_path)
+        with self.processors_lock:
+            if model_path not in self.processors:
+                from video_inference import VideoProcessor
+                self.processors[model_path] = VideoProcessor(model_path)
+            return self.processors[model_path]
+
+    def handle(self, job, progress_callback=None):
+        """
+        Jalankan satu job sesuai jenisnya
+
+        Args:
+            job (dict): Job yang sudah di-claim
+            progress_callback (callable): Penerima event progress inference (optional)
+
+        Returns:
+            dict: Hasil job (disimpan di kolom result)
+
+        Raises:
+            PermanentJobError: Jika input job tidak valid (tidak di-retry)
+            RuntimeError: Jika job gagal dan perlu di-retry
+        """
+        payload = job["payload"]
+
+        if job["kind"] == "inference":
+            from video_inference import process_selected_subject, build_subject_paths
+
+            model_path = payload.get("model_path") or DEFAULT_MODEL_PATH
+            if not os.path.exists(model_path):
+                raise PermanentJobError(f"Model file not found: {model_path}")
+            video_path = build_subject_paths(payload["subject"])["video"]
+            if not os.path.exists(video_path):
+                raise PermanentJobError(f"Video file not found: {video_path}")
+
+            result = process_selected_subject(payload["subject"],
+                                              use_pressure=payload.get("use_pressure", False),
+                                              processor=self.get_processor(model_path),
+                                              progress_callback=progress_callback,
+                                              output_options=payload.get("output_options"))
+            if result["status"] != "success":
+                raise RuntimeError(result["message"])
+            return result
+
+        if job["kind"] == "comparison":
+            from model_comparison import compare_subject_models
+
+            model_paths = [os.path.abspath(path) for path in payload.get("model_paths", [])]
+            if len(model_paths) < 2:
+                raise PermanentJobError("Model comparison needs at least two models")
+            missing = [path for path in model_paths if not os.path.exists(path)]
+            if missing:
+                raise PermanentJobError(f"Model file not found: {missing[0]}")
+
+            processors = {path: self.get_processor(path) for path in model_paths}
+            return compare_subject_models(payload["subject"], model_paths, processors=processors,
+                                          progress_callback=progress_callback)
+
+        if job["kind"] == "analytics":
+            from advanced_analytics import AdvancedAnalytics
+
+            subject_number = int(re.sub(r"\D", "", str(payload["subject"])))
+            return AdvancedAnalytics().generate_comprehensive_report(subject_number)
+
+        raise RuntimeError(f"Unknown job kind: {job['kind']}")
+
+    def run_job(self, job):
+        """Jalankan job yang sudah di-claim dan catat hasilnya ke antrian"""
+        state = {"last_update": 0.0, "has_events": False}
+
+        def store_progress(message, force=False):
+            now = time.time()
+            if force or now - state["last_update"] >= self.progress_interval:
+                state["last_update"] = now
+                self.queue.update_progress(job["id"], message, worker_id=job["worker"])
+
+        def report(line):
+            if self.on_line:
+                self.on_line(job, line)
+            # Structured events are a better progress source than printed lines
+            if not state["has_events"]:
+                store_progress(line)
+
+        def report_event(event):
+            state["has_events"] = True
+            if self.on_event:
+                self.on_event(job, event)
+            # The latest event is stored as JSON so any client can render fps/ETA
+            store_progress(json.dumps(event), force=event.get("event") != "frame")
+
+        # Heartbeat while the job runs, also when it prints nothing for a long time
+        stop_heartbeat = threading.Event()
+
+        def send_heartbeats():
+            while not stop_heartbeat.wait(self.heartbeat_interval):
+                try:
+                    self.queue.heartbeat(job["id"], job["worker"])
+                except sqlite3.Error:
+                    pass  # next beat retries; a missed one only matters after stale_seconds
+
+        heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeat_thread.start()
+
+        original_stdout = sys.stdout
+        sys.stdout = _ProgressWriter(report, original_stdout)
+        try:
+            result = self.handle(job, progress_callback=report_event)
+        except Exception as e:
+            sys.stdout = original_stdout
+            stop_heartbeat.set()
+            status = self.queue.fail(job["id"], str(e), retry=not isinstance(e, PermanentJobError),
+                                     worker_id=job["worker"])
+            if status is None:
+                print(f"[WARN] Job {job['id']} ({job['kind']}) failed after it was taken over: {e}")
+            else:
+                print(f"[ERROR] Job {job['id']} ({job['kind']}) failed: {e} -> {status}")
+            return False
+        else:
+            sys.stdout = original_stdout
+            stop_heartbeat.set()
+
+        if not self.queue.complete(job["id"], result, worker_id=job["worker"]):
+            print(f"[WARN] Job {job['id']} ({job['kind']}) finished but was requeued or cancelled meanwhile "
+                  f"- result discarded")
+            return False
+        print(f"[OK] Job {job['id']} ({job['kind']}) completed")
+        return True
+
+    def run(self, max_jobs=None, exit_when_empty=False):
+        """
+        Loop utama worker
+
+        Args:
+            max_jobs (int): Berhenti setelah sejumlah job (optional)
+            exit_when_empty (bool): Berhenti saat antrian kosong
+
+        Returns:
+            int: Jumlah job yang dijalankan
+        """
+        processed = 0
+        while self.running:
+            job = self.queue.claim(self.worker_id, kinds=self.kinds)
+            if job is None:
+                if exit_when_empty:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+
+            print(f"[INFO] Worker {self.worker_id} running job {job['id']} "
+                  f"({job['kind']}, attempt {job['attempts']}/{job['max_retries'] + 1})")
+            self.run_job(job)
+            processed += 1
+            if max_jobs is not None and processed >= max_jobs:
+                break
+        return processed
+
+    def stop(self):
+        """Minta worker berhenti setelah job yang sedang berjalan selesai"""
+        self.running = False
+
+
+def _worker_process(db_path, kinds, threads, exit_when_empty):
+    """Entry point untuk worker process"""
+    # Worker processes run without a display; plots are only saved to disk
+    import matplotlib
+    matplotlib.use('Agg')
+
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+    worker = QueueWorker(JobQueue(db_path), kinds=kinds)
+    try:
+        worker.run(exit_when_empty=exit_when_empty)
+    except KeyboardInterrupt:
+        pass
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S") if timestamp else "-"
+
+
+def print_status(job_queue, window_seconds=3600, limit=10):
+    """Tampilkan kedalaman antrian, throughput dan job terbaru"""
+    stats = job_queue.stats(window_seconds)
+
+    print("=== Job Queue Status ===")
+    print(f"Database: {job_queue.db_path}")
+    print(f"Queue depth: {stats['depth']} queued | {stats['counts'].get('running', 0)} running "
+          f"({stats['active_workers']} workers)")
+    counts = ", ".join(f"{k}={v}" for k, v in sorted(stats["counts"].items()))
+    print(f"Counts: {counts or '-'}")
+    print(f"Throughput (last {window_seconds // 60} min): {stats['done_in_window']} jobs "
+          f"({stats['jobs_per_hour']:.1f} jobs/hour)")
+    for kind, info in stats["per_kind"].items():
+        print(f"  {kind:<10} done={info['done']} avg_run={info['avg_run_seconds']:.1f}s "
+              f"avg_wait={info['avg_wait_seconds']:.1f}s")
+
+    jobs = job_queue.list_jobs(limit=limit)
+    if jobs:
+        print(f"\nLatest {len(jobs)} jobs:")
+        for job in jobs:
+            duration = f"{job['duration']:.1f}s" if job["duration"] is not None else "-"
+            print(f"  #{job['id']:<5} {job['kind']:<10} {job['status']:<10} prio={job['priority']:<3} "
+                  f"try={job['attempts']}/{job['max_retries'] + 1} {duration:>8}  "
+                  f"{json.dumps(job['payload'])}  {_format_time(job['created_at'])}")
+            if job["status"] in ("failed", "queued") and job["error"]:
+                print(f"         last error: {job['error']}")
+
+
+def main():
+    """Main function untuk CLI job queue"""
+    parser = argparse.ArgumentParser(description='Durable Job Queue for Carotid Segmentation')
+    parser.add_argument('--db', type=str, default=DEFAULT_DB_PATH,
+                       help=f'Queue database path (default: {DEFAULT_DB_PATH})')
+    subparsers = parser.add_subparsers(dest='command')
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Add a job to the queue')
+    enqueue_parser.add_argument('--kind', choices=JOB_KINDS, default='inference')
+    enqueue_parser.add_argument('--subject', type=str, required=True,
+                               help='Subject name (e.g. Subjek1) or number for analytics')
+    enqueue_parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH)
+    enqueue_parser.add_argument('--use_pressure', action='store_true')
+    enqueue_parser.add_argument('--compare_models', nargs='+', default=None,
+                               help='Checkpoints for a comparison job (first one is the reference)')
+    enqueue_parser.add_argument('--priority', type=int, default=0)
+    enqueue_parser.add_argument('--max_retries', type=int, default=2)
+
+    worker_parser = subparsers.add_parser('worker', help='Run worker processes that drain the queue')
+    worker_parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+    worker_parser.add_argument('--kind', choices=JOB_KINDS, action='append',
+                              help='Only run jobs of this kind (repeatable)')
+    worker_parser.add_argument('--threads', type=int, default=0,
+                              help='Torch threads per worker (0 = torch default)')
+    worker_parser.add_argument('--exit_when_empty', action='store_true')
+
+    status_parser = subparsers.add_parser('status', help='Show queue depth and throughput')
+    status_parser.add_argument('--window', type=int, default=3600, help='Throughput window in seconds')
+    status_parser.add_argument('--limit', type=int, default=10, help='Number of recent jobs to list')
+
+    cancel_parser = subparsers.add_parser('cancel', help='Cancel a queued job')
+    cancel_parser.add_argument('job_id', type=int)
+
+    requeue_parser = subparsers.add_parser('requeue_stale', help='Recover jobs of crashed workers')
+    requeue_parser.add_argument('--stale_seconds', type=int, default=600)
+
+    args = parser.parse_args()
+    job_queue = JobQueue(args.db)
+
+    if args.command == 'enqueue':
+        payload = {"subject": args.subject}
+        if args.kind == 'inference':
+            payload["model_path"] = os.path.abspath(args.model)
+            payload["use_pressure"] = args.use_pressure
+        elif args.kind == 'comparison':
+            payload["model_paths"] = [os.path.abspath(path) for path in (args.compare_models or [])]
+        job_id = job_queue.enqueue(args.kind, payload, priority=args.priority, max_retries=args.max_retries)
+        print(f"[OK] Enqueued job {job_id}: {args.kind} {payload}")
+    elif args.command == 'worker':
+        recovered = job_queue.requeue_stale()
+        if recovered:
+            print(f"[INFO] Recovered {recovered} stale jobs")
+        kinds = tuple(args.kind) if args.kind else JOB_KINDS
+        if args.workers <= 1:
+            _worker_process(args.db, kinds, args.threads, args.exit_when_empty)
+        else:
+            processes = [multiprocessing.Process(target=_worker_process,
+                                                 args=(args.db, kinds, args.threads, args.exit_when_empty))
+                         for _ in range(args.workers)]
+            for process in processes:
+                process.start()
+            print(f"[OK] Started {len(processes)} worker processes")
+            try:
+                for process in processes:
+                    process.join()
+            except KeyboardInterrupt:
+                print("\n[STOP] Stopping workers...")
+    elif args.command == 'cancel':
+        if job_queue.cancel(args.job_id):
+            print(f"[OK] Job {args.job_id} cancelled")
+        else:
+            print(f"[WARN] Job {args.job_id} is not queued (already running or finished)")
+    elif args.command == 'requeue_stale':
+        print(f"[OK] Recovered {job_queue.requeue_stale(args.stale_seconds)} stale jobs")
+    else:
+        print_status(job_queue, getattr(args, 'window', 3600), getattr(args, 'limit', 10))
+
+
+if __name__ == "__main__":
+    main()
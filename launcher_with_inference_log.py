@@ -13,6 +13,8 @@ import time
 from datetime import datetime
 import matplotlib.pyplot as plt
 from theme_manager import ThemeManager
+from job_queue import JobQueue, DEFAULT_DB_PATH
+from inference_events import parse_event, format_progress
 
 class SegmentationLauncher:
     """Launcher GUI dengan sistem tab seperti browser dan dark mode"""
@@ -144,6 +146,37 @@ measurements using advanced AI segmentation and data visualization.
                   command=self.run_enhanced_inference, width=50).pack(pady=2, fill=tk.X)
         ttk.Button(inference_buttons, text="📋 Single Subject Inference (Legacy)", 
                   command=self.run_single_inference, width=50).pack(pady=2, fill=tk.X)
+        
+        self.create_live_status_section(inference_frame)
+    
+    def create_live_status_section(self, parent):
+        """Live throughput of queued inference jobs, rendered from structured progress events"""
+        status_frame = ttk.LabelFrame(parent, text="Live Inference Status", padding=15)
+        status_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.live_status_var = tk.StringVar(value="No inference jobs")
+        ttk.Label(status_frame, textvariable=self.live_status_var, font=("Consolas", 9),
+                 justify=tk.LEFT).pack(anchor=tk.W)
+        
+        self.refresh_live_status()
+    
+    def refresh_live_status(self):
+        """Poll the job queue and show fps/ETA of running jobs"""
+        try:
+            if os.path.exists(DEFAULT_DB_PATH):
+                job_queue = JobQueue(DEFAULT_DB_PATH)
+                stats = job_queue.stats()
+                lines = [f"Queue: {stats['depth']} queued | {stats['counts'].get('running', 0)} running | "
+                         f"{stats['jobs_per_hour']:.1f} jobs/hour"]
+                for job in job_queue.list_jobs(status="running", limit=5):
+                    event = parse_event(job["progress"])
+                    progress = format_progress(event) if event else (job["progress"] or "starting...")
+                    lines.append(f"{job['payload'].get('subject', job['kind'])}: {progress}")
+                self.live_status_var.set("\n".join(lines))
+        except Exception as e:
+            self.live_status_var.set(f"Queue status unavailable: {e}")
+        
+        self.root.after(2000, self.refresh_live_status)
     
     def create_analytics_tab(self):
         """Create analytics and visualization tab"""
@@ -0,0 +1,372 @@
+"""
+Live Inference untuk Segmentasi Karotis
+Monitoring diameter secara langsung selama pemeriksaan:
+1. Sumber frame: capture device (index, mis. 0) atau file video yang masih ditulis (tail)
+2. Inference dengan latency budget: frame yang tertinggal di-drop, drop rate dilaporkan
+3. Hasil per frame (diameter, latency) dikirim ke callback dan/atau socket lokal (JSON lines)
+
+Usage:
+    python live_inference.py --source 0 --port 8766
+    python live_inference.py --source data_uji/Subjek1/recording.mp4 --budget_ms 150 --show
+
+Client socket sederhana:
+    python -c "import socket; s = socket.create_connection(('127.0.0.1', 8766)); [print(l) for l in s.makefile()]"
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import socketserver
+
+import cv2
+
+from inference_events import InferenceEventEmitter
+from inference_profiler import StageTimer
+from video_inference import VideoProcessor
+
+DEFAULT_MODEL_PATH = "UNet_25Mei_Sore.pth"
+DEFAULT_PUBLISH_PORT = 8766
+DEFAULT_LATENCY_BUDGET_MS = 200
+
+
+class DeviceSource:
+    """Sumber frame dari capture device (webcam / frame grabber ultrasound)"""
+
+    def __init__(self, index):
+        self.cap = cv2.VideoCapture(index)
+        if not self.cap.isOpened():
+            raise ValueError(f"Cannot open capture device: {index}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+
+    def read(self):
+        """Returns frame atau None jika tidak ada frame"""
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+class GrowingFileSource:
+    """
+    Sumber frame dari file video yang masih ditulis (tail)
+
+    Saat sampai di akhir file, file dibuka ulang dan dilanjutkan dari frame terakhir
+    yang sudah dibaca. Berhenti jika tidak ada frame baru selama idle_timeout detik.
+    Recorder sebaiknya menulis format yang bisa dibaca sebelum selesai (mis. AVI/MJPEG
+    atau MPEG-TS); mp4 biasa baru bisa dibuka setelah rekaman ditutup.
+    """
+
+    def __init__(self, path, idle_timeout=10.0, poll_interval=0.2):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.position = 0
+        self.cap = None
+        self.fps = 30
+        self._open()
+
+    def _open(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = cv2.VideoCapture(self.path)
+        if self.cap.isOpened():
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or self.fps
+            if self.position:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.position)
+
+    def read(self):
+        """Returns frame berikutnya, menunggu data baru; None jika idle_timeout tercapai"""
+        idle_since = None
+        while True:
+            if self.cap.isOpened():
+                ret, frame = self.cap.read()
+                if ret:
+                    self.position += 1
+                    return frame
+            if idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > self.idle_timeout:
+                return None
+            time.sleep(self.poll_interval)
+            self._open()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+def open_source(source, idle_timeout=10.0):
+    """Buat sumber frame dari index device (angka) atau path file"""
+    if isinstance(source, int) or str(source).isdigit():
+        return DeviceSource(int(source))
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Video source not found: {source}")
+    return GrowingFileSource(source, idle_timeout=idle_timeout)
+
+
+class _PublishHandler(socketserver.BaseRequestHandler):
+    """Simpan koneksi client; data dikirim oleh ResultPublisher.publish()"""
+
+    def handle(self):
+        self.server.publisher.add_client(self.request)
+        # Keep the connection open until the client disconnects
+        try:
+            while self.request.recv(1024):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.server.publisher.remove_client(self.request)
+
+
+class ResultPublisher:
+    """Broadcast hasil per frame sebagai JSON lines ke client TCP lokal"""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PUBLISH_PORT):
+        self.clients = []
+        self.lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), _PublishHandler)
+        self.server.daemon_threads = True
+        self.server.publisher = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"[OK] Publishing live results on tcp://{host}:{port}")
+
+    def add_client(self, connection):
+        with self.lock:
+            self.clients.append(connection)
+
+    def remove_client(self, connection):
+        with self.lock:
+            if connection in self.clients:
+                self.clients.remove(connection)
+
+    def publish(self, event):
+        """Kirim satu event ke semua client; client yang terputus dibuang"""
+        line = (json.dumps(event) + "\n").encode("utf-8")
+        with self.lock:
+            clients = list(self.clients)
+        for connection in clients:
+            try:
+                connection.sendall(line)
+            except OSError:
+                self.remove_client(connection)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LiveInference:
+    """Inference real-time dengan latency budget dan frame dropping"""
+
+    def __init__(self, processor, source, latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS,
+                 callback=None, publisher=None, show=False):
+        """
+        Args:
+            processor (VideoProcessor): Processor dengan model yang sudah ter-load
+            source: DeviceSource atau GrowingFileSource
+            latency_budget_ms (float): Batas umur frame (capture -> hasil); frame yang lebih tua di-drop
+            callback (callable): Dipanggil dengan event hasil per frame (optional)
+            publisher (ResultPublisher): Broadcast event ke socket lokal (optional)
+            show (bool): Tampilkan overlay di window OpenCV
+        """
+        self.processor = processor
+        self.source = source
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.publisher = publisher
+        self.show = show
+        self.events = InferenceEventEmitter(callback)
+
+        # Single-slot buffer: the reader always overwrites it with the newest frame
+        self.condition = threading.Condition()
+        self.latest = None
+        self.source_done = False
+        self.running = False
+
+        self.captured = 0
+        self.processed = 0
+        self.dropped_overwritten = 0
+        self.dropped_stale = 0
+        self.late = 0
+        self.timer = StageTimer()
+        self.latency = StageTimer()
+
+    def _reader(self):
+        """Thread pembaca: ambil frame secepat sumber memberikan"""
+        while self.running:
+            frame = self.source.read()
+            if frame is None:
+                break
+            with self.condition:
+                if self.latest is not None:
+                    # Previous frame was never picked up: inference is behind
+                    self.dropped_overwritten += 1
+                self.latest = (self.captured, time.perf_counter(), frame)
+                self.captured += 1
+                self.condition.notify()
+        with self.condition:
+            self.source_done = True
+            self.condition.notify()
+
+    def _next_frame(self):
+        with self.condition:
+            while self.latest is None and not self.source_done and self.running:
+                self.condition.wait(0.5)
+            item, self.latest = self.latest, None
+            return item
+
+    def _publish(self, event_name, **fields):
+        event = self.events.emit(event_name, **fields)
+        if self.publisher:
+            self.publisher.publish(event)
+        return event
+
+    def stats(self):
+        """Ringkasan drop rate dan latency"""
+        dropped = self.dropped_overwritten + self.dropped_stale
+        total = self.processed + dropped
+        return {
+            "captured": self.captured,
+            "processed": self.processed,
+            "dropped": dropped,
+            "dropped_overwritten": self.dropped_overwritten,
+            "dropped_stale": self.dropped_stale,
+            "late": self.late,
+            "drop_rate": round(dropped / total, 4) if total else 0.0
+        }
+
+    def run(self, duration=None, max_frames=None):
+        """
+        Jalankan live inference sampai sumber habis, duration tercapai atau stop() dipanggil
+
+        Args:
+            duration (float): Batas waktu dalam detik (optional)
+            max_frames (int): Batas jumlah frame yang diproses (optional)
+
+        Returns:
+            dict: Statistik run (drop rate, latency per tahap)
+        """
+        self.running = True
+        self.processor.model.eval()
+        reader = threading.Thread(target=self._reader, daemon=True)
+        reader.start()
+
+        start_time = time.perf_counter()
+        self._publish("start", source=str(getattr(self.source, "path", "device")),
+                      latency_budget_ms=self.latency_budget * 1000)
+        try:
+            while self.running:
+                if duration and time.perf_counter() - start_time > duration:
+                    break
+                if max_frames and self.processed >= max_frames:
+                    break
+
+                item = self._next_frame()
+                if item is None:
+                    if self.source_done:
+                        break
+                    continue
+                frame_idx, captured_at, frame = item
+
+                # Frame already too old to be useful for live monitoring
+                if time.perf_counter() - captured_at > self.latency_budget:
+                    self.dropped_stale += 1
+                    continue
+
+                self.timer.start()
+                mask = self.processor.predict_mask(frame, self.timer)
+                diameter_mm = self.processor.calculate_diameter(mask, self.processor.scale_mm_per_pixel)
+                self.timer.mark("diameter")
+
+                latency = time.perf_counter() - captured_at
+                self.latency.record("end_to_end", latency)
+                if latency > self.latency_budget:
+                    self.late += 1
+                self.processed += 1
+
+                stats = self.stats()
+                self._publish("frame", frame=frame_idx, diameter_mm=round(diameter_mm, 4),
+                              latency_ms=round(latency * 1000, 3), dropped=stats["dropped"],
+                              drop_rate=stats["drop_rate"])
+
+                if self.show:
+                    overlay = self.processor.draw_overlay(frame, mask, diameter_mm)
+                    cv2.imshow("Live Carotid Segmentation", overlay)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+
+                if self.processed % 25 == 0:
+                    print(f"[LIVE] frame {frame_idx} - Diameter: {diameter_mm:.2f}mm - "
+                          f"latency {latency * 1000:.0f}ms - drop rate {stats['drop_rate'] * 100:.1f}%")
+        finally:
+            self.running = False
+            reader.join(timeout=2)
+            self.source.release()
+            if self.show:
+                cv2.destroyAllWindows()
+
+        elapsed = time.perf_counter() - start_time
+        summary = self.stats()
+        summary["elapsed_seconds"] = round(elapsed, 3)
+        summary["fps"] = round(self.processed / elapsed, 3) if elapsed > 0 else 0.0
+        summary["stages"] = self.timer.summary() if self.processed else {}
+        summary["end_to_end"] = self.latency.summary().get("end_to_end")
+        self._publish("end", **summary)
+        self.events.close()
+        return summary
+
+    def stop(self):
+        self.running = False
+
+
+def main():
+    """Main function untuk live inference"""
+    parser = argparse.ArgumentParser(description='Live Carotid Segmentation from a capture device or growing file')
+    parser.add_argument('--source', type=str, required=True,
+                       help='Capture device index (e.g. 0) or path to a video file that is still being written')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--budget_ms', type=float, default=DEFAULT_LATENCY_BUDGET_MS,
+                       help=f'Latency budget per frame in ms (default: {DEFAULT_LATENCY_BUDGET_MS})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PUBLISH_PORT,
+                       help=f'Local TCP port for JSON-lines results, 0 to disable (default: {DEFAULT_PUBLISH_PORT})')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    parser.add_argument('--idle_timeout', type=float, default=10.0,
+                       help='Stop tailing a file after this many seconds without new frames')
+    parser.add_argument('--show', action='store_true', help='Show overlay window (press q to quit)')
+    args = parser.parse_args()
+
+    try:
+        source = open_source(args.source, args.idle_timeout)
+        processor = VideoProcessor(args.model)
+    except (ValueError, FileNotFoundError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    publisher = ResultPublisher(port=args.port) if args.port else None
+    live = LiveInference(processor, source, args.budget_ms, publisher=publisher, show=args.show)
+
+    try:
+        summary = live.run(duration=args.duration)
+    except KeyboardInterrupt:
+        live.stop()
+        summary = live.stats()
+    finally:
+        if publisher:
+            publisher.close()
+
+    print("\n=== Live Inference Summary ===")
+    print(f"Captured: {summary['captured']}, processed: {summary['processed']}, "
+          f"dropped: {summary['dropped']} ({summary['drop_rate'] * 100:.1f}%), late: {summary['late']}")
+    if summary.get("end_to_end"):
+        end_to_end = summary["end_to_end"]
+        print(f"End-to-end latency: p50 {end_to_end['p50_ms']:.1f}ms, p95 {end_to_end['p95_ms']:.1f}ms, "
+              f"p99 {end_to_end['p99_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,7 @@ def run_training():
     
     try:
         import training_model
+        sys.argv = [sys.argv[0]]
         training_model.main()
         print("[SUCCESS] Training completed successfully!")
         return True
@@ -42,14 +43,29 @@ def run_training():
         print(f"[ERROR] Training failed: {e}")
         return False
 
-def run_inference():
-    """Jalankan video inference"""
+def run_inference(subject="Subjek1", use_pressure=False):
+    """Jalankan video inference (lewat inference service jika sedang berjalan)"""
     print("\n🎬 STARTING VIDEO INFERENCE...")
     print("-" * 40)
     
     try:
-        import video_inference
-        video_inference.main()
+        from inference_service import InferenceClient
+        client = InferenceClient()
+        
+        if client.is_running():
+            # Model is already loaded in the service, only submit the job
+            print(f"[INFO] Using inference service at {client.base_url}")
+            result = client.run(subject, use_pressure=use_pressure, on_line=print)
+        else:
+            import video_inference
+            result = video_inference.process_selected_subject(subject, use_pressure=use_pressure)
+        
+        if result.get("status") not in ("success", "done"):
+            print(f"[ERROR] Video inference failed: {result.get('message')}")
+            return False
+        
+        for name, path in result.get("output_paths", {}).items():
+            print(f"   {name}: {path}")
         print("[SUCCESS] Video inference completed successfully!")
         return True
     except ImportError as e:
@@ -60,6 +76,23 @@ def run_inference():
         print(f"[ERROR] Video inference failed: {e}")
         return False
 
+def run_inference_service():
+    """Jalankan inference service (model tetap ter-load untuk GUI dan CLI)"""
+    print("\n[START] STARTING INFERENCE SERVICE...")
+    print("-" * 40)
+    
+    try:
+        import inference_service
+        sys.argv = [sys.argv[0]]
+        inference_service.main()
+        return True
+    except ImportError as e:
+        print(f"[ERROR] Import error: {e}")
+        return False
+    except Exception as e:
+        print(f"[ERROR] Inference service failed: {e}")
+        return False
+
 def run_data_sync():
     """Jalankan data synchronization"""
     print("\n🔄 STARTING DATA SYNCHRONIZATION...")
@@ -180,6 +213,7 @@ def check_setup():
     required_files = [
         "training_model.py",
         "video_inference.py", 
+        "inference_service.py",
         "data_viewer.py",
         "data_sync.py",
         "launcher_with_inference_log.py",
@@ -268,8 +302,12 @@ def show_menu():
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(description="Carotid Artery Segmentation System")
-    parser.add_argument('--mode', choices=['train', 'inference', 'sync', 'viewer', 'launcher', 'analytics', 'pipeline', 'menu'],
+    parser.add_argument('--mode', choices=['train', 'inference', 'service', 'sync', 'viewer', 'launcher', 'analytics', 'pipeline', 'menu'],
                        default='menu', help='Mode to run')
+    parser.add_argument('--subject', type=str, default='Subjek1',
+                       help='Subject name for inference mode (default: Subjek1)')
+    parser.add_argument('--use_pressure', action='store_true',
+                       help='Use pressure integration in inference mode when available')
     parser.add_argument('--gui', action='store_true', help='Use GUI launcher')
     parser.add_argument('--no-banner', action='store_true', help='Skip banner')
     
@@ -283,7 +321,9 @@ def main():
     elif args.mode == 'train':
         return run_training()
     elif args.mode == 'inference':
-        return run_inference()
+        return run_inference(args.subject, args.use_pressure)
+    elif args.mode == 'service':
+        return run_inference_service()
     elif args.mode == 'sync':
         return run_data_sync()
     elif args.mode == 'viewer':
@@ -0,0 +1,242 @@
+"""
+Model Comparison untuk Segmentasi Karotis
+Bandingkan beberapa model .pth pada satu video dengan satu kali decode:
+setiap frame dibaca dan di-preprocess sekali, lalu diumpankan (per batch) ke semua model.
+Hasil: satu CSV dengan kolom diameter per model + metrik kesepakatan (Dice antar mask,
+selisih diameter terhadap model referensi) dan ringkasan JSON.
+
+Usage:
+    python model_comparison.py --subject Subjek1 --models UNet_25Mei_Sore.pth model_baru.pth
+    python model_comparison.py --subject Subjek1 --all_models
+"""
+
+import os
+import csv
+import glob
+import json
+import time
+import argparse
+
+import numpy as np
+import cv2
+import torch
+
+from inference_events import InferenceEventEmitter, ThroughputMeter, format_progress
+from video_inference import VideoProcessor, build_subject_paths
+
+
+def dice_score(mask_a, mask_b):
+    """Dice antara dua mask biner (1.0 jika keduanya kosong)"""
+    a = mask_a > 0
+    b = mask_b > 0
+    total = a.sum() + b.sum()
+    if total == 0:
+        return 1.0
+    return 2.0 * np.logical_and(a, b).sum() / total
+
+
+def model_label(model_path):
+    """Nama pendek model untuk header kolom CSV"""
+    return os.path.splitext(os.path.basename(model_path))[0]
+
+
+def _input_key(processor):
+    """Model dengan key yang sama bisa memakai tensor hasil preprocess yang sama"""
+    return (processor.input_size, processor.channels_last, processor.in_channels,
+            processor.mean, processor.std, processor.max_pixel_value)
+
+
+def compare_models(video_path, model_paths, csv_path, summary_path=None, batch_size=4,
+                   processors=None, progress_callback=None):
+    """
+    Jalankan semua model pada video dengan satu kali decode per frame
+
+    Args:
+        video_path (str): Path video input
+        model_paths (list): Path checkpoint; model pertama menjadi referensi untuk Dice/delta
+        csv_path (str): Path CSV hasil per frame
+        summary_path (str): Path JSON ringkasan (default: di sebelah CSV)
+        batch_size (int): Jumlah frame per forward pass
+        processors (dict): {model_path: VideoProcessor} yang sudah ter-load (optional)
+        progress_callback (callable): Penerima event progress (optional)
+
+    Returns:
+        dict: Ringkasan per model (diameter rata-rata, Dice, delta, waktu forward)
+    """
+    if len(model_paths) < 2:
+        raise ValueError("At least two models are needed for a comparison")
+
+    processors = dict(processors or {})
+    for model_path in model_paths:
+        if model_path not in processors:
+            processors[model_path] = VideoProcessor(model_path)
+
+    labels = [model_label(path) for path in model_paths]
+    if len(set(labels)) != len(labels):
+        labels = [f"{i + 1}_{label}" for i, label in enumerate(labels)]
+    reference = model_paths[0]
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    print(f"Comparing {len(model_paths)} models on {video_path} ({total_frames} frames)")
+
+    if summary_path is None:
+        summary_path = os.path.splitext(csv_path)[0] + ".json"
+    events = InferenceEventEmitter(progress_callback)
+    events.emit("start", video=video_path, total_frames=total_frames, models=labels)
+    meter = ThroughputMeter(total_frames)
+
+    diameters = {path: [] for path in model_paths}
+    dice = {path: [] for path in model_paths[1:]}
+    forward_seconds = {path: 0.0 for path in model_paths}
+    frame_idx = 0
+
+    with open(csv_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        header = ["Frame"] + [f"Diameter_{label} (mm)" for label in labels]
+        for label in labels[1:]:
+            header += [f"Dice_{label}", f"Delta_{label} (mm)"]
+        writer.writerow(header)
+
+        while True:
+            # Decode a batch once
+            frames = []
+            for _ in range(batch_size):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+            original_size = (frames[0].shape[1], frames[0].shape[0])
+
+            # Preprocess once per distinct input configuration, shared by all models
+            inputs = {}
+            masks = {}
+            with torch.no_grad():
+                for model_path in model_paths:
+                    processor = processors[model_path]
+                    key = _input_key(processor)
+                    if key not in inputs:
+                        inputs[key] = torch.cat([processor.preprocess_frame(frame) for frame in frames])
+                    start = time.perf_counter()
+                    logits = processor.model(inputs[key]).cpu().numpy()
+                    forward_seconds[model_path] += time.perf_counter() - start
+                    masks[model_path] = [processor.mask_from_logits(logits[i, 0], original_size)
+                                         for i in range(len(frames))]
+
+            for i in range(len(frames)):
+                row = [frame_idx]
+                frame_diameters = {}
+                for model_path in model_paths:
+                    processor = processors[model_path]
+                    diameter = processor.calculate_diameter(masks[model_path][i], processor.scale_mm_per_pixel)
+                    frame_diameters[model_path] = diameter
+                    diameters[model_path].append(diameter)
+                    row.append(f"{diameter:.4f}")
+                for model_path in model_paths[1:]:
+                    score = dice_score(masks[reference][i], masks[model_path][i])
+                    dice[model_path].append(score)
+                    row += [f"{score:.4f}", f"{frame_diameters[model_path] - frame_diameters[reference]:.4f}"]
+                writer.writerow(row)
+
+                processing_fps, eta_seconds = meter.update()
+                event = events.emit("frame", frame=frame_idx, total_frames=total_frames,
+                                    fps=round(processing_fps, 3),
+                                    eta_seconds=round(eta_seconds, 1) if eta_seconds is not None else None,
+                                    diameter_mm=round(frame_diameters[reference], 4))
+                if frame_idx % 25 == 0:
+                    print(format_progress(event))
+                frame_idx += 1
+
+    cap.release()
+
+    summary = {
+        "video": video_path,
+        "frames": frame_idx,
+        "reference": labels[0],
+        "elapsed_seconds": round(meter.elapsed, 3),
+        "output_paths": {"csv": csv_path, "summary": summary_path},
+        "models": {}
+    }
+    for label, model_path in zip(labels, model_paths):
+        values = np.asarray(diameters[model_path])
+        model_summary = {
+            "path": model_path,
+            "mean_diameter_mm": round(float(values.mean()), 4) if frame_idx else 0.0,
+            "valid_frames": int((values > 0).sum()),
+            "forward_ms_per_frame": round(forward_seconds[model_path] / frame_idx * 1000, 3) if frame_idx else 0.0
+        }
+        if model_path != reference and frame_idx:
+            delta = values - np.asarray(diameters[reference])
+            model_summary["mean_dice"] = round(float(np.mean(dice[model_path])), 4)
+            model_summary["min_dice"] = round(float(np.min(dice[model_path])), 4)
+            model_summary["mean_abs_delta_mm"] = round(float(np.mean(np.abs(delta))), 4)
+            model_summary["max_abs_delta_mm"] = round(float(np.max(np.abs(delta))), 4)
+        summary["models"][label] = model_summary
+
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    events.emit("end", frames=frame_idx, elapsed_seconds=summary["elapsed_seconds"],
+                fps=round(frame_idx / meter.elapsed, 3) if meter.elapsed > 0 else 0.0,
+                outputs={"csv": csv_path, "summary": summary_path})
+    events.close()
+
+    print_summary(summary)
+    print(f"[OK] Comparison CSV saved to: {csv_path}")
+    print(f"[OK] Comparison summary saved to: {summary_path}")
+    return summary
+
+
+def compare_subject_models(subject_name, model_paths, batch_size=4, processors=None, progress_callback=None):
+    """
+    Bandingkan model untuk satu subjek di data_uji
+
+    Returns:
+        dict: Ringkasan dari compare_models
+    """
+    paths = build_subject_paths(subject_name)
+    if not os.path.exists(paths["video"]):
+        raise FileNotFoundError(f"Video file not found: {paths['video']}")
+    os.makedirs(paths["directory"], exist_ok=True)
+    csv_path = os.path.join(paths["directory"], f"{subject_name}_model_comparison.csv")
+    return compare_models(paths["video"], model_paths, csv_path, batch_size=batch_size,
+                          processors=processors, progress_callback=progress_callback)
+
+
+def print_summary(summary):
+    """Tampilkan tabel ringkasan perbandingan model"""
+    print(f"\n=== Model Comparison ({summary['frames']} frames, reference: {summary['reference']}) ===")
+    print(f"{'Model':<30} {'Mean D (mm)':>11} {'Dice':>7} {'|dD| (mm)':>10} {'Forward':>10}")
+    for label, stats in summary["models"].items():
+        dice = f"{stats['mean_dice']:.4f}" if "mean_dice" in stats else "ref"
+        delta = f"{stats['mean_abs_delta_mm']:.3f}" if "mean_abs_delta_mm" in stats else "-"
+        print(f"{label[:30]:<30} {stats['mean_diameter_mm']:>11.3f} {dice:>7} {delta:>10} "
+              f"{stats['forward_ms_per_frame']:>8.1f}ms")
+
+
+def main():
+    """Main function untuk perbandingan model"""
+    parser = argparse.ArgumentParser(description='Compare several segmentation models in a single decode pass')
+    parser.add_argument('--subject', type=str, default='Subjek1', help='Subject name (default: Subjek1)')
+    parser.add_argument('--models', nargs='+', default=None,
+                       help='Model checkpoints; the first one is the reference')
+    parser.add_argument('--all_models', action='store_true', help='Compare all *.pth files in the current directory')
+    parser.add_argument('--batch_size', type=int, default=4, help='Frames per forward pass (default: 4)')
+    args = parser.parse_args()
+
+    model_paths = sorted(glob.glob("*.pth")) if args.all_models else (args.models or [])
+    if len(model_paths) < 2:
+        print("[ERROR] Provide at least two models with --models or use --all_models")
+        return
+
+    try:
+        compare_subject_models(args.subject, model_paths, args.batch_size)
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+
+
+if __name__ == "__main__":
+    main()
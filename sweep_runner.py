@@ -0,0 +1,359 @@
+"""
+Sweep Runner untuk Training Segmentasi Karotis
+Hyperparameter sweep lokal: grid atau random search atas parameter training (lr, batch_size,
+loss_alpha, ...) dan probabilitas augmentasi (key config.AUGMENTATION_PARAMS). Trial dijalankan
+paralel di worker process dengan budget thread CPU per trial; trial yang val_loss-nya lebih buruk
+dari median trial lain pada epoch yang sama dihentikan lebih awal (median pruning).
+
+Hasil per trial ada di <sweep_dir>/trial_XXX (train.log, best/final model, throughput report);
+leaderboard (metric vs wall time) di <sweep_dir>/leaderboard.csv dan leaderboard.json.
+
+Usage:
+    python sweep_runner.py --search grid --workers 2 --epochs 10
+    python sweep_runner.py --search random --trials 12 --space sweep_space.json --workers 4
+    python sweep_runner.py --workers 2 --image_dir data/images --mask_dir data/masks --patience 5
+
+Argumen yang tidak dikenal sweep_runner diteruskan ke parser training_model.py sebagai nilai
+dasar setiap trial. Format --space (JSON):
+    {"batch_size": [4, 8, 16],                          list: pilihan (grid dan random)
+     "loss_alpha": {"min": 0.2, "max": 0.8},            range: hanya random search
+     "lr": {"min": 1e-4, "max": 1e-2, "log": true},     range log-uniform
+     "elastic_transform_prob": [0.0, 0.3]}              probabilitas augmentasi
+"""
+
+import os
+import csv
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+import contextlib
+import multiprocessing
+from datetime import datetime
+
+import torch
+
+import training_model
+
+DEFAULT_SEARCH_SPACE = {
+    "lr": [3e-4, 1e-3, 3e-3],
+    "batch_size": [4, 8, 16],
+    "loss_alpha": [0.3, 0.5, 0.7]
+}
+
+# Shared pruning state of the worker processes (set by _init_worker)
+_worker_state = {}
+
+
+def expand_grid(space):
+    """
+    Semua kombinasi parameter (grid search)
+
+    Args:
+        space (dict): {nama: list nilai}
+
+    Returns:
+        list: dict parameter per trial
+    """
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"Grid search needs a list of values for '{name}' (ranges are random search only)")
+    names = list(space)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(space[name] for name in names))]
+
+
+def sample_value(spec, rng):
+    """Satu nilai acak dari list (pilihan) atau range {"min", "max", "log", "type"}"""
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    low, high = spec["min"], spec["max"]
+    if spec.get("log"):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return int(round(value)) if spec.get("type") == "int" else value
+
+
+def sample_random(space, trials, seed=0):
+    """
+    Parameter acak per trial (random search)
+
+    Args:
+        space (dict): {nama: list nilai atau range}
+        trials (int): Jumlah trial
+        seed (int): Seed agar sweep bisa diulang
+
+    Returns:
+        list: dict parameter per trial
+    """
+    rng = random.Random(seed)
+    return [{name: sample_value(spec, rng) for name, spec in space.items()} for _ in range(trials)]
+
+
+class MedianPruner:
+    """Hentikan trial jika val_loss lebih buruk dari median trial lain pada epoch yang sama"""
+
+    def __init__(self, shared, lock, warmup_epochs=3, min_trials=3):
+        """
+        Args:
+            shared (dict): Dict yang dibagi antar process (Manager().dict()), {epoch: [val_loss, ...]}
+            lock: Lock untuk shared (Manager().Lock())
+            warmup_epochs (int): Epoch awal yang tidak pernah di-prune
+            min_trials (int): Jumlah minimum trial lain yang sudah melapor pada epoch ini
+        """
+        self.shared = shared
+        self.lock = lock
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def report(self, epoch, val_loss):
+        """
+        Laporkan val_loss satu epoch
+
+        Returns:
+            bool: True jika trial harus dihentikan
+        """
+        with self.lock:
+            others = list(self.shared.get(epoch, []))
+            self.shared[epoch] = others + [val_loss]
+        if epoch <= self.warmup_epochs or len(others) < self.min_trials:
+            return False
+        others.sort()
+        middle = len(others) // 2
+        median = others[middle] if len(others) % 2 else (others[middle - 1] + others[middle]) / 2
+        return val_loss > median
+
+
+def _init_worker(threads, shared, lock, pruning):
+    """Initializer worker process: budget thread CPU dan state pruning bersama"""
+    torch.set_num_threads(threads)
+    _worker_state["pruner"] = MedianPruner(shared, lock, **pruning) if pruning is not None else None
+
+
+def apply_params(args, params):
+    """
+    Terapkan parameter trial ke argumen training
+
+    Key config.AUGMENTATION_PARAMS masuk ke args.augmentation_params, key lain harus
+    berupa argumen training_model.py (lr, batch_size, loss_alpha, ...).
+    """
+    augmentation_params = dict(args.augmentation_params or {})
+    for name, value in params.items():
+        if name in training_model.DEFAULT_AUGMENTATION_PARAMS:
+            augmentation_params[name] = value
+        elif hasattr(args, name):
+            setattr(args, name, value)
+        else:
+            raise ValueError(f"Unknown sweep parameter: {name}")
+    args.augmentation_params = augmentation_params or None
+    return args
+
+
+def run_trial(trial):
+    """
+    Jalankan satu trial di worker process (output training ke <trial_dir>/train.log)
+
+    Args:
+        trial (dict): trial_id, params, base_args (dict), image_size, trial_dir
+
+    Returns:
+        dict: Hasil trial (status, metric terbaik, epoch, wall time)
+    """
+    os.makedirs(trial["trial_dir"], exist_ok=True)
+    args = apply_params(argparse.Namespace(**trial["base_args"]), trial["params"])
+    args.checkpoint_dir = os.path.join(trial["trial_dir"], "checkpoints")
+    args.resume = None
+    args.logger = ["none"]
+
+    pruner = _worker_state.get("pruner")
+    best = {"val_loss": float('inf')}
+    state = {"pruned": False, "epochs": 0}
+
+    def on_epoch(epoch, metrics):
+        state["epochs"] = epoch
+        if metrics["val_loss"] < best["val_loss"]:
+            best.update(metrics, epoch=epoch)
+        state["pruned"] = pruner is not None and pruner.report(epoch, metrics["val_loss"])
+        return state["pruned"]
+
+    result = {"trial_id": trial["trial_id"], "params": trial["params"], "trial_dir": trial["trial_dir"]}
+    start = time.perf_counter()
+    with open(os.path.join(trial["trial_dir"], "train.log"), "w", encoding="utf-8") as log_file, \
+            contextlib.redirect_stdout(log_file):
+        try:
+            training_model.run_training(args, trial["image_size"], output_dir=trial["trial_dir"],
+                                        epoch_callback=on_epoch, show_plots=False)
+            result["status"] = "pruned" if state["pruned"] else "completed"
+        except Exception as e:
+            print(f"[ERROR] {type(e).__name__}: {e}")
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+    result.update({
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "finished_at": time.time(),
+        "epochs_run": state["epochs"],
+        "best_epoch": best.get("epoch"),
+        "best_val_loss": best["val_loss"] if best.get("epoch") else None,
+        "best_val_dice": best.get("val_dice"),
+        "best_val_iou": best.get("val_iou")
+    })
+    return result
+
+
+def write_leaderboard(results, sweep_dir, sweep_start, config):
+    """
+    Simpan leaderboard trial (urut val_loss terbaik; trial gagal di akhir)
+
+    Returns:
+        list: Baris leaderboard
+    """
+    ranked = sorted(results, key=lambda r: (r["best_val_loss"] is None, r["best_val_loss"] or 0.0))
+    param_names = sorted({name for result in results for name in result["params"]})
+    rows = []
+    for rank, result in enumerate(ranked, 1):
+        row = {
+            "rank": rank,
+            "trial": result["trial_id"],
+            "status": result["status"],
+            "best_val_loss": round(result["best_val_loss"], 5) if result["best_val_loss"] is not None else None,
+            "best_val_dice": round(result["best_val_dice"], 5) if result["best_val_dice"] is not None else None,
+            "best_val_iou": round(result["best_val_iou"], 5) if result["best_val_iou"] is not None else None,
+            "best_epoch": result["best_epoch"],
+            "epochs_run": result["epochs_run"],
+            "wall_seconds": result["wall_seconds"],
+            "finished_after_seconds": round(result["finished_at"] - sweep_start, 3)
+        }
+        row.update({name: result["params"].get(name) for name in param_names})
+        rows.append(row)
+
+    # Best val_loss found so far against sweep wall time (finish order)
+    progress = []
+    best_so_far = None
+    for result in sorted(results, key=lambda r: r["finished_at"]):
+        if result["best_val_loss"] is not None and (best_so_far is None or result["best_val_loss"] < best_so_far):
+            best_so_far = result["best_val_loss"]
+        progress.append({"elapsed_seconds": round(result["finished_at"] - sweep_start, 3),
+                         "trial": result["trial_id"], "best_val_loss": best_so_far})
+
+    with open(os.path.join(sweep_dir, "leaderboard.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["rank"])
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(sweep_dir, "leaderboard.json"), "w", encoding="utf-8") as f:
+        json.dump({"config": config, "trials": rows, "progress": progress,
+                   "results": results}, f, indent=2, default=str)
+    return rows
+
+
+def print_leaderboard(rows, limit=10):
+    """Tampilkan trial teratas"""
+    print(f"\n{'#':>3} {'Trial':>5} {'Status':<10} {'Val loss':>9} {'Val Dice':>9} {'Epochs':>7} {'Wall':>9}  Params")
+    for row in rows[:limit]:
+        params = {key: value for key, value in row.items()
+                  if key not in ("rank", "trial", "status", "best_val_loss", "best_val_dice", "best_val_iou",
+                                 "best_epoch", "epochs_run", "wall_seconds", "finished_after_seconds")}
+        loss = f"{row['best_val_loss']:.4f}" if row["best_val_loss"] is not None else "-"
+        dice = f"{row['best_val_dice']:.4f}" if row["best_val_dice"] is not None else "-"
+        print(f"{row['rank']:>3} {row['trial']:>5} {row['status']:<10} {loss:>9} {dice:>9} "
+              f"{row['epochs_run']:>7} {row['wall_seconds']:>8.1f}s  {params}")
+
+
+def main():
+    """Main function untuk hyperparameter sweep"""
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter sweep for training_model.py',
+                                     epilog='Other arguments are passed to training_model.py for every trial')
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--space', type=str, default=None,
+                       help='JSON search space (default: lr x batch_size x loss_alpha grid)')
+    parser.add_argument('--trials', type=int, default=10, help='Number of random search trials')
+    parser.add_argument('--seed', type=int, default=0, help='Random search seed')
+    parser.add_argument('--workers', type=int, default=2, help='Trials running in parallel')
+    parser.add_argument('--threads_per_trial', type=int, default=None,
+                       help='Torch CPU threads per trial (default: CPU cores / workers)')
+    parser.add_argument('--sweep_dir', type=str, default=None, help='Output folder (default: sweeps/<timestamp>)')
+    parser.add_argument('--no_prune', action='store_true', help='Run every trial to completion')
+    parser.add_argument('--prune_warmup', type=int, default=3, help='Epochs before a trial can be pruned')
+    parser.add_argument('--prune_min_trials', type=int, default=3,
+                       help='Other trials that must have reported an epoch before pruning on it')
+    args, training_argv = parser.parse_known_args()
+
+    base_args = training_model.build_arg_parser().parse_args(training_argv)
+    if base_args.mode != 'train' or base_args.nproc_per_node > 1 or base_args.nnodes > 1:
+        print("[ERROR] Sweeps run single-process training trials (--mode train, no --nproc_per_node)")
+        return
+    image_size = base_args.image_size or 256
+    if base_args.epochs is None:
+        base_args.epochs = 10
+    if base_args.num_workers is None:
+        # Each trial already has its own thread budget; loader processes would oversubscribe the cores
+        base_args.num_workers = 0
+
+    space = DEFAULT_SEARCH_SPACE
+    if args.space:
+        with open(args.space, "r", encoding="utf-8") as f:
+            space = json.load(f)
+    try:
+        trial_params = expand_grid(space) if args.search == 'grid' else sample_random(space, args.trials, args.seed)
+        for params in trial_params:
+            apply_params(argparse.Namespace(**vars(base_args)), params)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+
+    workers = max(1, min(args.workers, len(trial_params)))
+    threads = args.threads_per_trial or max(1, (os.cpu_count() or 1) // workers)
+    sweep_dir = args.sweep_dir or os.path.join("sweeps", datetime.now().strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    # Build (or validate) the dataset cache once instead of racing on it from every trial
+    if base_args.cache_dir:
+        training_model.build_dataset_cache(base_args.image_dir, base_args.mask_dir,
+                                           os.path.join(base_args.cache_dir, f"{image_size}px"), image_size)
+
+    config = {
+        "search": args.search,
+        "space": space,
+        "workers": workers,
+        "threads_per_trial": threads,
+        "pruning": None if args.no_prune else {"warmup_epochs": args.prune_warmup,
+                                               "min_trials": args.prune_min_trials},
+        "base_args": dict(vars(base_args)),
+        "created_at": datetime.now().isoformat(timespec="seconds")
+    }
+    trials = [{"trial_id": i, "params": params, "base_args": vars(base_args), "image_size": image_size,
+               "trial_dir": os.path.join(sweep_dir, f"trial_{i:03d}")}
+              for i, params in enumerate(trial_params)]
+    print(f"Sweep: {len(trials)} trials ({args.search}), {workers} workers x {threads} threads -> {sweep_dir}")
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    sweep_start = time.time()
+    with context.Manager() as manager:
+        shared, lock = manager.dict(), manager.Lock()
+        with context.Pool(workers, initializer=_init_worker, initargs=(threads, shared, lock, config["pruning"]),
+                          maxtasksperchild=1) as pool:
+            try:
+                for result in pool.imap_unordered(run_trial, trials):
+                    results.append(result)
+                    loss = f"{result['best_val_loss']:.4f}" if result["best_val_loss"] is not None else "-"
+                    print(f"[{len(results)}/{len(trials)}] trial {result['trial_id']} {result['status']} "
+                          f"(val_loss {loss}, {result['epochs_run']} epochs, {result['wall_seconds']:.1f}s) "
+                          f"{result['params']}")
+                    write_leaderboard(results, sweep_dir, sweep_start, config)
+            except KeyboardInterrupt:
+                print("\n[STOP] Sweep interrupted - leaderboard contains the finished trials")
+                pool.terminate()
+
+    if not results:
+        print("[WARN] No trial finished")
+        return
+    rows = write_leaderboard(results, sweep_dir, sweep_start, config)
+    print_leaderboard(rows)
+    print(f"Sweep wall time: {time.time() - sweep_start:.1f}s")
+    print(f"[OK] Leaderboard saved to: {os.path.join(sweep_dir, 'leaderboard.csv')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Training Logger untuk Segmentasi Karotis
+Logger metric training yang bisa diganti-ganti (pluggable):
+
+    local  - append metric per epoch ke metrics.jsonl dan metrics.csv (offline, tanpa network)
+    wandb  - Weights & Biases (optional; di-import hanya jika dipakai)
+    none   - tidak mencatat apa pun
+
+Kurva training bisa dirender offline dari metrics.jsonl kapan saja, juga saat training
+masih berjalan:
+
+    python training_logger.py training_logs/20250601-101500/metrics.jsonl
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+from datetime import datetime
+
+LOGGER_BACKENDS = ("local", "wandb", "none")
+DEFAULT_LOG_DIR = "training_logs"
+
+
+def new_run_id():
+    """Id run baru (timestamp); dipakai bersama oleh semua backend dan disimpan di checkpoint"""
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+class TrainingLogger:
+    """Interface logger training; implementasi dasar tidak mencatat apa pun (backend "none")"""
+
+    def start(self, run_id, config):
+        """
+        Mulai (atau lanjutkan) run
+
+        Args:
+            run_id (str): Id run; run yang di-resume memakai id yang sama
+            config (dict): Hyperparameter run
+        """
+
+    def log(self, metrics, step):
+        """
+        Catat metric satu epoch
+
+        Args:
+            metrics (dict): {nama: nilai scalar}
+            step (int): Nomor epoch (mulai dari 1)
+        """
+
+    def finish(self):
+        """Tutup run"""
+
+
+class LocalTrainingLogger(TrainingLogger):
+    """Append metric ke <log_dir>/<run_id>/metrics.jsonl dan metrics.csv"""
+
+    def __init__(self, log_dir=DEFAULT_LOG_DIR):
+        """
+        Args:
+            log_dir (str): Folder induk; satu sub-folder per run
+        """
+        self.log_dir = log_dir
+        self.run_dir = None
+        self._jsonl = None
+        self._csv = None
+        self._csv_writer = None
+        self._csv_fieldnames = None
+
+    def start(self, run_id, config):
+        self.run_dir = os.path.join(self.log_dir, run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+        # Config of every (re)start is kept; the metrics files are appended to on resume
+        with open(os.path.join(self.run_dir, "config.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(config, started_at=datetime.now().isoformat(timespec="seconds"))) + "\n")
+        self._jsonl = open(os.path.join(self.run_dir, "metrics.jsonl"), "a", encoding="utf-8")
+        csv_path = os.path.join(self.run_dir, "metrics.csv")
+        # On resume, keep writing rows in the column order of the existing header
+        self._csv_fieldnames = None
+        if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+            with open(csv_path, "r", newline="", encoding="utf-8") as f:
+                self._csv_fieldnames = next(csv.reader(f), None)
+        self._csv = open(csv_path, "a", newline="", encoding="utf-8")
+        print(f"[INFO] Logging training metrics to: {self.run_dir}")
+
+    def log(self, metrics, step):
+        record = {"step": step, "time": round(time.time(), 3)}
+        record.update(metrics)
+        self._jsonl.write(json.dumps(record) + "\n")
+        self._jsonl.flush()
+
+        if self._csv_writer is None:
+            if self._csv_fieldnames:
+                missing = [key for key in record if key not in self._csv_fieldnames]
+                if missing:
+                    print(f"[WARN] metrics.csv header has no column for: {', '.join(missing)} "
+                          f"(still logged to metrics.jsonl)")
+                self._csv_writer = csv.DictWriter(self._csv, fieldnames=self._csv_fieldnames,
+                                                  extrasaction="ignore")
+            else:
+                self._csv_writer = csv.DictWriter(self._csv, fieldnames=list(record), extrasaction="ignore")
+                self._csv_writer.writeheader()
+        self._csv_writer.writerow(record)
+        self._csv.flush()
+
+    def finish(self):
+        for f in (self._jsonl, self._csv):
+            if f is not None:
+                f.close()
+        self._jsonl = self._csv = self._csv_writer = None
+
+
+class WandbTrainingLogger(TrainingLogger):
+    """Weights & Biases; wandb di-import saat start() sehingga tidak wajib ter-install"""
+
+    def __init__(self, project="carotid-segmentation", entity=None):
+        self.project = project
+        self.entity = entity
+        self._wandb = None
+
+    def start(self, run_id, config):
+        try:
+            import wandb
+        except ImportError:
+            print("[WARN] wandb is not installed - wandb logging disabled")
+            return
+        wandb.init(project=self.project, entity=self.entity, id=run_id, resume="allow", config=config)
+        self._wandb = wandb
+
+    def log(self, metrics, step):
+        if self._wandb is not None:
+            self._wandb.log({key: value for key, value in dict(metrics, epoch=step).items() if value is not None})
+
+    def finish(self):
+        if self._wandb is not None:
+            self._wandb.finish()
+            self._wandb = None
+
+
+class MultiTrainingLogger(TrainingLogger):
+    """Teruskan setiap panggilan ke beberapa logger"""
+
+    def __init__(self, loggers):
+        self.loggers = list(loggers)
+
+    def start(self, run_id, config):
+        for logger in self.loggers:
+            logger.start(run_id, config)
+
+    def log(self, metrics, step):
+        for logger in self.loggers:
+            logger.log(metrics, step)
+
+    def finish(self):
+        for logger in self.loggers:
+            logger.finish()
+
+
+def create_training_logger(backends=("local",), log_dir=DEFAULT_LOG_DIR):
+    """
+    Buat logger dari nama backend
+
+    Args:
+        backends (list): Kombinasi dari LOGGER_BACKENDS ("none" mematikan logging)
+        log_dir (str): Folder untuk backend local
+
+    Returns:
+        TrainingLogger: Logger (MultiTrainingLogger jika lebih dari satu backend)
+    """
+    loggers = []
+    for backend in backends:
+        if backend == "local":
+            loggers.append(LocalTrainingLogger(log_dir))
+        elif backend == "wandb":
+            try:
+                from config import WANDB_PROJECT, WANDB_ENTITY
+            except ImportError:
+                WANDB_PROJECT, WANDB_ENTITY = "carotid-segmentation", None
+            loggers.append(WandbTrainingLogger(WANDB_PROJECT, WANDB_ENTITY))
+        elif backend != "none":
+            raise ValueError(f"Unknown logger backend: {backend} (choose from {', '.join(LOGGER_BACKENDS)})")
+    if not loggers:
+        return TrainingLogger()
+    return loggers[0] if len(loggers) == 1 else MultiTrainingLogger(loggers)
+
+
+def load_metrics(jsonl_path):
+    """
+    Baca metrics.jsonl; jika sebuah epoch tercatat lebih dari sekali (run di-resume dari
+    checkpoint yang lebih lama), record terakhir yang dipakai
+
+    Returns:
+        list: Record per epoch, urut berdasarkan step
+    """
+    records = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                records[record["step"]] = record
+    return [records[step] for step in sorted(records)]
+
+
+def render_curves(jsonl_path, output_path=None, show=False):
+    """
+    Plot kurva metric dari metrics.jsonl: train_X dan val_X dalam satu subplot,
+    metric lain (lr, samples_per_sec, ...) masing-masing satu subplot
+
+    Args:
+        jsonl_path (str): Path metrics.jsonl
+        output_path (str): Path PNG (default: curves.png di sebelah metrics.jsonl)
+        show (bool): Tampilkan plot
+
+    Returns:
+        str: Path PNG
+    """
+    import matplotlib.pyplot as plt
+
+    records = load_metrics(jsonl_path)
+    if not records:
+        raise ValueError(f"No metrics in {jsonl_path}")
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(jsonl_path), "curves.png")
+
+    # Union of keys over all records (e.g. val_* only appears on validation epochs in older logs)
+    names = []
+    for record in records:
+        names.extend(key for key in record if key not in ("step", "time") and key not in names)
+    panels = {}
+    for name in names:
+        prefix, _, base = name.partition("_")
+        panels.setdefault(base if prefix in ("train", "val") else name, []).append(name)
+
+    steps = [record["step"] for record in records]
+    columns = min(3, len(panels))
+    rows = (len(panels) + columns - 1) // columns
+    plt.figure(figsize=(5 * columns, 4 * rows))
+    for i, (title, keys) in enumerate(panels.items()):
+        plt.subplot(rows, columns, i + 1)
+        for key in keys:
+            values = [record.get(key) for record in records]
+            plt.plot(steps, [float('nan') if value is None else value for value in values], label=key)
+        plt.title(title)
+        plt.xlabel('Epoch')
+        plt.legend()
+        plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(output_path)
+    if show:
+        plt.show()
+    plt.close()
+    return output_path
+
+
+def main():
+    """Render kurva training offline dari metrics.jsonl"""
+    parser = argparse.ArgumentParser(description='Render training curves from a local metrics log')
+    parser.add_argument('metrics', help='Path to metrics.jsonl (or its run folder)')
+    parser.add_argument('--output', default=None, help='Output PNG (default: curves.png next to the log)')
+    parser.add_argument('--show', action='store_true', help='Show the plot window')
+    args = parser.parse_args()
+
+    path = os.path.join(args.metrics, "metrics.jsonl") if os.path.isdir(args.metrics) else args.metrics
+    if not os.path.exists(path):
+        print(f"[ERROR] Metrics log not found: {path}")
+        return
+    print(f"[OK] Curves saved to: {render_curves(path, args.output, args.show)}")
+
+
+if __name__ == "__main__":
+    main()
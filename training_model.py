@@ -7,27 +7,135 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
-from torch.utils.data import Dataset, DataLoader, random_split
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import Dataset, DataLoader, Subset, random_split
+from torch.utils.data.distributed import DistributedSampler
+from torch.utils.checkpoint import checkpoint
 from torch.optim.lr_scheduler import ReduceLROnPlateau
 import torchvision.transforms as transforms
 
 import numpy as np
 import cv2
 import os
+import sys
+import copy
+import glob
+import queue
+import inspect
+import contextlib
+import json
+import time
+import functools
+import random
+import hashlib
+import argparse
+from datetime import datetime
 from PIL import Image
 import matplotlib.pyplot as plt
 from sklearn.metrics import jaccard_score
-import wandb
 import albumentations as A
 
+from inference_profiler import StageTimer
+from batch_augmentation import BatchAugmenter
+from training_logger import LOGGER_BACKENDS, DEFAULT_LOG_DIR, TrainingLogger, create_training_logger, new_run_id
+
 # Set device
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 print(f"Using device: {device}")
 
+# Normalisasi input UNetCompatible (default teacher tanpa metadata bundle)
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# Model bundle UNet hasil training (lihat video_inference.save_model_bundle): input grayscale /255
+# (mean 0, std 1) dan threshold logit 0 (= sigmoid 0.5, sama dengan dice_coefficient)
+UNET_ARCHITECTURE = "training_model.UNet"
+
+# Cache dataset: image/mask di-decode dan di-resize sekali ke array uint8 memory-mapped (.npy)
+DATASET_CACHE_VERSION = 1
+
+# Checkpoint training lengkap (model, optimizer, scheduler, history, RNG) untuk --resume
+CHECKPOINT_PATTERN = "checkpoint_epoch_{:04d}.pth"
+
+# Presisi training: bf16 memakai autocast (CPU/CUDA); loss tetap dihitung di fp32
+TRAINING_PRECISIONS = ("fp32", "bf16")
+
+# Engine augmentasi: albumentations per sampel di DataLoader worker, tensor per batch di device training
+AUGMENTATION_ENGINES = ("albumentations", "tensor")
+
+# Activation checkpointing UNet: none, blocks (setiap DoubleConv) atau stages (stage encoder/decoder penuh)
+CHECKPOINT_MODES = ("none", "blocks", "stages")
+# torch >= 1.11: non-reentrant checkpoint (gradient tetap mengalir walau input tidak requires_grad)
+_CHECKPOINT_KWARGS = {"use_reentrant": False} if "use_reentrant" in inspect.signature(checkpoint).parameters else {}
+
+# Seed random_split train/val/test agar split sama setelah resume
+SPLIT_SEED = 42
+
+# DataLoader jika config.py tidak tersedia (lihat config.DATALOADER_PARAMS)
+DEFAULT_DATALOADER_PARAMS = {
+    'num_workers': 0,
+    'prefetch_factor': 2,
+    'persistent_workers': False,
+    'pin_memory': False
+}
+
+# Augmentasi albumentations jika config.py tidak tersedia (lihat config.AUGMENTATION_PARAMS)
+DEFAULT_AUGMENTATION_PARAMS = {
+    'horizontal_flip_prob': 0.5,
+    'rotation_limit': 10,
+    'shift_scale_rotate_prob': 0.5,
+    'gaussian_blur_prob': 0.3,
+    'gaussian_noise_prob': 0.3,
+    'brightness_contrast_prob': 0.5,
+    'elastic_transform_prob': 0.3
+}
+
+@contextlib.contextmanager
+def frozen_batchnorm_stats(module):
+    """Running stats BatchNorm di dalam module tidak di-update (momentum 0) selama context"""
+    layers = [layer for layer in module.modules()
+              if isinstance(layer, nn.modules.batchnorm._BatchNorm) and layer.momentum is not None]
+    momenta = [layer.momentum for layer in layers]
+    for layer in layers:
+        layer.momentum = 0.0
+    try:
+        yield
+    finally:
+        for layer, momentum in zip(layers, momenta):
+            layer.momentum = momentum
+
+def checkpoint_segment(module, function, *inputs):
+    """
+    Jalankan function(*inputs) dengan activation checkpointing: aktivasi di dalam segment tidak
+    disimpan dan dihitung ulang saat backward
+    
+    Args:
+        module (nn.Module): Module yang berisi layer segment (BatchNorm-nya dibekukan saat recompute
+            agar running stats tidak di-update dua kali)
+        function (callable): Forward segment
+        *inputs: Tensor input segment
+    """
+    if not _CHECKPOINT_KWARGS and not any(tensor.requires_grad for tensor in inputs):
+        # Reentrant checkpoint (torch < 1.11) would drop the gradients of this segment
+        return function(*inputs)
+    calls = [0]
+    
+    def run(*args):
+        calls[0] += 1
+        if calls[0] == 1:
+            return function(*args)
+        with frozen_batchnorm_stats(module):
+            return function(*args)
+    
+    return checkpoint(run, *inputs, **_CHECKPOINT_KWARGS)
+
 class DoubleConv(nn.Module):
     """Double Convolution Block untuk U-Net"""
-    def __init__(self, in_channels, out_channels):
+    def __init__(self, in_channels, out_channels, use_checkpoint=False):
         super(DoubleConv, self).__init__()
+        self.use_checkpoint = use_checkpoint
         self.double_conv = nn.Sequential(
             nn.Conv2d(in_channels, out_channels, 3, padding=1),
             nn.BatchNorm2d(out_channels),
@@ -38,12 +146,22 @@ class DoubleConv(nn.Module):
         )
 
     def forward(self, x):
+        if self.use_checkpoint and self.training and torch.is_grad_enabled():
+            return checkpoint_segment(self.double_conv, self.double_conv, x)
         return self.double_conv(x)
 
 class UNet(nn.Module):
     """Implementasi U-Net untuk segmentasi citra"""
-    def __init__(self, n_channels=1, n_classes=1):
+    def __init__(self, n_channels=1, n_classes=1, checkpointing="none"):
+        """
+        Args:
+            checkpointing (str): Activation checkpointing saat training (lihat CHECKPOINT_MODES);
+                tidak mengubah parameter/state_dict, inference tidak terpengaruh
+        """
         super(UNet, self).__init__()
+        if checkpointing not in CHECKPOINT_MODES:
+            raise ValueError(f"Unknown checkpointing mode: {checkpointing} (choose from {', '.join(CHECKPOINT_MODES)})")
+        self.checkpointing = checkpointing
         
         # Encoder
         self.inc = DoubleConv(n_channels, 64)
@@ -68,60 +186,180 @@ class UNet(nn.Module):
         self.up_conv4 = DoubleConv(128, 64)
         
         self.outc = nn.Conv2d(64, n_classes, 1)
+        
+        for module in self.modules():
+            if isinstance(module, DoubleConv):
+                module.use_checkpoint = checkpointing == "blocks"
+
+    def _stage(self, modules, function, *inputs):
+        """Satu stage encoder/decoder, di-checkpoint pada mode "stages" saat training"""
+        if self.checkpointing == "stages" and self.training and torch.is_grad_enabled():
+            return checkpoint_segment(modules, function, *inputs)
+        return function(*inputs)
+
+    @staticmethod
+    def _decode(up, up_conv):
+        """Stage decoder: upsample, concat skip connection, DoubleConv"""
+        def run(x, skip):
+            return up_conv(torch.cat([skip, up(x)], dim=1))
+        return run
 
     def forward(self, x):
-        # Encoder
-        x1 = self.inc(x)
-        x2 = self.down1(x1)
-        x3 = self.down2(x2)
-        x4 = self.down3(x3)
-        x5 = self.down4(x4)
+        # Encoder (skip activations x1..x4 stay alive for the decoder in every mode)
+        x1 = self._stage(self.inc, self.inc, x)
+        x2 = self._stage(self.down1, self.down1, x1)
+        x3 = self._stage(self.down2, self.down2, x2)
+        x4 = self._stage(self.down3, self.down3, x3)
+        x5 = self._stage(self.down4, self.down4, x4)
         
         # Decoder
-        x = self.up1(x5)
-        x = torch.cat([x4, x], dim=1)
-        x = self.up_conv1(x)
-        
-        x = self.up2(x)
-        x = torch.cat([x3, x], dim=1)
-        x = self.up_conv2(x)
-        
-        x = self.up3(x)
-        x = torch.cat([x2, x], dim=1)
-        x = self.up_conv3(x)
-        
-        x = self.up4(x)
-        x = torch.cat([x1, x], dim=1)
-        x = self.up_conv4(x)
+        x = self._stage(self.up_conv1, self._decode(self.up1, self.up_conv1), x5, x4)
+        x = self._stage(self.up_conv2, self._decode(self.up2, self.up_conv2), x, x3)
+        x = self._stage(self.up_conv3, self._decode(self.up3, self.up_conv3), x, x2)
+        x = self._stage(self.up_conv4, self._decode(self.up4, self.up_conv4), x, x1)
         
         logits = self.outc(x)
         return logits
 
+def dataset_fingerprint(image_dir, mask_dir, image_size):
+    """
+    Sidik jari folder sumber (nama, ukuran dan mtime setiap PNG) untuk invalidasi cache
+    
+    Returns:
+        str: Hash SHA-1 (hex)
+    """
+    digest = hashlib.sha1(f"v{DATASET_CACHE_VERSION}|{image_size}".encode())
+    for directory in (image_dir, mask_dir):
+        digest.update(f"|{os.path.abspath(directory)}".encode())
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.png'):
+                stat = os.stat(os.path.join(directory, name))
+                digest.update(f"|{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+def build_dataset_cache(image_dir, mask_dir, cache_dir, image_size=256):
+    """
+    Decode dan resize semua image/mask sekali ke array uint8 memory-mapped
+    
+    Cache berisi images.npy (N, S, S), masks.npy (N, S, S, nilai 0/1) dan index.json
+    (nama file, ukuran, fingerprint). Cache dibangun ulang otomatis jika isi folder
+    sumber berubah (file ditambah/dihapus/diubah).
+    
+    Args:
+        image_dir (str): Folder image PNG
+        mask_dir (str): Folder mask PNG (nama file sama dengan image)
+        cache_dir (str): Folder cache
+        image_size (int): Ukuran simpan (sama dengan ukuran training, Resize jadi no-op)
+        
+    Returns:
+        dict: Isi index.json
+    """
+    fingerprint = dataset_fingerprint(image_dir, mask_dir, image_size)
+    index_path = os.path.join(cache_dir, "index.json")
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("fingerprint") == fingerprint:
+            print(f"[OK] Using dataset cache: {cache_dir} ({len(index['names'])} samples)")
+            return index
+        print("[INFO] Source images changed - rebuilding dataset cache")
+    
+    names = sorted(f for f in os.listdir(image_dir) if f.endswith('.png'))
+    os.makedirs(cache_dir, exist_ok=True)
+    shape = (len(names), image_size, image_size)
+    print(f"[INFO] Building dataset cache: {len(names)} samples at {image_size}x{image_size} -> {cache_dir}")
+    
+    # Written under temporary names; index.json last, so an interrupted build is never used
+    images_tmp = os.path.join(cache_dir, "images.tmp.npy")
+    masks_tmp = os.path.join(cache_dir, "masks.tmp.npy")
+    images = np.lib.format.open_memmap(images_tmp, mode='w+', dtype=np.uint8, shape=shape)
+    masks = np.lib.format.open_memmap(masks_tmp, mode='w+', dtype=np.uint8, shape=shape)
+    for i, name in enumerate(names):
+        image = cv2.imread(os.path.join(image_dir, name), cv2.IMREAD_GRAYSCALE)
+        mask = cv2.imread(os.path.join(mask_dir, name), cv2.IMREAD_GRAYSCALE)
+        if image is None or mask is None:
+            raise ValueError(f"Could not load image or mask: {os.path.join(image_dir, name)}, "
+                             f"{os.path.join(mask_dir, name)}")
+        images[i] = cv2.resize(image, (image_size, image_size), interpolation=cv2.INTER_LINEAR)
+        masks[i] = cv2.resize((mask > 0).astype(np.uint8), (image_size, image_size),
+                              interpolation=cv2.INTER_NEAREST)
+    images.flush()
+    masks.flush()
+    del images, masks
+    os.replace(images_tmp, os.path.join(cache_dir, "images.npy"))
+    os.replace(masks_tmp, os.path.join(cache_dir, "masks.npy"))
+    
+    index = {
+        "version": DATASET_CACHE_VERSION,
+        "fingerprint": fingerprint,
+        "image_dir": os.path.abspath(image_dir),
+        "mask_dir": os.path.abspath(mask_dir),
+        "image_size": image_size,
+        "names": names,
+        "created_at": datetime.now().isoformat(timespec="seconds")
+    }
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    print(f"[OK] Dataset cache saved: {cache_dir}")
+    return index
+
 class EnhancedCarotidDataset(Dataset):
     """Dataset untuk citra karotis dengan augmentasi"""
-    def __init__(self, image_dir, mask_dir, transform=None):
+    def __init__(self, image_dir, mask_dir, transform=None, cache_dir=None, image_size=256):
+        """
+        Args:
+            image_dir (str): Folder image PNG
+            mask_dir (str): Folder mask PNG
+            transform: Augmentasi albumentations (tetap diterapkan on the fly)
+            cache_dir (str): Jika diberikan, sampel dibaca dari cache memmap (lihat build_dataset_cache)
+            image_size (int): Ukuran sampel di cache
+        """
         self.image_dir = image_dir
         self.mask_dir = mask_dir
         self.transform = transform
-        self.images = [f for f in os.listdir(image_dir) if f.endswith('.png')]
+        self.cache_dir = cache_dir
+        self._image_array = None
+        self._mask_array = None
+        if cache_dir:
+            self.images = build_dataset_cache(image_dir, mask_dir, cache_dir, image_size)["names"]
+        else:
+            # Same order as the cache index, so SPLIT_SEED gives the same split with and without cache
+            self.images = sorted(f for f in os.listdir(image_dir) if f.endswith('.png'))
     
     def __len__(self):
         return len(self.images)
     
+    def __getstate__(self):
+        # Memmaps are reopened in each DataLoader worker instead of being pickled (copied)
+        state = self.__dict__.copy()
+        state['_image_array'] = None
+        state['_mask_array'] = None
+        return state
+    
+    def _load_cached(self, idx):
+        """Baca satu sampel dari cache memmap (dibuka sekali per proses)"""
+        if self._image_array is None:
+            self._image_array = np.load(os.path.join(self.cache_dir, "images.npy"), mmap_mode='r')
+            self._mask_array = np.load(os.path.join(self.cache_dir, "masks.npy"), mmap_mode='r')
+        return np.array(self._image_array[idx]), self._mask_array[idx].astype(np.float32)
+    
     def __getitem__(self, idx):
-        img_name = self.images[idx]
-        img_path = os.path.join(self.image_dir, img_name)
-        mask_path = os.path.join(self.mask_dir, img_name)
-        
-        # Load image and mask
-        image = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
-        
-        if image is None or mask is None:
-            raise ValueError(f"Could not load image or mask: {img_path}, {mask_path}")
-        
-        # Normalize mask to 0-1
-        mask = (mask > 0).astype(np.float32)
+        if self.cache_dir:
+            image, mask = self._load_cached(idx)
+        else:
+            img_name = self.images[idx]
+            img_path = os.path.join(self.image_dir, img_name)
+            mask_path = os.path.join(self.mask_dir, img_name)
+            
+            # Load image and mask
+            image = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+            
+            if image is None or mask is None:
+                raise ValueError(f"Could not load image or mask: {img_path}, {mask_path}")
+            
+            # Normalize mask to 0-1
+            mask = (mask > 0).astype(np.float32)
         
         # Apply augmentation
         if self.transform:
@@ -134,20 +372,43 @@ class EnhancedCarotidDataset(Dataset):
         
         return image, mask
 
-def get_augmentations():
-    """Dapatkan augmentasi untuk training dan testing"""
+def get_augmentation_params(**overrides):
+    """
+    Probabilitas/limit augmentasi dari config.AUGMENTATION_PARAMS, dengan override (nilai None diabaikan)
+    
+    Returns:
+        dict: Key seperti DEFAULT_AUGMENTATION_PARAMS
+    """
+    params = dict(DEFAULT_AUGMENTATION_PARAMS)
+    try:
+        import config
+        params.update(config.AUGMENTATION_PARAMS)
+    except (ImportError, AttributeError):
+        pass
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    return params
+
+def get_augmentations(image_size=256, params=None):
+    """
+    Dapatkan augmentasi untuk training dan testing
+    
+    Args:
+        params (dict): Hasil get_augmentation_params() (default: config.AUGMENTATION_PARAMS)
+    """
+    params = params or get_augmentation_params()
     train_transform = A.Compose([
-        A.Resize(256, 256),
-        A.HorizontalFlip(p=0.5),
-        A.ShiftScaleRotate(shift_limit=0.1, scale_limit=0.1, rotate_limit=10, p=0.5),
-        A.GaussianBlur(blur_limit=3, p=0.3),
-        A.GaussNoise(var_limit=(10, 50), p=0.3),
-        A.RandomBrightnessContrast(brightness_limit=0.2, contrast_limit=0.2, p=0.5),
-        A.ElasticTransform(alpha=1, sigma=50, alpha_affine=50, p=0.3),
+        A.Resize(image_size, image_size),
+        A.HorizontalFlip(p=params['horizontal_flip_prob']),
+        A.ShiftScaleRotate(shift_limit=0.1, scale_limit=0.1, rotate_limit=params['rotation_limit'],
+                           p=params['shift_scale_rotate_prob']),
+        A.GaussianBlur(blur_limit=3, p=params['gaussian_blur_prob']),
+        A.GaussNoise(var_limit=(10, 50), p=params['gaussian_noise_prob']),
+        A.RandomBrightnessContrast(brightness_limit=0.2, contrast_limit=0.2, p=params['brightness_contrast_prob']),
+        A.ElasticTransform(alpha=1, sigma=50, alpha_affine=50, p=params['elastic_transform_prob']),
     ])
     
     test_transform = A.Compose([
-        A.Resize(256, 256),
+        A.Resize(image_size, image_size),
     ])
     
     return train_transform, test_transform
@@ -187,69 +448,625 @@ def calculate_iou(pred, target):
     iou = intersection / union
     return iou.item()
 
-def train_model(model, train_loader, val_loader, criterion, optimizer, scheduler, device, epochs=50):
-    """Training model dengan monitoring metrics"""
+class SegmentationMetricAccumulator:
+    """
+    Akumulasi loss dan count pixel (intersection, prediksi, target) sebagai tensor di device
+    
+    Tidak ada .item() per batch (tidak ada sync device); reduksi ke host sekali per epoch.
+    Dice/IoU dihitung dari total count seluruh epoch (Dice/IoU dataset-level), bukan rata-rata
+    Dice per batch, sehingga tidak bergantung pada ukuran/urutan batch.
+    """
+    def __init__(self, device):
+        # loss_sum, intersection, pred_sum, target_sum, batches
+        self.totals = torch.zeros(5, dtype=torch.float64, device=device)
+    
+    def update(self, loss, outputs, masks):
+        """Tambahkan satu batch (loss scalar tensor, logits dan mask ground truth)"""
+        pred = (outputs.detach() > 0).to(masks.dtype)  # sigmoid(x) > 0.5  <=>  x > 0
+        self.totals += torch.stack([loss.detach().float(), (pred * masks).sum(),
+                                    pred.sum(), masks.sum(), torch.ones_like(masks.sum())]).double()
+    
+    def compute(self, smooth=1e-6):
+        """
+        Reduksi ke host (satu sync); pada training terdistribusi count dijumlahkan antar rank
+        
+        Returns:
+            dict: loss (rata-rata per batch), dice dan iou
+        """
+        totals = self.totals
+        if dist.is_available() and dist.is_initialized():
+            totals = totals.clone()
+            dist.all_reduce(totals)
+        loss_sum, intersection, pred_sum, target_sum, batches = totals.tolist()
+        union = pred_sum + target_sum - intersection
+        return {
+            "loss": loss_sum / batches if batches else 0.0,
+            "dice": (2. * intersection + smooth) / (pred_sum + target_sum + smooth),
+            "iou": intersection / union if union > 0 else 1.0
+        }
+
+class EarlyStopping:
+    """Hentikan training jika val_loss tidak membaik lebih dari min_delta selama `patience` epoch"""
+    def __init__(self, patience, min_delta=0.0, best=float('inf'), best_epoch=0):
+        """
+        Args:
+            patience (int): Jumlah epoch tanpa perbaikan sebelum berhenti
+            min_delta (float): Penurunan val_loss minimum yang dihitung sebagai perbaikan
+            best, best_epoch: State awal (dari checkpoint saat resume)
+        """
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = best
+        self.best_epoch = best_epoch
+    
+    def update(self, val_loss, epoch):
+        """Catat val_loss epoch (1-based). Returns True jika training harus berhenti"""
+        if val_loss < self.best - self.min_delta:
+            self.best = val_loss
+            self.best_epoch = epoch
+        return epoch - self.best_epoch >= self.patience
+    
+    def state_dict(self):
+        return {"best": self.best, "best_epoch": self.best_epoch}
+
+def is_main_process():
+    """True untuk proses non-terdistribusi atau rank 0 (satu-satunya yang menulis file/log)"""
+    return not (dist.is_available() and dist.is_initialized()) or dist.get_rank() == 0
+
+def get_dataloader_params(**overrides):
+    """
+    Parameter DataLoader dari config.DATALOADER_PARAMS, dengan override (nilai None diabaikan)
     
-    # Initialize wandb
-    wandb.init(project="carotid-segmentation", 
-               config={
-                   "epochs": epochs,
-                   "learning_rate": optimizer.param_groups[0]['lr'],
-                   "batch_size": train_loader.batch_size,
-                   "model": "UNet"
-               })
+    Returns:
+        dict: num_workers, prefetch_factor, persistent_workers, pin_memory
+    """
+    params = dict(DEFAULT_DATALOADER_PARAMS)
+    try:
+        import config
+        params.update(config.DATALOADER_PARAMS)
+    except (ImportError, AttributeError):
+        print("[WARN] config.DATALOADER_PARAMS not available - loading data in the main process")
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    return params
+
+def dataloader_kwargs(params):
+    """Argumen DataLoader yang valid untuk parameter ini (prefetch/persistent hanya dengan worker)"""
+    kwargs = {
+        'num_workers': params['num_workers'],
+        'pin_memory': bool(params['pin_memory']) and device.type == 'cuda'
+    }
+    if params['num_workers'] > 0:
+        kwargs['prefetch_factor'] = params['prefetch_factor']
+        kwargs['persistent_workers'] = params['persistent_workers']
+    return kwargs
+
+def summarize_throughput(timer, samples):
+    """
+    Throughput satu epoch training: waktu menunggu batch (loading) vs waktu step (compute)
     
+    Args:
+        timer (StageTimer): Timer dengan tahap "data", "compute" (dan "augment") per batch
+        samples (int): Jumlah sampel dalam epoch
+        
+    Returns:
+        dict: Waktu, samples/sec loading vs compute dan fraksi waktu input-bound
+    """
+    stats = timer.summary()
+    data_seconds = stats["data"]["total_ms"] / 1000 if "data" in stats else 0.0
+    compute_seconds = stats["compute"]["total_ms"] / 1000 if "compute" in stats else 0.0
+    # Batch (tensor) augmentation on the training device, 0 with the albumentations engine
+    augment_seconds = stats["augment"]["total_ms"] / 1000 if "augment" in stats else 0.0
+    total_seconds = data_seconds + compute_seconds + augment_seconds
+    return {
+        "samples": samples,
+        "data_seconds": round(data_seconds, 3),
+        "augment_seconds": round(augment_seconds, 3),
+        "compute_seconds": round(compute_seconds, 3),
+        "loading_samples_per_sec": round(samples / data_seconds, 2) if data_seconds > 0 else None,
+        "compute_samples_per_sec": round(samples / compute_seconds, 2) if compute_seconds > 0 else None,
+        "samples_per_sec": round(samples / total_seconds, 2) if total_seconds > 0 else None,
+        "input_bound_fraction": round(data_seconds / total_seconds, 4) if total_seconds > 0 else 0.0,
+        "data_wait_p95_ms": stats["data"]["p95_ms"] if "data" in stats else None
+    }
+
+def format_throughput(throughput):
+    """Satu baris ringkasan throughput untuk console"""
+    loading = throughput["loading_samples_per_sec"]
+    return (f"Throughput: {throughput['samples_per_sec']} samples/s "
+            f"(loading {loading if loading is not None else 'n/a'} samples/s, "
+            f"compute {throughput['compute_samples_per_sec']} samples/s, "
+            f"waiting for data {throughput['input_bound_fraction'] * 100:.1f}%"
+            + (f", batch augmentation {throughput['augment_seconds']:.1f}s" if throughput.get("augment_seconds") else "")
+            + ")")
+
+def write_throughput_report(path, loader, epochs, **info):
+    """
+    Simpan JSON report throughput per epoch beserta konfigurasi DataLoader
+    
+    Args:
+        path (str): Path JSON
+        loader (DataLoader): DataLoader training
+        epochs (list): Hasil summarize_throughput per epoch
+        **info: Informasi tambahan (run_summary, ...)
+    """
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "dataloader": {
+            "batch_size": loader.batch_size,
+            "num_workers": loader.num_workers,
+            "prefetch_factor": loader.prefetch_factor,
+            "persistent_workers": loader.persistent_workers,
+            "pin_memory": loader.pin_memory
+        },
+        "epochs": epochs
+    }
+    report.update(info)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Throughput report saved to: {path}")
+
+def summarize_run(throughput_history, epochs, stopped_epoch, best_epoch):
+    """
+    Ringkasan run: epoch/validasi yang dijalankan dan estimasi waktu yang dihemat oleh
+    early stopping dan validasi setiap N epoch, dibanding run penuh dengan validasi tiap epoch
+    
+    Args:
+        throughput_history (list): Entry per epoch (data/compute/val_seconds)
+        epochs (int): Jumlah epoch yang direncanakan
+        stopped_epoch (int): Epoch terakhir yang dijalankan
+        best_epoch (int): Epoch dengan val_loss terbaik
+        
+    Returns:
+        dict: Ringkasan run
+    """
+    train_seconds = [entry["data_seconds"] + entry.get("augment_seconds", 0.0) + entry["compute_seconds"]
+                     for entry in throughput_history]
+    val_seconds = [entry["val_seconds"] for entry in throughput_history if entry.get("val_seconds") is not None]
+    actual = sum(train_seconds) + sum(val_seconds)
+    full = epochs * ((float(np.mean(train_seconds)) if train_seconds else 0.0) +
+                     (float(np.mean(val_seconds)) if val_seconds else 0.0))
+    return {
+        "epochs_planned": epochs,
+        "epochs_run": stopped_epoch,
+        "stopped_early": stopped_epoch < epochs,
+        "best_epoch": best_epoch,
+        "validations_run": len(val_seconds),
+        "train_seconds": round(sum(train_seconds), 3),
+        "val_seconds": round(sum(val_seconds), 3),
+        "estimated_full_seconds": round(full, 3),
+        "estimated_saved_seconds": round(max(full - actual, 0.0), 3),
+        "saved_fraction": round(max(full - actual, 0.0) / full, 4) if full > 0 else 0.0
+    }
+
+def check_input_bound(throughput):
+    """Peringatan jika training lebih banyak menunggu data daripada menghitung"""
+    if throughput["input_bound_fraction"] > 0.5:
+        print("[WARN] Training is input-bound - increase DATALOADER_PARAMS['num_workers'] in config.py "
+              "or use the dataset cache")
+
+def autocast_context(precision, device):
+    """
+    Context forward pass untuk presisi training
+    
+    bf16 punya rentang eksponen yang sama dengan fp32, jadi tidak perlu loss scaling;
+    stabilitas mixed_loss dijaga dengan menghitung loss dari logits yang di-cast ke fp32.
+    """
+    if precision == "fp32":
+        return contextlib.nullcontext()
+    if precision == "bf16":
+        if not hasattr(torch, "autocast"):
+            raise RuntimeError("bf16 autocast requires torch >= 1.10")
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    raise ValueError(f"Unknown precision: {precision} (expected one of {TRAINING_PRECISIONS})")
+
+def capture_rng_state():
+    """State semua RNG (python, numpy, torch, CUDA) untuk checkpoint"""
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state()
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    """Kembalikan state RNG dari capture_rng_state()"""
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+def save_training_checkpoint(checkpoint_dir, epoch, model, optimizer, scheduler, history, keep=3, **info):
+    """
+    Simpan checkpoint training lengkap dan hapus checkpoint lama (rotasi)
+    
+    Args:
+        checkpoint_dir (str): Folder checkpoint
+        epoch (int): Jumlah epoch yang sudah selesai
+        model, optimizer, scheduler: Objek training
+        history (dict): Riwayat metric (list per epoch) dan best_val_loss
+        keep (int): Jumlah checkpoint terbaru yang disimpan
+        **info: Informasi tambahan (image_size, run_id, ...)
+        
+    Returns:
+        str: Path checkpoint
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = os.path.join(checkpoint_dir, CHECKPOINT_PATTERN.format(epoch))
+    checkpoint = {
+        "epoch": epoch,
+        "model": getattr(model, "module", model).state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "scheduler": scheduler.state_dict(),
+        "history": history,
+        "rng": capture_rng_state(),
+        "created_at": datetime.now().isoformat(timespec="seconds")
+    }
+    checkpoint.update(info)
+    
+    # Atomic write: an interrupted save never replaces a good checkpoint
+    torch.save(checkpoint, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    
+    for old_path in sorted(glob.glob(os.path.join(checkpoint_dir, CHECKPOINT_PATTERN.replace("{:04d}", "*"))))[:-keep]:
+        os.remove(old_path)
+    return path
+
+def find_latest_checkpoint(checkpoint_dir):
+    """
+    Checkpoint terbaru di folder checkpoint
+    
+    Checkpoint disimpan per run di <checkpoint_dir>/<run_id>/; yang dipilih adalah epoch
+    tertinggi dari run yang terakhir menulis checkpoint. checkpoint_dir juga boleh berupa
+    folder satu run (atau folder lama tanpa sub-folder run).
+    
+    Returns:
+        str: Path checkpoint (None jika tidak ada)
+    """
+    pattern = CHECKPOINT_PATTERN.replace("{:04d}", "*")
+    latest_per_run = []
+    for run_dir in [checkpoint_dir] + sorted(glob.glob(os.path.join(checkpoint_dir, "*", ""))):
+        paths = sorted(glob.glob(os.path.join(run_dir, pattern)))
+        if paths:
+            latest_per_run.append(paths[-1])
+    return max(latest_per_run, key=os.path.getmtime) if latest_per_run else None
+
+def load_training_checkpoint(path):
+    """Load checkpoint training lengkap (di CPU; load_state_dict memindahkan ke device model)"""
+    try:
+        return torch.load(path, map_location='cpu', weights_only=False)
+    except TypeError:
+        # torch < 1.13 has no weights_only argument
+        return torch.load(path, map_location='cpu')
+
+def save_unet_bundle(model, path, image_size, **info):
+    """Simpan UNet sebagai model bundle yang bisa langsung di-load VideoProcessor"""
+    from video_inference import save_model_bundle
+    
+    return save_model_bundle(getattr(model, "module", model), path, UNET_ARCHITECTURE, model_config={"n_channels": 1, "n_classes": 1},
+                             input_size=image_size, mean=(0.0,), std=(1.0,), threshold=0.0, **info)
+
+def to_teacher_input(images, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """
+    Ubah batch grayscale (B, 1, H, W, range 0-1) menjadi input teacher: 3 channel dengan
+    normalisasi dari bundle teacher (default ImageNet), sama seperti preprocessing VideoProcessor
+    """
+    channels = len(mean)
+    mean = torch.tensor(mean, device=images.device).view(1, channels, 1, 1)
+    std = torch.tensor(std, device=images.device).view(1, channels, 1, 1)
+    return (images.expand(-1, channels, -1, -1) - mean) / std
+
+def distillation_loss(student_logits, teacher_logits, masks, temperature=2.0, alpha=0.7):
+    """
+    Loss distilasi: BCE terhadap soft output teacher (dengan temperature) + mixed loss
+    terhadap ground truth
+    
+    Args:
+        student_logits: Output student
+        teacher_logits: Output teacher (tanpa gradient)
+        masks: Ground truth mask
+        temperature (float): Temperature untuk soft target
+        alpha (float): Bobot loss distilasi (1 - alpha untuk ground truth)
+    """
+    soft_targets = torch.sigmoid(teacher_logits / temperature)
+    kd_loss = F.binary_cross_entropy_with_logits(student_logits / temperature, soft_targets) * temperature ** 2
+    return alpha * kd_loss + (1 - alpha) * mixed_loss(student_logits, masks)
+
+def teacher_agreement(student_logits, teacher_logits, threshold=0.5):
+    """Dice antara mask student dan teacher dengan threshold yang dipakai VideoProcessor"""
+    student_mask = (student_logits > threshold).float()
+    teacher_mask = (teacher_logits > threshold).float()
+    total = student_mask.sum() + teacher_mask.sum()
+    if total == 0:
+        return 1.0
+    return (2. * (student_mask * teacher_mask).sum() / total).item()
+
+def distill_model(student, teacher, train_loader, val_loader, optimizer, scheduler, device, epochs=30,
+                  temperature=2.0, alpha=0.7, output_path='unet_lite_student.pth', base_channels=16,
+                  teacher_metadata=None, image_size=512, throughput_path='distill_throughput.json', logger=None):
+    """
+    Training student (UNetLite) agar meniru soft output teacher (UNetCompatible)
+    
+    Args:
+        student (nn.Module): Model student
+        teacher (nn.Module): Model teacher yang sudah ter-load
+        output_path (str): Path model bundle student terbaik
+        base_channels (int): Disimpan di bundle agar VideoProcessor bisa membangun ulang student
+        teacher_metadata (dict): Metadata bundle teacher; normalisasi, threshold dan kalibrasi
+            student mengikuti teacher (default: konvensi UNetCompatible)
+        image_size (int): Ukuran input distilasi (input_size bundle student)
+        throughput_path (str): JSON report throughput loading vs compute per epoch
+        logger (TrainingLogger): Logger metric per epoch (default: tidak mencatat)
+    
+    Returns:
+        nn.Module: Student yang sudah ditraining
+    """
+    from video_inference import save_model_bundle, default_bundle_metadata, model_input_channels
+    
+    if teacher_metadata is None:
+        teacher_metadata = default_bundle_metadata()
+    student_channels = model_input_channels(student)
+    if student_channels != teacher_metadata["preprocessing"]["channels"]:
+        raise ValueError(f"Student expects {student_channels} input channels, teacher input has "
+                         f"{teacher_metadata['preprocessing']['channels']}")
+    mean = teacher_metadata["preprocessing"]["mean"]
+    std = teacher_metadata["preprocessing"]["std"]
+    threshold = teacher_metadata["threshold"]
+    
+    logger = logger or TrainingLogger()
+    logger.start(new_run_id(), {
+        "epochs": epochs,
+        "learning_rate": optimizer.param_groups[0]['lr'],
+        "batch_size": train_loader.batch_size,
+        "model": "UNetLite (distilled)",
+        "base_channels": base_channels,
+        "temperature": temperature,
+        "alpha": alpha
+    })
+    
+    teacher.eval()
     best_val_loss = float('inf')
-    train_losses = []
-    val_losses = []
-    train_dices = []
-    val_dices = []
-    train_ious = []
-    val_ious = []
+    throughput_history = []
     
     for epoch in range(epochs):
         # Training phase
-        model.train()
+        student.train()
         train_loss = 0.0
-        train_dice = 0.0
-        train_iou = 0.0
+        train_agreement = 0.0
+        timer = StageTimer()
+        timer.start()
         
-        for batch_idx, (images, masks) in enumerate(train_loader):
-            images, masks = images.to(device), masks.to(device)
+        for images, masks in train_loader:
+            timer.mark("data")
+            images = to_teacher_input(images.to(device, non_blocking=True), mean, std)
+            masks = masks.to(device, non_blocking=True)
+            
+            with torch.no_grad():
+                teacher_logits = teacher(images)
             
             optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs, masks)
+            student_logits = student(images)
+            loss = distillation_loss(student_logits, teacher_logits, masks, temperature, alpha)
             loss.backward()
             optimizer.step()
             
             train_loss += loss.item()
-            train_dice += dice_coefficient(outputs, masks).item()
-            train_iou += calculate_iou(outputs, masks)
+            train_agreement += teacher_agreement(student_logits.detach(), teacher_logits, threshold)
+            timer.mark("compute")
+        
+        throughput = summarize_throughput(timer, len(train_loader.dataset))
+        throughput_history.append(dict(throughput, epoch=epoch + 1))
         
         # Validation phase
-        model.eval()
+        student.eval()
         val_loss = 0.0
         val_dice = 0.0
-        val_iou = 0.0
+        val_agreement = 0.0
         
         with torch.no_grad():
             for images, masks in val_loader:
-                images, masks = images.to(device), masks.to(device)
-                outputs = model(images)
-                loss = criterion(outputs, masks)
+                images, masks = to_teacher_input(images.to(device), mean, std), masks.to(device)
+                teacher_logits = teacher(images)
+                student_logits = student(images)
                 
-                val_loss += loss.item()
-                val_dice += dice_coefficient(outputs, masks).item()
-                val_iou += calculate_iou(outputs, masks)
+                val_loss += distillation_loss(student_logits, teacher_logits, masks, temperature, alpha).item()
+                val_dice += dice_coefficient(student_logits, masks).item()
+                val_agreement += teacher_agreement(student_logits, teacher_logits, threshold)
         
-        # Calculate averages
         train_loss /= len(train_loader)
+        train_agreement /= len(train_loader)
         val_loss /= len(val_loader)
-        train_dice /= len(train_loader)
         val_dice /= len(val_loader)
-        train_iou /= len(train_loader)
-        val_iou /= len(val_loader)
+        val_agreement /= len(val_loader)
+        
+        scheduler.step(val_loss)
+        
+        logger.log({
+            "train_loss": train_loss,
+            "val_loss": val_loss,
+            "val_dice": val_dice,
+            "train_teacher_agreement": train_agreement,
+            "val_teacher_agreement": val_agreement,
+            "lr": optimizer.param_groups[0]['lr'],
+            "samples_per_sec": throughput["samples_per_sec"],
+            "input_bound_fraction": throughput["input_bound_fraction"]
+        }, step=epoch + 1)
+        
+        print(f'Epoch [{epoch+1}/{epochs}]')
+        print(f'Train Loss: {train_loss:.4f}, Val Loss: {val_loss:.4f}')
+        print(f'Val Dice (ground truth): {val_dice:.4f}')
+        print(f'Teacher agreement - Train: {train_agreement:.4f}, Val: {val_agreement:.4f}')
+        print(f'LR: {optimizer.param_groups[0]["lr"]:.6f}')
+        print(format_throughput(throughput))
+        if epoch == 0:
+            check_input_bound(throughput)
+        print('-' * 50)
+        
+        # Save best student
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            save_model_bundle(student, output_path, "UNetLite",
+                              model_config={"n_channels": student_channels, "base_channels": base_channels},
+                              input_size=image_size, mean=mean, std=std, threshold=threshold,
+                              calibration=teacher_metadata["calibration"], epoch=epoch + 1, val_loss=val_loss)
+            print(f'New best student saved with val_loss: {val_loss:.4f}')
+    
+    write_throughput_report(throughput_path, train_loader, throughput_history)
+    logger.finish()
+    return student
+
+def train_model(model, train_loader, val_loader, criterion, optimizer, scheduler, device, epochs=50,
+                image_size=256, throughput_path='training_throughput.json', checkpoint_dir='checkpoints',
+                checkpoint_every=5, keep_checkpoints=3, resume_checkpoint=None, precision="fp32",
+                best_model_path='best_unet_model.pth', curves_path='training_curves.png', show_plots=True,
+                logger=None, patience=None, min_delta=0.0, validate_every=1, batch_augment=None,
+                epoch_callback=None, run_id=None):
+    """
+    Training model dengan monitoring metrics dan report throughput loading vs compute
+    
+    Args:
+        epochs (int): Total epoch (termasuk epoch yang sudah selesai sebelum resume)
+        precision (str): "fp32" atau "bf16" (autocast untuk forward, loss di fp32)
+        checkpoint_dir (str): Folder checkpoint training lengkap; checkpoint run ini disimpan di
+            <checkpoint_dir>/<run_id>/ sehingga rotasi tidak menyentuh checkpoint run lain
+        checkpoint_every (int): Simpan checkpoint setiap N epoch (dan di epoch terakhir)
+        keep_checkpoints (int): Jumlah checkpoint terbaru yang disimpan
+        resume_checkpoint (dict): Hasil load_training_checkpoint() untuk melanjutkan training
+        best_model_path (str): Path model bundle terbaik
+        curves_path (str): Path plot kurva training
+        show_plots (bool): Tampilkan plot (matikan untuk run headless/benchmark)
+        logger (TrainingLogger): Logger metric per epoch (default: tidak mencatat); run yang
+            di-resume melanjutkan run logger yang sama
+        patience (int): Early stopping setelah `patience` epoch tanpa perbaikan val_loss > min_delta;
+            bobot terbaik dikembalikan ke model di akhir training (None = tanpa early stopping)
+        min_delta (float): Perbaikan minimum untuk early stopping
+        validate_every (int): Validasi setiap N epoch (dan di epoch terakhir); scheduler dan
+            early stopping hanya di-update pada epoch validasi
+        batch_augment (callable): Augmentasi batch training di device, (images, masks) -> (images, masks),
+            mis. BatchAugmenter (None = augmentasi sudah dilakukan di Dataset)
+        epoch_callback (callable): Dipanggil setelah setiap validasi dengan (epoch, metrics);
+            return True menghentikan training (mis. pruning trial sweep)
+        run_id (str): Id run baru (default: timestamp); run yang di-resume memakai id dari checkpoint
+    
+    Model boleh dibungkus DistributedDataParallel; metric di-all-reduce antar rank dan
+    hanya rank 0 yang menyimpan checkpoint/model, menulis report dan mencatat metric.
+    """
+    main_process = is_main_process()
+    world_size = dist.get_world_size() if dist.is_available() and dist.is_initialized() else 1
+    history = {
+        "best_val_loss": float('inf'),
+        "train_losses": [], "val_losses": [],
+        "train_dices": [], "val_dices": [],
+        "train_ious": [], "val_ious": [],
+        "throughput": [],
+        "best_epoch": 0
+    }
+    start_epoch = 0
+    if resume_checkpoint is not None:
+        getattr(model, "module", model).load_state_dict(resume_checkpoint["model"])
+        optimizer.load_state_dict(resume_checkpoint["optimizer"])
+        scheduler.load_state_dict(resume_checkpoint["scheduler"])
+        history.update(resume_checkpoint["history"])
+        restore_rng_state(resume_checkpoint["rng"])
+        start_epoch = resume_checkpoint["epoch"]
+        # Checkpoints written before the pluggable logger stored the wandb run id
+        run_id = resume_checkpoint.get("run_id") or resume_checkpoint.get("wandb_run_id") or run_id
+        print(f"[OK] Resuming training after epoch {start_epoch} "
+              f"(best val_loss so far: {history['best_val_loss']:.4f})")
+        if train_loader.num_workers > 0 and train_loader.persistent_workers:
+            print("[INFO] Persistent DataLoader workers restart their augmentation RNG on resume; "
+                  "disable persistent_workers for bit-exact augmentations")
+    
+    # Start the metric logger (a resumed run continues the same logger run)
+    logger = logger if logger is not None and main_process else TrainingLogger()
+    run_id = run_id or new_run_id()
+    run_checkpoint_dir = os.path.join(checkpoint_dir, run_id)
+    logger.start(run_id, {
+        "epochs": epochs,
+        "learning_rate": optimizer.param_groups[0]['lr'],
+        "batch_size": train_loader.batch_size,
+        "model": "UNet",
+        "precision": precision,
+        "world_size": world_size
+    })
+    
+    best_val_loss = history["best_val_loss"]
+    early_stopping = None
+    if patience:
+        early_stopping = EarlyStopping(patience, min_delta, **history.get("early_stopping", {}))
+    # In-memory copy of the best weights (restored at the end); after a resume the best bundle is reloaded
+    best_state = None
+    if resume_checkpoint is not None and early_stopping is not None and os.path.exists(best_model_path):
+        from video_inference import split_bundle
+        best_state = split_bundle(torch.load(best_model_path, map_location='cpu'))[1]
+    stopped_epoch = start_epoch
+    train_losses = history["train_losses"]
+    val_losses = history["val_losses"]
+    train_dices = history["train_dices"]
+    val_dices = history["val_dices"]
+    train_ious = history["train_ious"]
+    val_ious = history["val_ious"]
+    throughput_history = history["throughput"]
+    
+    for epoch in range(start_epoch, epochs):
+        # Training phase (DistributedSampler reshuffles its shard per epoch)
+        if isinstance(train_loader.sampler, DistributedSampler):
+            train_loader.sampler.set_epoch(epoch)
+        model.train()
+        train_metrics = SegmentationMetricAccumulator(device)
+        timer = StageTimer()
+        timer.start()
+        
+        for batch_idx, (images, masks) in enumerate(train_loader):
+            timer.mark("data")
+            images, masks = images.to(device, non_blocking=True), masks.to(device, non_blocking=True)
+            if batch_augment is not None:
+                images, masks = batch_augment(images, masks)
+                timer.mark("augment")
+            
+            optimizer.zero_grad()
+            with autocast_context(precision, device):
+                outputs = model(images)
+            loss = criterion(outputs.float(), masks)
+            loss.backward()
+            optimizer.step()
+            
+            train_metrics.update(loss, outputs, masks)
+            timer.mark("compute")
+        
+        # Single device sync per epoch; counted as compute so epoch totals stay complete
+        train_results = train_metrics.compute()
+        timer.mark("compute")
+        # Ranks step in lockstep (gradient all-reduce), so rank 0's time covers all shards
+        throughput = summarize_throughput(timer, len(train_loader.sampler) * world_size)
+        
+        # Validation phase (every validate_every epochs and after the last one)
+        validate = (epoch + 1) % validate_every == 0 or epoch + 1 == epochs
+        val_seconds = None
+        if validate:
+            val_start = time.perf_counter()
+            model.eval()
+            val_metrics = SegmentationMetricAccumulator(device)
+            
+            with torch.no_grad():
+                for images, masks in val_loader:
+                    images, masks = images.to(device, non_blocking=True), masks.to(device, non_blocking=True)
+                    with autocast_context(precision, device):
+                        outputs = model(images)
+                    loss = criterion(outputs.float(), masks)
+                    val_metrics.update(loss, outputs, masks)
+            
+            val_results = val_metrics.compute()
+            val_seconds = round(time.perf_counter() - val_start, 3)
+        else:
+            val_results = {"loss": float('nan'), "dice": float('nan'), "iou": float('nan')}
+        throughput_history.append(dict(throughput, epoch=epoch + 1, world_size=world_size, val_seconds=val_seconds))
+        
+        # Epoch-level metrics from the accumulated counts (NaN for epochs without validation)
+        train_loss, train_dice, train_iou = train_results["loss"], train_results["dice"], train_results["iou"]
+        val_loss, val_dice, val_iou = val_results["loss"], val_results["dice"], val_results["iou"]
         
         # Store metrics
         train_losses.append(train_loss)
@@ -259,106 +1076,910 @@ def train_model(model, train_loader, val_loader, criterion, optimizer, scheduler
         train_ious.append(train_iou)
         val_ious.append(val_iou)
         
-        # Learning rate scheduling
-        scheduler.step(val_loss)
+        # Learning rate scheduling (plateau patience counts validations)
+        if validate:
+            scheduler.step(val_loss)
         
-        # Log to wandb
-        wandb.log({
-            "epoch": epoch + 1,
+        # Log metrics
+        metrics = {
             "train_loss": train_loss,
-            "val_loss": val_loss,
             "train_dice": train_dice,
-            "val_dice": val_dice,
             "train_iou": train_iou,
-            "val_iou": val_iou,
-            "lr": optimizer.param_groups[0]['lr']
-        })
+            "lr": optimizer.param_groups[0]['lr'],
+            "samples_per_sec": throughput["samples_per_sec"],
+            "input_bound_fraction": throughput["input_bound_fraction"],
+            # Always present (None on epochs without validation) so the log schema is fixed
+            "val_loss": val_loss if validate else None,
+            "val_dice": val_dice if validate else None,
+            "val_iou": val_iou if validate else None
+        }
+        logger.log(metrics, step=epoch + 1)
         
         print(f'Epoch [{epoch+1}/{epochs}]')
-        print(f'Train Loss: {train_loss:.4f}, Val Loss: {val_loss:.4f}')
-        print(f'Train Dice: {train_dice:.4f}, Val Dice: {val_dice:.4f}')
-        print(f'Train IoU: {train_iou:.4f}, Val IoU: {val_iou:.4f}')
+        if validate:
+            print(f'Train Loss: {train_loss:.4f}, Val Loss: {val_loss:.4f}')
+            print(f'Train Dice: {train_dice:.4f}, Val Dice: {val_dice:.4f}')
+            print(f'Train IoU: {train_iou:.4f}, Val IoU: {val_iou:.4f}')
+        else:
+            print(f'Train Loss: {train_loss:.4f}, Dice: {train_dice:.4f}, IoU: {train_iou:.4f} '
+                  f'(validation every {validate_every} epochs)')
         print(f'LR: {optimizer.param_groups[0]["lr"]:.6f}')
+        print(format_throughput(throughput))
+        if epoch == 0:
+            check_input_bound(throughput)
         print('-' * 50)
         
-        # Save best model
-        if val_loss < best_val_loss:
+        # Save best model (val_loss is all-reduced, so every rank agrees on "best")
+        if validate and val_loss < best_val_loss:
             best_val_loss = val_loss
-            torch.save(model.state_dict(), 'best_unet_model.pth')
-            print(f'New best model saved with val_loss: {val_loss:.4f}')
-    
-    # Plot training curves
-    plt.figure(figsize=(15, 5))
-    
-    plt.subplot(1, 3, 1)
-    plt.plot(train_losses, label='Train Loss')
-    plt.plot(val_losses, label='Val Loss')
-    plt.title('Loss Curve')
-    plt.xlabel('Epoch')
-    plt.ylabel('Loss')
-    plt.legend()
-    plt.grid(True)
-    
-    plt.subplot(1, 3, 2)
-    plt.plot(train_dices, label='Train Dice')
-    plt.plot(val_dices, label='Val Dice')
-    plt.title('Dice Coefficient Curve')
-    plt.xlabel('Epoch')
-    plt.ylabel('Dice')
-    plt.legend()
-    plt.grid(True)
-    
-    plt.subplot(1, 3, 3)
-    plt.plot(train_ious, label='Train IoU')
-    plt.plot(val_ious, label='Val IoU')
-    plt.title('IoU Curve')
-    plt.xlabel('Epoch')
-    plt.ylabel('IoU')
-    plt.legend()
-    plt.grid(True)
-    
-    plt.tight_layout()
-    plt.savefig('training_curves.png')
-    plt.show()
-    
-    wandb.finish()
+            history["best_epoch"] = epoch + 1
+            if early_stopping is not None:
+                best_state = {key: value.detach().cpu().clone()
+                              for key, value in getattr(model, "module", model).state_dict().items()}
+            if main_process:
+                save_unet_bundle(model, best_model_path, image_size, epoch=epoch + 1, val_loss=val_loss)
+                print(f'New best model saved with val_loss: {val_loss:.4f}')
+        
+        early_stop = validate and early_stopping is not None and early_stopping.update(val_loss, epoch + 1)
+        # The callback sees every validation; its stop request only matters if we are not stopping anyway
+        callback_stop = validate and epoch_callback is not None and bool(epoch_callback(epoch + 1, metrics))
+        pruned = callback_stop and not early_stop
+        stop = early_stop or pruned
+        stopped_epoch = epoch + 1
+        if early_stopping is not None:
+            history["early_stopping"] = early_stopping.state_dict()
+        
+        # Full checkpoint (model, optimizer, scheduler, history, RNG) for --resume
+        if main_process and ((epoch + 1) % checkpoint_every == 0 or epoch + 1 == epochs or stop):
+            history["best_val_loss"] = best_val_loss
+            path = save_training_checkpoint(run_checkpoint_dir, epoch + 1, model, optimizer, scheduler, history,
+                                            keep=keep_checkpoints, image_size=image_size,
+                                            run_id=run_id, precision=precision)
+            print(f'Checkpoint saved: {path}')
+        
+        if early_stop:
+            print(f"[INFO] Early stopping: no val_loss improvement > {min_delta} for {patience} epochs "
+                  f"(best epoch {early_stopping.best_epoch})")
+            break
+        if pruned:
+            print(f"[INFO] Training stopped by epoch_callback after epoch {epoch + 1}")
+            break
+    
+    # Continue from (and export) the best weights rather than the last ones
+    if best_state is not None:
+        getattr(model, "module", model).load_state_dict(best_state)
+        print(f"[OK] Restored best weights from epoch {history['best_epoch']} (val_loss: {best_val_loss:.4f})")
+    
+    run_summary = summarize_run(throughput_history, epochs, stopped_epoch, history["best_epoch"])
+    print(f"Run summary: {run_summary['epochs_run']}/{epochs} epochs, {run_summary['validations_run']} validations, "
+          f"~{run_summary['estimated_saved_seconds']:.0f}s saved ({run_summary['saved_fraction'] * 100:.1f}% of a full run)")
+    
+    if main_process:
+        # Plot training curves (validation points only for the epochs that were validated)
+        val_epochs = [i for i, value in enumerate(val_losses) if not np.isnan(value)]
+        plt.figure(figsize=(15, 5))
+    
+        plt.subplot(1, 3, 1)
+        plt.plot(train_losses, label='Train Loss')
+        plt.plot(val_epochs, [val_losses[i] for i in val_epochs], label='Val Loss')
+        plt.title('Loss Curve')
+        plt.xlabel('Epoch')
+        plt.ylabel('Loss')
+        plt.legend()
+        plt.grid(True)
+    
+        plt.subplot(1, 3, 2)
+        plt.plot(train_dices, label='Train Dice')
+        plt.plot(val_epochs, [val_dices[i] for i in val_epochs], label='Val Dice')
+        plt.title('Dice Coefficient Curve')
+        plt.xlabel('Epoch')
+        plt.ylabel('Dice')
+        plt.legend()
+        plt.grid(True)
+    
+        plt.subplot(1, 3, 3)
+        plt.plot(train_ious, label='Train IoU')
+        plt.plot(val_epochs, [val_ious[i] for i in val_epochs], label='Val IoU')
+        plt.title('IoU Curve')
+        plt.xlabel('Epoch')
+        plt.ylabel('IoU')
+        plt.legend()
+        plt.grid(True)
+    
+        plt.tight_layout()
+        plt.savefig(curves_path)
+        if show_plots:
+            plt.show()
+        plt.close()
+    
+        write_throughput_report(throughput_path, train_loader, throughput_history, run_summary=run_summary)
+    logger.finish()
     return model
 
-def main():
-    """Main function untuk training"""
-    # Konfigurasi direktori
-    image_dir = r"D:\Ridho\TA\Common Carotid Artery Ultrasound Images\US images"
-    mask_dir = r"D:\Ridho\TA\Common Carotid Artery Ultrasound Images\masks"
+def build_data_loaders(image_dir, mask_dir, image_size=256, batch_size=8, cache_dir=None, loader_params=None,
+                       distributed=False, augmentation="albumentations", augmentation_params=None):
+    """
+    Buat DataLoader train/val/test (70/15/15)
+    
+    Args:
+        cache_dir (str): Folder cache memmap; satu sub-folder per ukuran image (None = decode PNG tiap sampel)
+        loader_params (dict): Parameter DataLoader (default: get_dataloader_params())
+        distributed (bool): Bagi setiap split antar rank dengan DistributedSampler
+            (batch_size tetap per proses; split acak sama di semua rank karena seed tetap)
+        augmentation (str): "albumentations" (augmentasi per sampel di Dataset) atau "tensor"
+            (Dataset hanya resize; augmentasi dilakukan train_model dengan BatchAugmenter)
+        augmentation_params (dict): Probabilitas augmentasi (default: get_augmentation_params())
     
+    Augmentasi hanya untuk split train; val/test selalu memakai test_transform (resize saja),
+    sehingga val_loss untuk early stopping/pruning sama untuk kedua engine augmentasi.
+    """
+    loader_kwargs = dataloader_kwargs(loader_params or get_dataloader_params())
     # Augmentasi
-    train_transform, test_transform = get_augmentations()
+    train_transform, test_transform = get_augmentations(image_size, augmentation_params)
+    if augmentation == "tensor":
+        train_transform = test_transform
     
     # Dataset dan DataLoader
-    full_dataset = EnhancedCarotidDataset(image_dir, mask_dir, transform=train_transform)
+    if cache_dir:
+        cache_dir = os.path.join(cache_dir, f"{image_size}px")
+    full_dataset = EnhancedCarotidDataset(image_dir, mask_dir, transform=train_transform,
+                                          cache_dir=cache_dir, image_size=image_size)
+    # Val/test read the same samples without augmentation (same names/cache, same split indices)
+    eval_dataset = EnhancedCarotidDataset(image_dir, mask_dir, transform=test_transform,
+                                          cache_dir=cache_dir, image_size=image_size)
     train_size = int(0.7 * len(full_dataset))
     val_size = int(0.15 * len(full_dataset))
     test_size = len(full_dataset) - train_size - val_size
-    train_dataset, val_dataset, test_dataset = random_split(full_dataset, [train_size, val_size, test_size])
+    train_dataset, val_split, test_split = random_split(full_dataset, [train_size, val_size, test_size],
+                                                        generator=torch.Generator().manual_seed(SPLIT_SEED))
+    val_dataset = Subset(eval_dataset, val_split.indices)
+    test_dataset = Subset(eval_dataset, test_split.indices)
     
-    train_loader = DataLoader(train_dataset, batch_size=8, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=8, shuffle=False)
-    test_loader = DataLoader(test_dataset, batch_size=8, shuffle=False)
+    if distributed:
+        train_loader = DataLoader(train_dataset, batch_size=batch_size,
+                                  sampler=DistributedSampler(train_dataset, shuffle=True, seed=SPLIT_SEED),
+                                  **loader_kwargs)
+        val_loader = DataLoader(val_dataset, batch_size=batch_size,
+                                sampler=DistributedSampler(val_dataset, shuffle=False), **loader_kwargs)
+        test_loader = DataLoader(test_dataset, batch_size=batch_size,
+                                 sampler=DistributedSampler(test_dataset, shuffle=False), **loader_kwargs)
+    else:
+        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, **loader_kwargs)
+        val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, **loader_kwargs)
+        test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False, **loader_kwargs)
     
     print(f"Dataset sizes - Train: {train_size}, Val: {val_size}, Test: {test_size}")
+    print(f"DataLoader: {loader_kwargs}")
+    return train_loader, val_loader, test_loader
+
+def run_distillation(args):
+    """Distilasi checkpoint UNetCompatible ke student UNetLite, lalu bandingkan keduanya"""
+    from video_inference import UNetLite, load_model_bundle
+    
+    if not os.path.exists(args.teacher):
+        print(f"[ERROR] Teacher model not found: {args.teacher}")
+        return
+    
+    teacher, teacher_metadata = load_model_bundle(args.teacher, map_location=device)
+    teacher = teacher.to(device)
+    print(f"Teacher: {args.teacher} ({teacher_metadata['architecture']})")
+    
+    train_loader, val_loader, _ = build_data_loaders(args.image_dir, args.mask_dir,
+                                                     args.image_size, args.batch_size, args.cache_dir,
+                                                     get_dataloader_params(num_workers=args.num_workers))
+    
+    # Student sees the same input as the teacher (1 channel for grayscale/UNet teachers)
+    student = UNetLite(n_channels=teacher_metadata["preprocessing"]["channels"],
+                       base_channels=args.base_channels).to(device)
+    teacher_params = sum(p.numel() for p in teacher.parameters())
+    student_params = sum(p.numel() for p in student.parameters())
+    print(f"Parameters - Teacher: {teacher_params:,}, Student: {student_params:,} "
+          f"({teacher_params / student_params:.1f}x smaller)")
+    
+    optimizer = optim.Adam(student.parameters(), lr=args.lr)
+    scheduler = ReduceLROnPlateau(optimizer, mode='min', factor=0.1, patience=5)
+    
+    print("Starting distillation...")
+    distill_model(student, teacher, train_loader, val_loader, optimizer, scheduler, device,
+                  epochs=args.epochs, temperature=args.temperature, alpha=args.alpha,
+                  output_path=args.student_out, base_channels=args.base_channels,
+                  teacher_metadata=teacher_metadata, image_size=args.image_size,
+                  logger=create_training_logger(args.logger, args.log_dir))
+    print(f"Distillation completed! Student saved as '{args.student_out}'")
+    
+    # Fps and diameter agreement of the best student against the teacher on a real video
+    if args.report_subject:
+        from model_comparison import compare_subject_models
+        
+        summary = compare_subject_models(args.report_subject, [args.teacher, args.student_out])
+        teacher_stats, student_stats = list(summary["models"].values())
+        if student_stats["forward_ms_per_frame"] > 0:
+            print(f"Student speed-up: {teacher_stats['forward_ms_per_frame'] / student_stats['forward_ms_per_frame']:.2f}x "
+                  f"({teacher_stats['forward_ms_per_frame']:.1f} -> {student_stats['forward_ms_per_frame']:.1f} ms/frame)")
+
+def benchmark_precision(args, image_size):
+    """
+    Bandingkan training fp32 vs bf16 pada split dan bobot awal yang sama
+    
+    Setiap presisi dilatih args.epochs epoch dari inisialisasi yang sama; waktu epoch
+    (fase training) diambil dari throughput history dan Dice dari history checkpoint akhir.
+    Hasil disimpan di <benchmark_dir>/precision_benchmark.json.
+    """
+    train_loader, val_loader, _ = build_data_loaders(args.image_dir, args.mask_dir, image_size, args.batch_size,
+                                                     args.cache_dir, get_dataloader_params(num_workers=args.num_workers))
+    
+    results = {}
+    for precision in TRAINING_PRECISIONS:
+        print(f"\n=== Precision benchmark: {precision} ===")
+        run_dir = os.path.join(args.benchmark_dir, precision)
+        os.makedirs(run_dir, exist_ok=True)
+        
+        # Own run id: a rerun never reads the history of an older benchmark's checkpoint
+        run_id = f"{precision}-{new_run_id()}"
+        
+        # Same initial weights and same data order for every precision
+        torch.manual_seed(SPLIT_SEED)
+        model = UNet().to(device)
+        optimizer = optim.Adam(model.parameters(), lr=args.lr)
+        scheduler = ReduceLROnPlateau(optimizer, mode='min', factor=0.1, patience=5)
+        train_model(model, train_loader, val_loader, mixed_loss, optimizer, scheduler, device,
+                    epochs=args.epochs, image_size=image_size, precision=precision,
+                    throughput_path=os.path.join(run_dir, "throughput.json"),
+                    checkpoint_dir=os.path.join(run_dir, "checkpoints"), checkpoint_every=args.epochs,
+                    keep_checkpoints=1, best_model_path=os.path.join(run_dir, "best_unet_model.pth"),
+                    curves_path=os.path.join(run_dir, "training_curves.png"), show_plots=False, run_id=run_id)
+        
+        history = load_training_checkpoint(
+            find_latest_checkpoint(os.path.join(run_dir, "checkpoints", run_id)))["history"]
+        epoch_seconds = [epoch["data_seconds"] + epoch.get("augment_seconds", 0.0) + epoch["compute_seconds"]
+                         for epoch in history["throughput"]]
+        # First epoch includes worker start-up and allocator warm-up
+        steady = epoch_seconds[1:] or epoch_seconds
+        results[precision] = {
+            "epochs": len(epoch_seconds),
+            "epoch_seconds": [round(seconds, 3) for seconds in epoch_seconds],
+            "mean_epoch_seconds": round(float(np.mean(steady)), 3),
+            "samples_per_sec": round(float(np.mean([epoch["samples_per_sec"] for epoch in history["throughput"]])), 2),
+            "final_val_dice": round(history["val_dices"][-1], 4),
+            "best_val_loss": round(history["best_val_loss"], 4)
+        }
+    
+    fp32, bf16 = results["fp32"], results["bf16"]
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "device": str(device),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "image_size": image_size,
+        "batch_size": args.batch_size,
+        "results": results,
+        "bf16_speedup": round(fp32["mean_epoch_seconds"] / bf16["mean_epoch_seconds"], 3),
+        "dice_delta": round(bf16["final_val_dice"] - fp32["final_val_dice"], 4)
+    }
+    report_path = os.path.join(args.benchmark_dir, "precision_benchmark.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\n{'Precision':<10} {'Epoch (s)':>10} {'Samples/s':>10} {'Val Dice':>9} {'Best loss':>10}")
+    for precision, result in results.items():
+        print(f"{precision:<10} {result['mean_epoch_seconds']:>10.2f} {result['samples_per_sec']:>10.1f} "
+              f"{result['final_val_dice']:>9.4f} {result['best_val_loss']:>10.4f}")
+    print(f"bf16 speed-up: {report['bf16_speedup']:.2f}x, Dice delta: {report['dice_delta']:+.4f}")
+    print(f"[OK] Precision benchmark saved to: {report_path}")
+    return report
+
+def benchmark_augmentation(args, image_size, samples=256, warmup_batches=2):
+    """
+    Bandingkan throughput augmentasi albumentations (per sampel, NumPy) vs BatchAugmenter (per batch, tensor)
+    
+    Kedua engine memproses sampel yang sama dari cache dataset; jalur albumentations termasuk
+    konversi ke tensor seperti di __getitem__, jalur tensor diukur di device training dengan
+    batch_size dari args. Hasil disimpan di <benchmark_dir>/augmentation_benchmark.json.
+    """
+    if not args.cache_dir:
+        print("[ERROR] The augmentation benchmark reads from the dataset cache; drop --no_cache")
+        return None
+    
+    dataset = EnhancedCarotidDataset(args.image_dir, args.mask_dir,
+                                     cache_dir=os.path.join(args.cache_dir, f"{image_size}px"), image_size=image_size)
+    count = min(samples, len(dataset))
+    raw = [dataset._load_cached(i) for i in range(count)]
+    augmentation_params = get_augmentation_params()
+    train_transform, _ = get_augmentations(image_size, augmentation_params)
+    
+    # albumentations: one sample at a time (what each DataLoader worker does)
+    start = time.perf_counter()
+    for image, mask in raw:
+        augmented = train_transform(image=image, mask=mask)
+        sample = (torch.from_numpy(augmented['image']).float().unsqueeze(0) / 255.0,
+                  torch.from_numpy(augmented['mask']).float().unsqueeze(0))
+    albumentations_seconds = time.perf_counter() - start
     
-    # Model, optimizer, scheduler, dan loss
-    model = UNet().to(device)
-    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    # tensor: whole batches on the training device
+    images = torch.stack([torch.from_numpy(image).float().unsqueeze(0) / 255.0 for image, _ in raw]).to(device)
+    masks = torch.stack([torch.from_numpy(mask).unsqueeze(0) for _, mask in raw]).to(device)
+    augmenter = BatchAugmenter.from_params(augmentation_params)
+    batches = [(images[i:i + args.batch_size], masks[i:i + args.batch_size]) for i in range(0, count, args.batch_size)]
+    for batch_images, batch_masks in batches[:warmup_batches]:
+        augmenter(batch_images, batch_masks)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for batch_images, batch_masks in batches:
+        augmenter(batch_images, batch_masks)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    tensor_seconds = time.perf_counter() - start
+    
+    workers = max(1, get_dataloader_params(num_workers=args.num_workers)["num_workers"])
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "device": str(device),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "image_size": image_size,
+        "batch_size": args.batch_size,
+        "samples": count,
+        "albumentations": {
+            "seconds": round(albumentations_seconds, 3),
+            "samples_per_sec": round(count / albumentations_seconds, 2),
+            # Ideal scaling over the configured DataLoader workers
+            "dataloader_workers": workers,
+            "estimated_samples_per_sec_with_workers": round(count / albumentations_seconds * workers, 2)
+        },
+        "tensor": {
+            "seconds": round(tensor_seconds, 3),
+            "samples_per_sec": round(count / tensor_seconds, 2)
+        },
+        "tensor_speedup": round(albumentations_seconds / tensor_seconds, 3) if tensor_seconds > 0 else None
+    }
+    os.makedirs(args.benchmark_dir, exist_ok=True)
+    report_path = os.path.join(args.benchmark_dir, "augmentation_benchmark.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\n{'Engine':<16} {'Samples/s':>10}")
+    print(f"{'albumentations':<16} {report['albumentations']['samples_per_sec']:>10.1f} "
+          f"(~{report['albumentations']['estimated_samples_per_sec_with_workers']:.1f} with {workers} workers)")
+    print(f"{'tensor':<16} {report['tensor']['samples_per_sec']:>10.1f} ({device})")
+    print(f"Tensor speed-up (single process): {report['tensor_speedup']:.2f}x")
+    print(f"[OK] Augmentation benchmark saved to: {report_path}")
+    return report
+
+def default_memory_budget_mb(fraction=0.8):
+    """
+    Budget memory default: fraksi memory device CUDA, atau memory sistem di CPU
+    
+    Returns:
+        float: Budget dalam MB (None jika memory sistem tidak bisa dibaca)
+    """
+    if device.type == 'cuda':
+        return torch.cuda.get_device_properties(device).total_memory / (1024 * 1024) * fraction
+    try:
+        import psutil
+        return psutil.virtual_memory().total / (1024 * 1024) * fraction
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024) * fraction
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def measure_training_step(batch_size, image_size=256, checkpointing="none", precision="fp32", steps=3):
+    """
+    Ukur peak memory dan waktu satu training step UNet (input sintetis) untuk satu batch size
+    
+    Memory: peak allocated di CUDA, atau peak RSS proses di CPU (karena itu dijalankan di
+    process terpisah oleh probe_batch_size, satu process per batch size).
+    
+    Returns:
+        dict: batch_size, checkpointing, peak_memory_mb, baseline_memory_mb, step_ms, ms_per_sample
+    """
+    from benchmark_inference import peak_memory_mb
+    
+    torch.manual_seed(SPLIT_SEED)
+    model = UNet(checkpointing=checkpointing).to(device)
+    optimizer = optim.Adam(model.parameters(), lr=1e-3)
+    images = torch.rand(batch_size, 1, image_size, image_size, device=device)
+    masks = (torch.rand(batch_size, 1, image_size, image_size, device=device) > 0.5).float()
+    
+    def step():
+        optimizer.zero_grad()
+        with autocast_context(precision, device):
+            outputs = model(images)
+        loss = mixed_loss(outputs.float(), masks)
+        loss.backward()
+        optimizer.step()
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+    
+    model.train()
+    if device.type == 'cuda':
+        torch.cuda.reset_peak_memory_stats(device)
+        baseline = torch.cuda.memory_allocated(device) / (1024 * 1024)
+    else:
+        baseline = peak_memory_mb()
+    step()  # warm-up, also allocates the optimizer state
+    times = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - start)
+    peak = torch.cuda.max_memory_allocated(device) / (1024 * 1024) if device.type == 'cuda' else peak_memory_mb()
+    step_ms = float(np.median(times)) * 1000
+    return {
+        "batch_size": batch_size,
+        "checkpointing": checkpointing,
+        "peak_memory_mb": round(peak, 1) if peak is not None else None,
+        "baseline_memory_mb": round(baseline, 1) if baseline is not None else None,
+        "step_ms": round(step_ms, 2),
+        "ms_per_sample": round(step_ms / batch_size, 3)
+    }
+
+def _probe_worker(result_queue, *probe_args):
+    """Entry point process probe_batch_size"""
+    try:
+        result_queue.put(measure_training_step(*probe_args))
+    except RuntimeError as e:
+        # Out-of-memory errors surface as RuntimeError (CUDA OOM, failed CPU allocation)
+        result_queue.put({"batch_size": probe_args[0], "error": str(e).splitlines()[0][:200]})
+
+def probe_batch_size(batch_size, image_size=256, checkpointing="none", precision="fp32", steps=3):
+    """
+    Jalankan measure_training_step di process baru (peak memory bersih, OOM tidak mematikan pemanggil)
+    
+    Returns:
+        dict: Hasil measure_training_step, atau {"batch_size", "error"} jika gagal/di-kill OS
+    """
+    context = mp.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=_probe_worker,
+                              args=(result_queue, batch_size, image_size, checkpointing, precision, steps))
+    process.start()
+    result = None
+    while result is None and (process.is_alive() or not result_queue.empty()):
+        try:
+            result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            pass
+    process.join()
+    if result is None:
+        result = {"batch_size": batch_size, "error": f"probe process exited with code {process.exitcode}"}
+    return result
+
+def find_max_batch_size(image_size, memory_budget_mb, checkpointing="none", precision="fp32",
+                        max_batch_size=256, steps=3):
+    """
+    Cari batch size terbesar yang peak memory training step-nya <= memory_budget_mb
+    (batch size dilipatduakan sampai melebihi budget, lalu binary search)
+    
+    Returns:
+        tuple: (batch size terbesar yang muat (0 jika batch 1 pun tidak muat), list hasil probe)
+    """
+    probes = []
+    
+    def fits(batch_size):
+        result = probe_batch_size(batch_size, image_size, checkpointing, precision, steps)
+        result["fits"] = "error" not in result and result["peak_memory_mb"] is not None \
+            and result["peak_memory_mb"] <= memory_budget_mb
+        probes.append(result)
+        if "error" in result:
+            print(f"  batch {batch_size:>4}: failed ({result['error']})")
+        else:
+            print(f"  batch {batch_size:>4}: {result['peak_memory_mb']:>9.1f} MB, {result['step_ms']:>9.1f} ms/step "
+                  f"({result['ms_per_sample']:.2f} ms/sample){'' if result['fits'] else ' - over budget'}")
+        return result["fits"]
+    
+    low, high = 0, None
+    batch_size = 1
+    while batch_size <= max_batch_size:
+        if not fits(batch_size):
+            high = batch_size
+            break
+        low = batch_size
+        batch_size *= 2
+    if high is None:
+        return low, probes
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+    return low, probes
+
+def benchmark_batch_size(args, image_size):
+    """
+    Batch size maksimum per mode activation checkpointing untuk budget memory, beserta
+    peak memory vs waktu step setiap probe. Hasil disimpan di <benchmark_dir>/batch_size_report.json.
+    """
+    budget = args.memory_budget_mb or default_memory_budget_mb()
+    if budget is None:
+        print("[ERROR] Could not read the system memory size; set --memory_budget_mb")
+        return None
+    
+    results = {}
+    for mode in CHECKPOINT_MODES:
+        print(f"\n=== Batch size search: checkpointing={mode}, budget {budget:.0f} MB ===")
+        batch_size, probes = find_max_batch_size(image_size, budget, mode, args.precision, args.max_batch_size)
+        best = next((probe for probe in probes if probe["batch_size"] == batch_size and probe["fits"]), None)
+        results[mode] = {
+            "max_batch_size": batch_size,
+            "peak_memory_mb": best["peak_memory_mb"] if best else None,
+            "step_ms": best["step_ms"] if best else None,
+            "ms_per_sample": best["ms_per_sample"] if best else None,
+            "probes": sorted(probes, key=lambda probe: probe["batch_size"])
+        }
+    
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "device": str(device),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "image_size": image_size,
+        "precision": args.precision,
+        "memory_budget_mb": round(budget, 1),
+        "results": results
+    }
+    os.makedirs(args.benchmark_dir, exist_ok=True)
+    report_path = os.path.join(args.benchmark_dir, "batch_size_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\n{'Checkpointing':<14} {'Max batch':>9} {'Peak MB':>9} {'Step ms':>9} {'ms/sample':>10}")
+    for mode, result in results.items():
+        if result["max_batch_size"]:
+            print(f"{mode:<14} {result['max_batch_size']:>9} {result['peak_memory_mb']:>9.1f} "
+                  f"{result['step_ms']:>9.1f} {result['ms_per_sample']:>10.2f}")
+        else:
+            print(f"{mode:<14} {'-':>9} (batch 1 does not fit)")
+    print(f"[OK] Batch size report saved to: {report_path}")
+    return report
+
+def run_training(args, image_size, output_dir='.', model_wrapper=None, train_device=None, epoch_callback=None,
+                 show_plots=True):
+    """
+    Training UNet dari argumen CLI (satu proses, atau satu rank dari training terdistribusi)
+    
+    Args:
+        output_dir (str): Folder output (model, kurva, throughput report)
+        model_wrapper (callable): Bungkus model sebelum training (mis. DistributedDataParallel)
+        train_device (torch.device): Device training (default: device global)
+        epoch_callback (callable): Diteruskan ke train_model (mis. pruning dari sweep_runner)
+        show_plots (bool): Tampilkan kurva training di akhir (selalu mati untuk training terdistribusi)
+    
+    Returns:
+        nn.Module: Model hasil training (None jika resume gagal)
+    """
+    train_device = train_device or device
+    distributed = model_wrapper is not None
+    augmentation_params = get_augmentation_params(**(args.augmentation_params or {}))
+    train_loader, val_loader, test_loader = build_data_loaders(args.image_dir, args.mask_dir,
+                                                               image_size, args.batch_size, args.cache_dir,
+                                                               get_dataloader_params(num_workers=args.num_workers),
+                                                               distributed=distributed, augmentation=args.augmentation,
+                                                               augmentation_params=augmentation_params)
+    
+    # Model, optimizer, scheduler, dan loss (same seed -> identical initial weights on every rank)
+    torch.manual_seed(SPLIT_SEED)
+    model = UNet(checkpointing=args.checkpointing).to(train_device)
+    optimizer = optim.Adam(model.parameters(), lr=args.lr)
     scheduler = ReduceLROnPlateau(optimizer, mode='min', factor=0.1, patience=5)
-    criterion = mixed_loss
+    criterion = functools.partial(mixed_loss, alpha=args.loss_alpha)
+    
+    resume_checkpoint = None
+    if args.resume:
+        # --resume accepts "latest", a run id (sub-folder of --checkpoint_dir) or a checkpoint path
+        resume_run_id = None
+        if args.resume == 'latest':
+            resume_path = find_latest_checkpoint(args.checkpoint_dir)
+        elif os.path.isdir(os.path.join(args.checkpoint_dir, args.resume)):
+            resume_run_id = args.resume
+            resume_path = find_latest_checkpoint(os.path.join(args.checkpoint_dir, args.resume))
+        else:
+            resume_path = args.resume
+        if resume_path is None or not os.path.exists(resume_path):
+            print(f"[ERROR] No checkpoint to resume from: {resume_path or args.checkpoint_dir}")
+            return None
+        print(f"Loading checkpoint: {resume_path}")
+        resume_checkpoint = load_training_checkpoint(resume_path)
+        if resume_run_id is not None and resume_checkpoint.get("run_id") != resume_run_id:
+            print(f"[ERROR] Checkpoint {resume_path} belongs to run {resume_checkpoint.get('run_id')}, "
+                  f"not {resume_run_id}")
+            return None
+        if resume_checkpoint.get("image_size", image_size) != image_size:
+            print(f"[ERROR] Checkpoint was trained at {resume_checkpoint['image_size']}px, not {image_size}px")
+            return None
+    
+    if distributed:
+        model = model_wrapper(model)
+    
+    # Metrics are logged by rank 0 only
+    logger = create_training_logger(args.logger, args.log_dir) if is_main_process() else None
     
     # Train
     print("Starting training...")
-    trained_model = train_model(model, train_loader, val_loader, criterion, optimizer, scheduler, device, epochs=50)
+    trained_model = train_model(model, train_loader, val_loader, criterion, optimizer, scheduler, train_device,
+                                epochs=args.epochs or 50, image_size=image_size,
+                                throughput_path=os.path.join(output_dir, 'training_throughput.json'),
+                                checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every,
+                                keep_checkpoints=args.keep_checkpoints, resume_checkpoint=resume_checkpoint,
+                                precision=args.precision,
+                                best_model_path=os.path.join(output_dir, 'best_unet_model.pth'),
+                                curves_path=os.path.join(output_dir, 'training_curves.png'),
+                                show_plots=show_plots and not distributed, logger=logger, patience=args.patience or None,
+                                min_delta=args.min_delta, validate_every=args.validate_every,
+                                batch_augment=(BatchAugmenter.from_params(augmentation_params)
+                                               if args.augmentation == "tensor" else None),
+                                epoch_callback=epoch_callback)
+    
+    # Save final model (self-describing bundle, loadable by VideoProcessor)
+    if is_main_process():
+        final_path = os.path.join(output_dir, 'final_unet_model.pth')
+        save_unet_bundle(trained_model, final_path, image_size)
+        print(f"Training completed! Model saved as '{final_path}'")
+    return trained_model
+
+def distributed_worker(local_rank, args, image_size, dist_config):
+    """
+    Satu proses training data-parallel (backend gloo, CPU)
+    
+    Rank global = node_rank * nproc_per_node + local_rank. Dengan torchrun (env RANK/WORLD_SIZE
+    sudah di-set) rendezvous memakai env://, selain itu tcp://master_addr:master_port.
+    Gradient di-all-reduce oleh DistributedDataParallel; hanya rank 0 yang menulis output.
+    """
+    if "WORLD_SIZE" in os.environ and "RANK" in os.environ:
+        dist.init_process_group("gloo", init_method="env://")
+    else:
+        rank = dist_config["node_rank"] * dist_config["nproc_per_node"] + local_rank
+        dist.init_process_group("gloo", init_method=f"tcp://{dist_config['master_addr']}:{dist_config['master_port']}",
+                                rank=rank, world_size=dist_config["world_size"])
+    
+    # One process per machine builds (or validates) the dataset cache, the others wait for it
+    if args.cache_dir:
+        if int(os.environ.get("LOCAL_RANK", local_rank)) == 0:
+            build_dataset_cache(args.image_dir, args.mask_dir, os.path.join(args.cache_dir, f"{image_size}px"),
+                                image_size)
+        dist.barrier()
+    
+    # Split the cores of this machine between the local processes
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // dist_config["nproc_per_node"]))
+    if dist.get_rank() != 0:
+        sys.stdout = open(os.devnull, "w")
+    
+    try:
+        run_training(args, image_size, output_dir=dist_config.get("output_dir", "."),
+                     model_wrapper=DistributedDataParallel, train_device=torch.device('cpu'))
+    finally:
+        dist.destroy_process_group()
+
+def launch_distributed(args, image_size, output_dir='.'):
+    """
+    Jalankan args.nproc_per_node proses training di mesin ini (atau satu rank per proses di bawah torchrun)
+    """
+    if args.num_workers is None:
+        # Every rank already uses its own cores; extra loader processes would oversubscribe them
+        args.num_workers = 0
+    
+    if "WORLD_SIZE" in os.environ and "RANK" in os.environ:
+        # Launched by torchrun: this process is one rank
+        dist_config = {"nproc_per_node": int(os.environ.get("LOCAL_WORLD_SIZE", 1)), "output_dir": output_dir}
+        distributed_worker(int(os.environ.get("LOCAL_RANK", 0)), args, image_size, dist_config)
+        return
+    
+    dist_config = {
+        "nproc_per_node": args.nproc_per_node,
+        "node_rank": args.node_rank,
+        "world_size": args.nproc_per_node * args.nnodes,
+        "master_addr": args.master_addr,
+        "master_port": args.master_port,
+        "output_dir": output_dir
+    }
+    print(f"Distributed training: {dist_config['world_size']} processes "
+          f"({args.nnodes} node(s) x {args.nproc_per_node}), gloo @ {args.master_addr}:{args.master_port}")
+    mp.spawn(distributed_worker, args=(args, image_size, dist_config), nprocs=args.nproc_per_node, join=True)
+
+def benchmark_scaling(args, image_size):
+    """
+    Ukur throughput training data-parallel untuk beberapa jumlah proses (default 1/2/4/8)
+    
+    Setiap konfigurasi dilatih args.epochs epoch dari cache dataset dengan batch_size per proses
+    yang sama; samples/s diambil dari throughput report rank 0 (epoch pertama dibuang sebagai warm-up).
+    Hasil disimpan di <benchmark_dir>/scaling_benchmark.json.
+    """
+    if not args.cache_dir:
+        print("[ERROR] The scaling benchmark reads from the dataset cache; drop --no_cache")
+        return None
+    
+    results = {}
+    for i, nproc in enumerate(args.scaling_procs):
+        print(f"\n=== Scaling benchmark: {nproc} process(es) ===")
+        run_dir = os.path.join(args.benchmark_dir, f"{nproc}proc")
+        os.makedirs(run_dir, exist_ok=True)
+        run_args = copy.copy(args)
+        run_args.nproc_per_node, run_args.nnodes, run_args.node_rank = nproc, 1, 0
+        run_args.master_port = args.master_port + i
+        run_args.checkpoint_dir = os.path.join(run_dir, "checkpoints")
+        run_args.checkpoint_every = args.epochs
+        run_args.keep_checkpoints = 1
+        run_args.resume = None
+        run_args.logger = ["none"]
+        run_args.patience = 0
+        launch_distributed(run_args, image_size, output_dir=run_dir)
+        
+        with open(os.path.join(run_dir, "training_throughput.json"), encoding="utf-8") as f:
+            epochs = json.load(f)["epochs"]
+        steady = epochs[1:] or epochs
+        results[nproc] = {
+            "samples_per_sec": round(float(np.mean([epoch["samples_per_sec"] for epoch in steady])), 2),
+            "epoch_seconds": [round(epoch["data_seconds"] + epoch.get("augment_seconds", 0.0) + epoch["compute_seconds"], 3)
+                              for epoch in epochs]
+        }
+    
+    baseline_procs = min(results)
+    baseline = results[baseline_procs]["samples_per_sec"] / baseline_procs
+    for nproc, result in results.items():
+        result["speedup"] = round(result["samples_per_sec"] / baseline, 3) if baseline > 0 else 0.0
+        result["efficiency"] = round(result["speedup"] / nproc, 3)
+    
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "backend": "gloo",
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "image_size": image_size,
+        "batch_size_per_process": args.batch_size,
+        "epochs": args.epochs,
+        "results": {str(nproc): result for nproc, result in results.items()}
+    }
+    os.makedirs(args.benchmark_dir, exist_ok=True)
+    report_path = os.path.join(args.benchmark_dir, "scaling_benchmark.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\n{'Processes':<10} {'Samples/s':>10} {'Speed-up':>9} {'Efficiency':>11}")
+    for nproc, result in results.items():
+        print(f"{nproc:<10} {result['samples_per_sec']:>10.1f} {result['speedup']:>8.2f}x {result['efficiency'] * 100:>10.1f}%")
+    print(f"[OK] Scaling benchmark saved to: {report_path}")
+    return report
+
+def build_arg_parser():
+    """Argument parser CLI training (juga dipakai sweep_runner untuk nilai default trial)"""
+    parser = argparse.ArgumentParser(description='Training Model untuk Segmentasi Karotis')
+    parser.add_argument('--mode', choices=['train', 'distill', 'benchmark_precision', 'benchmark_scaling',
+                                           'benchmark_augmentation', 'benchmark_batch_size'],
+                       default='train',
+                       help='train: UNet from scratch, distill: lightweight student from a teacher checkpoint, '
+                            'benchmark_precision: fp32 vs bf16 epoch time and Dice on the same split, '
+                            'benchmark_scaling: data-parallel throughput for --scaling_procs processes, '
+                            'benchmark_augmentation: albumentations vs batched tensor augmentation throughput, '
+                            'benchmark_batch_size: largest batch per checkpointing mode within --memory_budget_mb')
+    parser.add_argument('--precision', choices=TRAINING_PRECISIONS, default='fp32',
+                       help='bf16: autocast mixed precision (fast on CPUs with bf16 support)')
+    parser.add_argument('--benchmark_dir', type=str, default=None,
+                       help='Output folder for the benchmark modes (default: <mode without the benchmark_ prefix>_benchmark)')
+    parser.add_argument('--augmentation', choices=AUGMENTATION_ENGINES, default='albumentations',
+                       help='albumentations: per sample in the DataLoader workers, '
+                            'tensor: whole batches on the training device (flip/affine/elastic in one grid_sample)')
+    parser.add_argument('--image_dir', type=str,
+                       default=r"D:\Ridho\TA\Common Carotid Artery Ultrasound Images\US images")
+    parser.add_argument('--mask_dir', type=str,
+                       default=r"D:\Ridho\TA\Common Carotid Artery Ultrasound Images\masks")
+    parser.add_argument('--epochs', type=int, default=None, help='Epochs (default: 50 train, 30 distill)')
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--lr', type=float, default=0.001)
+    parser.add_argument('--loss_alpha', type=float, default=0.5, help='BCE weight in the BCE + Dice loss')
+    parser.add_argument('--checkpointing', choices=CHECKPOINT_MODES, default='none',
+                       help='Activation checkpointing: recompute DoubleConv blocks or whole encoder/decoder stages '
+                            'in the backward pass to fit larger batches')
+    parser.add_argument('--auto_batch_size', action='store_true',
+                       help='Use the largest batch size whose training step fits --memory_budget_mb')
+    parser.add_argument('--memory_budget_mb', type=float, default=None,
+                       help='Memory budget per training process (default: 80%% of device/system memory)')
+    parser.add_argument('--max_batch_size', type=int, default=256, help='Upper bound of the batch size search')
+    parser.add_argument('--checkpoint_dir', type=str, default='checkpoints',
+                       help='Folder for full training checkpoints (one sub-folder per run id)')
+    parser.add_argument('--checkpoint_every', type=int, default=5, help='Save a full checkpoint every N epochs')
+    parser.add_argument('--keep_checkpoints', type=int, default=3, help='Number of recent checkpoints to keep')
+    parser.add_argument('--resume', nargs='?', const='latest', default=None, metavar='CHECKPOINT',
+                       help='Continue training from a checkpoint path or a run id '
+                            '(default: latest checkpoint of the most recent run in --checkpoint_dir)')
+    parser.add_argument('--patience', type=int, default=10,
+                       help='Early stopping: epochs without val_loss improvement before stopping (0 = off)')
+    parser.add_argument('--min_delta', type=float, default=1e-4,
+                       help='Early stopping: minimum val_loss decrease that counts as an improvement')
+    parser.add_argument('--validate_every', type=int, default=1, help='Run validation every N epochs')
+    parser.add_argument('--num_workers', type=int, default=None,
+                       help='DataLoader worker processes (default: config.DATALOADER_PARAMS)')
+    parser.add_argument('--cache_dir', type=str, default='dataset_cache',
+                       help='Decoded/resized dataset cache (memory-mapped, rebuilt when the source folders change)')
+    parser.add_argument('--no_cache', dest='cache_dir', action='store_const', const=None,
+                       help='Decode the PNG files for every sample instead of using the cache')
+    parser.add_argument('--logger', nargs='+', choices=LOGGER_BACKENDS, default=['local'],
+                       help='Metric logger backends: local (offline JSONL/CSV), wandb (optional), none')
+    parser.add_argument('--log_dir', type=str, default=DEFAULT_LOG_DIR,
+                       help='Folder for the local logger; render curves with: python training_logger.py <run folder>')
+    parser.add_argument('--image_size', type=int, default=None,
+                       help='Input size, stored in the model bundle (default: 256 train, 512 distill to match the teacher)')
+    
+    dist_group = parser.add_argument_group('distributed (gloo, CPU)')
+    dist_group.add_argument('--nproc_per_node', type=int, default=1,
+                           help='Training processes on this machine; >1 enables data-parallel training')
+    dist_group.add_argument('--nnodes', type=int, default=1, help='Number of machines')
+    dist_group.add_argument('--node_rank', type=int, default=0, help='Index of this machine (0 hosts the rendezvous)')
+    dist_group.add_argument('--master_addr', type=str, default='127.0.0.1', help='Address of node 0')
+    dist_group.add_argument('--master_port', type=int, default=29500, help='Rendezvous port on node 0')
+    dist_group.add_argument('--scaling_procs', type=int, nargs='+', default=[1, 2, 4, 8],
+                           help='Process counts for --mode benchmark_scaling')
+    
+    distill_group = parser.add_argument_group('distillation')
+    distill_group.add_argument('--teacher', type=str, default='UNet_25Mei_Sore.pth')
+    distill_group.add_argument('--student_out', type=str, default='unet_lite_student.pth')
+    distill_group.add_argument('--base_channels', type=int, default=16,
+                              help='Student width: channels of the first level (teacher: 64)')
+    distill_group.add_argument('--temperature', type=float, default=2.0)
+    distill_group.add_argument('--alpha', type=float, default=0.7,
+                              help='Weight of the teacher (soft) loss vs the ground-truth loss')
+    distill_group.add_argument('--report_subject', type=str, default=None,
+                              help='After distillation, compare teacher and student on this data_uji subject')
+    # Overrides of get_augmentation_params() (set by sweep_runner, no CLI flag)
+    parser.set_defaults(augmentation_params=None)
+    return parser
+
+def main():
+    """Main function untuk training"""
+    args = build_arg_parser().parse_args()
+    
+    if args.mode == 'distill':
+        if args.epochs is None:
+            args.epochs = 30
+        if args.image_size is None:
+            args.image_size = 512
+        run_distillation(args)
+        return
+    
+    image_size = args.image_size or 256
+    if args.mode == 'benchmark_precision':
+        if args.epochs is None:
+            args.epochs = 3
+        args.benchmark_dir = args.benchmark_dir or 'precision_benchmark'
+        benchmark_precision(args, image_size)
+        return
+    
+    if args.mode == 'benchmark_batch_size':
+        args.benchmark_dir = args.benchmark_dir or 'batch_size_benchmark'
+        benchmark_batch_size(args, image_size)
+        return
+    
+    if args.auto_batch_size:
+        budget = args.memory_budget_mb or default_memory_budget_mb()
+        if budget is None:
+            print("[ERROR] Could not read the system memory size; set --memory_budget_mb")
+            return
+        print(f"Searching the largest batch size within {budget:.0f} MB (checkpointing={args.checkpointing})...")
+        batch_size, _ = find_max_batch_size(image_size, budget, args.checkpointing, args.precision, args.max_batch_size)
+        if batch_size == 0:
+            print(f"[ERROR] A batch of 1 does not fit in {budget:.0f} MB; try --checkpointing stages")
+            return
+        args.batch_size = batch_size
+        print(f"[OK] Batch size: {batch_size}")
+    
+    if args.mode == 'benchmark_augmentation':
+        args.benchmark_dir = args.benchmark_dir or 'augmentation_benchmark'
+        benchmark_augmentation(args, image_size)
+        return
+    
+    if args.mode == 'benchmark_scaling':
+        if args.epochs is None:
+            args.epochs = 3
+        args.benchmark_dir = args.benchmark_dir or 'scaling_benchmark'
+        benchmark_scaling(args, image_size)
+        return
     
-    # Save final model
-    torch.save(trained_model.state_dict(), 'final_unet_model.pth')
-    print("Training completed! Model saved as 'final_unet_model.pth'")
+    if args.nproc_per_node > 1 or args.nnodes > 1 or "WORLD_SIZE" in os.environ:
+        launch_distributed(args, image_size)
+    else:
+        run_training(args, image_size)
 
 if __name__ == "__main__":
     main()
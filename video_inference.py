@@ -7,6 +7,7 @@ File untuk implementasi model ke data uji video, menghasilkan:
 """
 
 import os
+import sys
 # Set environment variable to avoid OpenMP conflict
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
 
@@ -17,11 +18,18 @@ import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 import csv
+import json
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
 import pandas as pd
-from scipy.interpolate import interp1d
 import argparse
+import cProfile
+import importlib
+import pstats
+from datetime import datetime
+from inference_events import InferenceEventEmitter, ThroughputMeter, format_progress
+from inference_profiler import StageTimer, write_run_report
+from inference_optimizer import fuse_conv_bn
 
 # Set device - try CUDA first, fallback to CPU if issues
 try:
@@ -40,6 +48,39 @@ except Exception as e:
     device = torch.device('cpu')
     print(f"Using device: {device} (CPU fallback)")
 
+# Parameter kalibrasi sesuai notebook
+DEPTH_MM = 50               # Depth pengambilan citra (dalam mm)
+IMAGE_HEIGHT_PX = 1048      # Resolusi vertikal citra (dalam pixel)
+SCALE_MM_PER_PIXEL = DEPTH_MM / IMAGE_HEIGHT_PX  # Konversi pixel ke mm
+
+# Normalisasi input model: ImageNet untuk model 3 channel (sesuai training UNetCompatible),
+# rata-rata channel ImageNet untuk model 1 channel (lihat inference_optimizer.collapse_rgb_input)
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+GRAYSCALE_MEAN = (sum(IMAGENET_MEAN) / 3,)
+GRAYSCALE_STD = (sum(IMAGENET_STD) / 3,)
+
+# Two-tier inference: frame di-infer di resolusi rendah, lalu di-refine di resolusi penuh
+# jika confidence (margin logit di pita boundary mask) di bawah threshold
+BOUNDARY_MARGIN_LOGITS = 2.0    # Margin |logit - threshold| yang dianggap yakin penuh
+DEFAULT_REFINE_THRESHOLD = 0.6  # Confidence minimum agar hasil resolusi rendah dipakai
+TIER_COARSE = "coarse"
+TIER_REFINED = "refined"
+# Tahap timer pass resolusi penuh (refine) dan semua tahap inference two-tier
+FULL_RESOLUTION_STAGES = ("refine_preprocess", "refine_forward", "refine_postprocess")
+TWO_TIER_INFERENCE_STAGES = ("preprocess", "forward", "confidence", "postprocess") + FULL_RESOLUTION_STAGES
+
+# Output mask lossless yang didukung (lihat MaskWriter)
+MASK_OUTPUT_MODES = ("video", "images")
+
+# Default output process_selected_subject (overlay penuh, tanpa mask terpisah)
+DEFAULT_OUTPUT_OPTIONS = {
+    "overlay": True,
+    "overlay_scale": 1.0,
+    "overlay_frame_step": 1,
+    "mask_output": None
+}
+
 class UNetCompatible(nn.Module):
     """U-Net kompatibel dengan model yang tersimpan"""
     def __init__(self, n_channels=3, n_classes=1):  # Changed to 3 channels
@@ -172,90 +213,685 @@ class UNetCompatible(nn.Module):
         out = self.out_conv(dec1)
         return out
 
+def separable_double_conv(in_channels, out_channels):
+    """Dua blok depthwise-separable conv (depthwise 3x3 + pointwise 1x1, masing-masing BN + ReLU)"""
+    return nn.Sequential(
+        nn.Conv2d(in_channels, in_channels, 3, padding=1, groups=in_channels, bias=False),
+        nn.BatchNorm2d(in_channels),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(in_channels, out_channels, 1, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(out_channels, out_channels, 3, padding=1, groups=out_channels, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(out_channels, out_channels, 1, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.ReLU(inplace=True)
+    )
+
+class UNetLite(nn.Module):
+    """
+    U-Net ringan (student hasil distilasi) dengan topologi yang sama seperti UNetCompatible
+    (4 level + bottleneck, input kelipatan 16) tetapi channel jauh lebih kecil dan
+    konvolusi depthwise-separable. Input/preprocessing identik dengan UNetCompatible.
+    """
+    def __init__(self, n_channels=3, n_classes=1, base_channels=16):
+        super(UNetLite, self).__init__()
+        c = base_channels
+        
+        # Encoder
+        self.enc1 = separable_double_conv(n_channels, c)
+        self.enc2 = separable_double_conv(c, c * 2)
+        self.enc3 = separable_double_conv(c * 2, c * 4)
+        self.enc4 = separable_double_conv(c * 4, c * 8)
+        
+        # Bottleneck
+        self.bottleneck = separable_double_conv(c * 8, c * 16)
+        
+        # Decoder
+        self.upconv4 = nn.ConvTranspose2d(c * 16, c * 8, 2, stride=2)
+        self.upconv3 = nn.ConvTranspose2d(c * 8, c * 4, 2, stride=2)
+        self.upconv2 = nn.ConvTranspose2d(c * 4, c * 2, 2, stride=2)
+        self.upconv1 = nn.ConvTranspose2d(c * 2, c, 2, stride=2)
+        
+        self.dec4 = separable_double_conv(c * 16, c * 8)
+        self.dec3 = separable_double_conv(c * 8, c * 4)
+        self.dec2 = separable_double_conv(c * 4, c * 2)
+        self.dec1 = separable_double_conv(c * 2, c)
+        
+        self.out_conv = nn.Conv2d(c, n_classes, 1)
+        self.pool = nn.MaxPool2d(2)
+    
+    def forward(self, x):
+        enc1 = self.enc1(x)
+        enc2 = self.enc2(self.pool(enc1))
+        enc3 = self.enc3(self.pool(enc2))
+        enc4 = self.enc4(self.pool(enc3))
+        
+        bottleneck = self.bottleneck(self.pool(enc4))
+        
+        dec4 = self.dec4(torch.cat([self.upconv4(bottleneck), enc4], dim=1))
+        dec3 = self.dec3(torch.cat([self.upconv3(dec4), enc3], dim=1))
+        dec2 = self.dec2(torch.cat([self.upconv2(dec3), enc2], dim=1))
+        dec1 = self.dec1(torch.cat([self.upconv1(dec2), enc1], dim=1))
+        
+        return self.out_conv(dec1)
+
+# Arsitektur yang bisa di-load VideoProcessor. Nama dengan titik (mis. "training_model.UNet")
+# di-import saat dibutuhkan
+MODEL_ARCHITECTURES = {
+    "UNetCompatible": UNetCompatible,
+    "UNetLite": UNetLite
+}
+
+# Model bundle: checkpoint yang mendeskripsikan dirinya sendiri (bobot, arsitektur, preprocessing,
+# threshold, kalibrasi) sehingga inference tidak bergantung pada konstanta hardcoded
+BUNDLE_FORMAT = "carotid-segmentation-bundle"
+BUNDLE_VERSION = 1
+
+# Model inference yang sudah divalidasi dan di-fuse, dipakai ulang oleh semua VideoProcessor
+# dalam satu proses (inference service, queue worker, perbandingan model)
+_INFERENCE_MODEL_CACHE = {}
+
+def build_model(architecture="UNetCompatible", **model_config):
+    """Buat model segmentasi berdasarkan nama arsitektur"""
+    if architecture in MODEL_ARCHITECTURES:
+        model_class = MODEL_ARCHITECTURES[architecture]
+    elif "." in architecture:
+        module_name, class_name = architecture.rsplit(".", 1)
+        model_class = getattr(importlib.import_module(module_name), class_name, None)
+        if model_class is None:
+            raise ValueError(f"Unknown model architecture: {architecture}")
+    else:
+        raise ValueError(f"Unknown model architecture: {architecture} (expected one of {list(MODEL_ARCHITECTURES)})")
+    return model_class(**model_config)
+
+def model_input_channels(model):
+    """Jumlah channel input model (in_channels konvolusi pertama)"""
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            return module.in_channels
+    raise ValueError("Model has no Conv2d layer")
+
+def default_bundle_metadata(architecture="UNetCompatible", model_config=None, n_channels=3):
+    """
+    Metadata bundle untuk checkpoint tanpa metadata lengkap
+    
+    Konvensi UNetCompatible lama: input 512, normalisasi ImageNet (rata-rata channel
+    untuk model 1 channel), threshold 0.5 pada logit dan kalibrasi dari notebook.
+    
+    Returns:
+        dict: Metadata bundle (tanpa state_dict)
+    """
+    model_config = dict(model_config or {})
+    model_config.setdefault("n_channels", n_channels)
+    return {
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_VERSION,
+        "architecture": architecture,
+        "model_config": model_config,
+        "preprocessing": {
+            "input_size": 512,
+            "channels": model_config["n_channels"],
+            "mean": list(GRAYSCALE_MEAN if model_config["n_channels"] == 1 else IMAGENET_MEAN),
+            "std": list(GRAYSCALE_STD if model_config["n_channels"] == 1 else IMAGENET_STD),
+            "max_pixel_value": 255.0
+        },
+        "threshold": 0.5,
+        "calibration": {
+            "depth_mm": DEPTH_MM,
+            "image_height_px": IMAGE_HEIGHT_PX,
+            "mm_per_pixel": SCALE_MM_PER_PIXEL
+        }
+    }
+
+def split_bundle(checkpoint):
+    """
+    Pisahkan checkpoint menjadi (metadata, state_dict)
+    
+    Mendukung bundle lengkap, checkpoint {"architecture", "model_config", "state_dict"}
+    dan state_dict UNetCompatible polos (prefix "module." dari DataParallel/DDP dibuang).
+    """
+    if isinstance(checkpoint, dict) and "state_dict" in checkpoint and "architecture" in checkpoint:
+        model_config = checkpoint.get("model_config", {})
+        metadata = default_bundle_metadata(checkpoint["architecture"], model_config,
+                                           model_config.get("n_channels", 3))
+        for key in ("preprocessing", "calibration"):
+            metadata[key].update(checkpoint.get(key, {}))
+        for key, value in checkpoint.items():
+            if key not in ("state_dict", "model_config", "preprocessing", "calibration"):
+                metadata[key] = value
+        state_dict = checkpoint["state_dict"]
+    else:
+        state_dict = checkpoint
+        metadata = None
+    
+    state_dict = {key[len("module."):] if key.startswith("module.") else key: value
+                  for key, value in state_dict.items()}
+    if metadata is None:
+        # Plain state_dict: jumlah channel input dibaca dari konvolusi pertama
+        if "enc1.0.weight" not in state_dict:
+            raise ValueError("Checkpoint has no metadata and does not match UNetCompatible (no enc1.0.weight)")
+        metadata = default_bundle_metadata("UNetCompatible", n_channels=state_dict["enc1.0.weight"].shape[1])
+    return metadata, state_dict
+
+def validate_bundle(metadata, model):
+    """
+    Validasi metadata bundle terhadap model yang sudah di-load (sekali saat load)
+    
+    Raises:
+        ValueError: Jika metadata tidak konsisten
+    """
+    problems = []
+    if metadata.get("format_version", BUNDLE_VERSION) > BUNDLE_VERSION:
+        problems.append(f"bundle format version {metadata['format_version']} is newer than supported ({BUNDLE_VERSION})")
+    preprocessing = metadata["preprocessing"]
+    input_size = preprocessing.get("input_size")
+    if not isinstance(input_size, int) or input_size <= 0 or input_size % 16 != 0:
+        problems.append(f"input_size must be a positive multiple of 16, got {input_size}")
+    channels = preprocessing.get("channels")
+    if channels not in (1, 3):
+        problems.append(f"channels must be 1 or 3, got {channels}")
+    elif channels != model_input_channels(model):
+        problems.append(f"channels={channels} but the model expects {model_input_channels(model)} input channels")
+    mean, std = preprocessing.get("mean", []), preprocessing.get("std", [])
+    if len(mean) != channels or len(std) != channels:
+        problems.append(f"mean/std need {channels} values, got {len(mean)}/{len(std)}")
+    elif min(std) <= 0:
+        problems.append("std values must be positive")
+    if not isinstance(metadata.get("threshold"), (int, float)):
+        problems.append(f"threshold must be a number, got {metadata.get('threshold')!r}")
+    if metadata["calibration"].get("mm_per_pixel", 0) <= 0:
+        problems.append("calibration mm_per_pixel must be positive")
+    if problems:
+        raise ValueError("Invalid model bundle: " + "; ".join(problems))
+
+def load_model_bundle(model_path, map_location=None):
+    """
+    Load checkpoint model segmentasi beserta metadata bundle (tervalidasi)
+    
+    Args:
+        model_path (str): Path checkpoint .pth (bundle, checkpoint dengan metadata
+            atau state_dict UNetCompatible lama)
+        map_location: Device tujuan
+        
+    Returns:
+        tuple: (model, metadata)
+    """
+    metadata, state_dict = split_bundle(torch.load(model_path, map_location=map_location))
+    model = build_model(metadata["architecture"], **metadata["model_config"])
+    model.load_state_dict(state_dict)
+    validate_bundle(metadata, model)
+    return model, metadata
+
+def save_model_bundle(model, path, architecture, model_config=None, input_size=512, mean=None, std=None,
+                      threshold=0.5, calibration=None, **info):
+    """
+    Simpan model sebagai bundle yang bisa di-load VideoProcessor tanpa konstanta hardcoded
+    
+    Args:
+        model (nn.Module): Model (wrapper DataParallel/DDP di-unwrap)
+        path (str): Path output .pth
+        architecture (str): Nama arsitektur (MODEL_ARCHITECTURES atau "modul.Kelas")
+        model_config (dict): Argumen constructor model
+        input_size (int): Ukuran input inference
+        mean, std (sequence): Normalisasi input (default: ImageNet / rata-rata ImageNet untuk 1 channel)
+        threshold (float): Threshold mask pada output model (logit)
+        calibration (dict): Override kalibrasi (depth_mm, image_height_px, mm_per_pixel)
+        **info: Informasi tambahan, mis. epoch atau val_loss
+        
+    Returns:
+        dict: Metadata bundle yang disimpan
+    """
+    model = getattr(model, "module", model)
+    metadata = default_bundle_metadata(architecture, model_config, model_input_channels(model))
+    preprocessing = metadata["preprocessing"]
+    preprocessing["input_size"] = input_size
+    if mean is not None:
+        preprocessing["mean"] = list(mean)
+    if std is not None:
+        preprocessing["std"] = list(std)
+    metadata["threshold"] = threshold
+    metadata["calibration"].update(calibration or {})
+    metadata["created_at"] = datetime.now().isoformat(timespec="seconds")
+    metadata.update(info)
+    validate_bundle(metadata, model)
+    
+    torch.save(dict(metadata, state_dict=model.state_dict()), path)
+    return metadata
+
+def load_inference_model(model_path, map_location, fuse=True, channels_last=False):
+    """
+    Load bundle untuk inference (eval, Conv-BN fused) dengan cache per proses
+    
+    Cache key memakai mtime/ukuran file, sehingga checkpoint yang ditimpa di-load ulang.
+    
+    Returns:
+        tuple: (model, metadata, cached)
+    """
+    stat = os.stat(model_path)
+    path_key = os.path.abspath(model_path)
+    key = (path_key, stat.st_mtime_ns, stat.st_size, str(map_location), fuse, channels_last)
+    if key in _INFERENCE_MODEL_CACHE:
+        model, metadata = _INFERENCE_MODEL_CACHE[key]
+        return model, metadata, True
+    
+    for stale_key in [k for k in _INFERENCE_MODEL_CACHE if k[0] == path_key]:
+        del _INFERENCE_MODEL_CACHE[stale_key]
+    
+    model, metadata = load_model_bundle(model_path, map_location=map_location)
+    model = prepare_inference_model(model.to(map_location), fuse, channels_last)
+    _INFERENCE_MODEL_CACHE[key] = (model, metadata)
+    return model, metadata, False
+
+def prepare_inference_model(model, fuse=True, channels_last=False):
+    """Eval mode + optimasi graph (numerik ekuivalen) untuk inference"""
+    model = model.eval()
+    if fuse:
+        model, folded = fuse_conv_bn(model, channels_last=channels_last)
+        print(f"[OK] Folded {folded} Conv2d+BatchNorm2d pairs for inference")
+    elif channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    return model
+
+def parse_clock_seconds(value):
+    """
+    Parse waktu jam menjadi detik sejak tengah malam
+    
+    Format yang didukung: HH:MM:SS.mmm (timestamps.csv) dan HH-MM-SS-mmm (CSV tekanan)
+    
+    Args:
+        value: Timestamp (string)
+        
+    Returns:
+        float: Detik, atau None jika format tidak dikenali
+    """
+    text = str(value).strip()
+    if ':' in text:
+        parts = text.split(':')
+        if len(parts) != 3:
+            return None
+        hours, minutes, seconds = parts
+    else:
+        parts = text.split('-')
+        if len(parts) != 4:
+            return None
+        hours, minutes, seconds = parts[0], parts[1], f"{parts[2]}.{parts[3].zfill(3)}"
+    try:
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+class PressureInterpolator:
+    """Interpolasi linear tekanan berdasarkan waktu nyata untuk frame yang datang berurutan"""
+    
+    def __init__(self, times, values):
+        """
+        Args:
+            times (array): Waktu sampel tekanan (detik)
+            values (array): Nilai tekanan
+        """
+        order = np.argsort(times, kind='stable')
+        self.times = np.asarray(times, dtype=float)[order]
+        self.values = np.asarray(values, dtype=float)[order]
+        self.offset = 0.0
+        self.cursor = 0
+    
+    def align_to(self, frame_start, frame_end):
+        """
+        Cek overlap rentang waktu frame dengan rentang waktu tekanan. Jika tidak overlap
+        (jam perangkat berbeda), kedua rekaman disejajarkan pada awal masing-masing.
+        """
+        pressure_start, pressure_end = self.times[0], self.times[-1]
+        print(f"Pressure time range: {pressure_start:.3f} - {pressure_end:.3f} ({pressure_end - pressure_start:.3f}s)")
+        print(f"Frame time range: {frame_start:.3f} - {frame_end:.3f} ({frame_end - frame_start:.3f}s)")
+        
+        if min(pressure_end, frame_end) <= max(pressure_start, frame_start):
+            self.offset = pressure_start - frame_start
+            print(f"[WARN] No time overlap - aligning recordings at their start (offset {self.offset:.3f}s)")
+        else:
+            self.offset = 0.0
+    
+    def value_at(self, seconds):
+        """
+        Tekanan pada waktu `seconds` (detik, jam frame)
+        
+        Returns:
+            float: Tekanan hasil interpolasi, atau None di luar rentang data tekanan
+        """
+        if seconds is None:
+            return None
+        t = seconds + self.offset
+        times = self.times
+        if t < times[0] or t > times[-1]:
+            return None
+        
+        # Frames arrive in time order, so the cursor only moves forward (amortized O(1))
+        if t < times[self.cursor]:
+            self.cursor = 0
+        last = len(times) - 2
+        while self.cursor < last and times[self.cursor + 1] < t:
+            self.cursor += 1
+        
+        t0, t1 = times[self.cursor], times[self.cursor + 1]
+        v0, v1 = self.values[self.cursor], self.values[self.cursor + 1]
+        if t1 == t0:
+            return float(v0)
+        return float(v0 + (v1 - v0) * (t - t0) / (t1 - t0))
+
+class MaskWriter:
+    """Tulis mask biner secara lossless: video FFV1 (.mkv) atau PNG per frame"""
+    
+    def __init__(self, path, mode, fps, size):
+        """
+        Args:
+            path (str): Path video (.mkv) atau folder PNG
+            mode (str): "video" atau "images"
+            fps (float): Frame rate video mask
+            size (tuple): (width, height)
+        """
+        if mode not in MASK_OUTPUT_MODES:
+            raise ValueError(f"Unknown mask output mode: {mode} (choose from {MASK_OUTPUT_MODES})")
+        self.mode = mode
+        self.path = path
+        self.writer = None
+        
+        if mode == "video":
+            self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'FFV1'), fps, size, isColor=False)
+            if not self.writer.isOpened():
+                # OpenCV builds without FFmpeg cannot write FFV1
+                self.writer = None
+                self.mode = "images"
+                self.path = os.path.splitext(path)[0] + "s"
+                print(f"[WARN] FFV1 mask video not supported here - writing PNG masks to {self.path}")
+        if self.mode == "images":
+            os.makedirs(self.path, exist_ok=True)
+    
+    def write(self, frame_idx, mask):
+        if self.writer is not None:
+            self.writer.write(mask)
+        else:
+            cv2.imwrite(os.path.join(self.path, f"frame_{frame_idx:06d}.png"), mask,
+                        [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    
+    def release(self):
+        if self.writer is not None:
+            self.writer.release()
+
 class VideoProcessor:
     """Class untuk memproses video dengan model segmentasi"""
     
-    def __init__(self, model_path):
+    def __init__(self, model_path, input_size=None, fuse=True, channels_last=False, architecture="UNetCompatible",
+                 n_channels=3, coarse_size=None, refine_threshold=DEFAULT_REFINE_THRESHOLD):
         """
         Initialize VideoProcessor
         
         Args:
-            model_path (str): Path ke model yang sudah ditraining
+            model_path (str): Path ke model yang sudah ditraining. None = bobot random
+                (hanya untuk benchmark, hasil segmentasi tidak bermakna)
+            input_size (int): Override ukuran input model (kelipatan 16, default dari bundle)
+            fuse (bool): Fold Conv2d+BatchNorm2d untuk inference (lihat inference_optimizer)
+            channels_last (bool): Jalankan model dengan memory format channels_last
+            architecture (str): Arsitektur untuk bobot random (model_path=None); checkpoint
+                menentukan arsitekturnya sendiri
+            n_channels (int): Channel input untuk bobot random (1 = grayscale); checkpoint
+                menentukan jumlah channel-nya sendiri
+            coarse_size (int): Aktifkan two-tier inference: semua frame di-infer di ukuran ini,
+                hanya frame dengan confidence rendah yang diulang di input_size (optional)
+            refine_threshold (float): Confidence minimum (0-1) agar hasil coarse dipakai
         """
         self.device = device
-        self.model = UNetCompatible().to(self.device)
-          # Load model dengan error handling
-        if os.path.exists(model_path):
+        self.channels_last = channels_last
+        self.architecture = architecture
+        self.coarse_size = coarse_size
+        self.refine_threshold = refine_threshold
+        
+        # Load model dengan error handling (bundle divalidasi sekali, model fused di-cache)
+        if model_path is None:
+            self.metadata = default_bundle_metadata(architecture, n_channels=n_channels)
+            model = build_model(architecture, **self.metadata["model_config"]).to(self.device)
+            self.model = prepare_inference_model(model, fuse, channels_last)
+            print("[WARN] No model checkpoint given - using randomly initialized weights (benchmark only)")
+        elif os.path.exists(model_path):
             try:
                 print(f"Loading model from {model_path}...")
                 print(f"Using device: {self.device}")
-                self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-                self.model.eval()
-                print(f"[SUCCESS] Model loaded successfully from {model_path}")
+                self.model, self.metadata, cached = load_inference_model(
+                    model_path, self.device, fuse=fuse, channels_last=channels_last)
+                self.architecture = self.metadata["architecture"]
+                source = "reused from cache" if cached else "loaded successfully"
+                print(f"[SUCCESS] Model {source} from {model_path} ({self.architecture})")
             except Exception as e:
                 print(f"[ERROR] Error loading model: {str(e)}")
                 raise RuntimeError(f"Failed to load model: {str(e)}")
         else:
-            raise FileNotFoundError(f"Model file not found: {model_path}")        # Preprocessing transform (sesuai dengan training)
-        self.transform = A.Compose([
-            A.Resize(512, 512),
-            A.Normalize(mean=[0.485, 0.456, 0.406],
-                       std=[0.229, 0.224, 0.225]),
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        
+        # Preprocessing, threshold dan kalibrasi dari bundle
+        preprocessing = self.metadata["preprocessing"]
+        self.input_size = input_size or preprocessing["input_size"]
+        if self.input_size % 16 != 0:
+            raise ValueError(f"input_size must be a multiple of 16, got {self.input_size}")
+        if coarse_size is not None and (coarse_size % 16 != 0 or coarse_size >= self.input_size):
+            raise ValueError(f"coarse_size must be a multiple of 16 below input_size ({self.input_size}), got {coarse_size}")
+        self.mean = tuple(preprocessing["mean"])
+        self.std = tuple(preprocessing["std"])
+        self.max_pixel_value = preprocessing.get("max_pixel_value", 255.0)
+        self.threshold = self.metadata["threshold"]
+        self.scale_mm_per_pixel = self.metadata["calibration"]["mm_per_pixel"]
+        
+        # Model 1 channel: frame diproses sebagai grayscale dari awal (resize/normalize/tensor 1/3 data)
+        self.in_channels = preprocessing["channels"]
+        self.grayscale = self.in_channels == 1
+        if self.grayscale:
+            print("[INFO] Single-channel model - frames are preprocessed as grayscale")
+        
+        # Preprocessing transform (sesuai dengan training)
+        self.transform = self.build_transform(self.input_size)
+        self.coarse_transform = None
+        if coarse_size is not None:
+            self.coarse_transform = self.build_transform(coarse_size)
+            print(f"[INFO] Two-tier inference: {coarse_size}x{coarse_size}, refine at {self.input_size}x{self.input_size} "
+                  f"below confidence {refine_threshold:.2f}")
+    
+    def build_transform(self, size):
+        """Transform resize + normalize + tensor untuk ukuran input tertentu"""
+        return A.Compose([
+            A.Resize(size, size),
+            A.Normalize(mean=self.mean, std=self.std, max_pixel_value=self.max_pixel_value),
             ToTensorV2()
         ])
-    def preprocess_frame(self, frame):
+    def preprocess_frame(self, frame, transform=None):
         """
         Preprocess frame untuk inference (sesuai dengan training)
         
         Args:
             frame: Frame dari video (numpy array)
+            transform: Transform lain, mis. coarse_transform (default: self.transform)
             
         Returns:
             tensor: Preprocessed frame sebagai tensor
         """
+        if self.grayscale:
+            # Single-channel model: BGR -> GRAY (frame grayscale dipakai langsung)
+            if len(frame.shape) == 3 and frame.shape[2] == 3:
+                frame_input = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            elif len(frame.shape) == 3:
+                frame_input = frame[:, :, 0]
+            else:
+                frame_input = frame
         # Convert BGR to RGB (OpenCV uses BGR)
-        if len(frame.shape) == 3 and frame.shape[2] == 3:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        elif len(frame.shape) == 3 and frame.shape[2] == 3:
+            frame_input = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         elif len(frame.shape) == 2:
             # Convert grayscale to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
+            frame_input = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
         else:
-            frame_rgb = frame
-          # Apply transform (resize + normalize)
-        transformed = self.transform(image=frame_rgb)
+            frame_input = frame
+        
+        # Apply transform (resize + normalize)
+        transformed = (transform or self.transform)(image=frame_input)
         tensor_frame = transformed['image'].unsqueeze(0).to(self.device)
+        if self.channels_last:
+            tensor_frame = tensor_frame.contiguous(memory_format=torch.channels_last)
         
         return tensor_frame
     
-    def predict_mask(self, frame):
+    def predict_mask(self, frame, timer=None):
         """
         Prediksi mask dari frame (sesuai dengan implementasi notebook)
         Optimized version with torch.no_grad() and CPU processing
         
         Args:
             frame: Input frame (BGR format dari OpenCV)
+            timer (StageTimer): Jika diberikan, catat tahap preprocess/forward/postprocess (optional)
             
         Returns:
             numpy array: Predicted mask (binary, 0 atau 255)
         """
+        if self.coarse_size is not None:
+            return self.predict_mask_two_tier(frame, timer)[0]
+        
         original_size = (frame.shape[1], frame.shape[0])  # (width, height)
         
         with torch.no_grad():  # Disable gradient computation for faster inference
             # Preprocess frame
             tensor_frame = self.preprocess_frame(frame)
+            if timer:
+                timer.mark("preprocess")
             
-            # Model inference
+            # Model inference (.cpu() included so CUDA time is not hidden in postprocess)
             prediction = self.model(tensor_frame)
             prediction = prediction.squeeze().cpu().numpy()
+            if timer:
+                timer.mark("forward")
             
-            # Convert to binary mask
-            binary_mask = (prediction > 0.5).astype(np.uint8) * 255
-            
-            # Resize back to original frame size
-            mask_resized = cv2.resize(binary_mask, original_size)
+            mask_resized = self.mask_from_logits(prediction, original_size)
+            if timer:
+                timer.mark("postprocess")
             
             return mask_resized
     
+    def predict_mask_two_tier(self, frame, timer=None, force_refine=False):
+        """
+        Prediksi mask di resolusi coarse; ulangi di resolusi penuh jika confidence rendah
+        
+        Args:
+            frame: Input frame (BGR format dari OpenCV)
+            timer (StageTimer): Catat preprocess/forward/confidence/postprocess (coarse)
+                dan refine_preprocess/refine_forward/refine_postprocess (resolusi penuh) (optional)
+            force_refine (bool): Selalu refine (dipakai untuk kalibrasi biaya resolusi penuh)
+            
+        Returns:
+            tuple: (mask, tier, confidence) dengan tier TIER_COARSE atau TIER_REFINED
+        """
+        original_size = (frame.shape[1], frame.shape[0])  # (width, height)
+        
+        with torch.no_grad():
+            tensor_frame = self.preprocess_frame(frame, self.coarse_transform)
+            if timer:
+                timer.mark("preprocess")
+            
+            prediction = self.model(tensor_frame).squeeze().cpu().numpy()
+            if timer:
+                timer.mark("forward")
+            
+            confidence = self.boundary_confidence(prediction)
+            if timer:
+                timer.mark("confidence")
+            
+            if confidence >= self.refine_threshold and not force_refine:
+                mask_resized = self.mask_from_logits(prediction, original_size)
+                if timer:
+                    timer.mark("postprocess")
+                return mask_resized, TIER_COARSE, confidence
+            
+            # Ambiguous frame: full-resolution pass replaces the coarse result
+            tensor_frame = self.preprocess_frame(frame)
+            if timer:
+                timer.mark("refine_preprocess")
+            prediction = self.model(tensor_frame).squeeze().cpu().numpy()
+            if timer:
+                timer.mark("refine_forward")
+            mask_resized = self.mask_from_logits(prediction, original_size)
+            if timer:
+                timer.mark("refine_postprocess")
+            return mask_resized, TIER_REFINED, confidence
+    
+    def boundary_confidence(self, prediction):
+        """
+        Confidence segmentasi dari margin logit di sekitar boundary mask
+        
+        Boundary yang tegas (logit melompat jauh dari threshold dalam 1-2 pixel) memberi
+        confidence tinggi; boundary landai/ambigu memberi confidence rendah.
+        
+        Args:
+            prediction: Output model untuk satu frame (H x W), belum di-resize
+            
+        Returns:
+            float: Rata-rata min(|logit - threshold| / BOUNDARY_MARGIN_LOGITS, 1) di pita boundary
+                (0.0 jika tidak ada vessel terdeteksi)
+        """
+        binary_mask = (prediction > self.threshold).astype(np.uint8)
+        if not binary_mask.any():
+            return 0.0
+        band = cv2.morphologyEx(binary_mask, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8)) > 0
+        margin = np.abs(prediction[band] - self.threshold) / BOUNDARY_MARGIN_LOGITS
+        return float(np.minimum(margin, 1.0).mean())
+    
+    def summarize_two_tier(self, timer, tier_counts):
+        """
+        Ringkasan two-tier inference dan estimasi waktu yang dihemat
+        
+        Biaya satu frame resolusi penuh (preprocess + forward + postprocess) diestimasi dari
+        rata-rata tahap refine_*; waktu yang dihemat = frames * biaya penuh - total waktu semua
+        tahap inference two-tier (coarse, confidence dan refine).
+        
+        Args:
+            timer (StageTimer): Timer run yang sudah selesai
+            tier_counts (dict): {tier: jumlah frame}
+            
+        Returns:
+            dict: Jumlah frame per tier, waktu inference dan time_saved_ms/time_saved_pct
+        """
+        stages = timer.summary()
+        frames = sum(tier_counts.values())
+        inference_ms = sum(stages[stage]["total_ms"] for stage in TWO_TIER_INFERENCE_STAGES if stage in stages)
+        summary = {
+            "coarse_size": self.coarse_size,
+            "full_size": self.input_size,
+            "refine_threshold": self.refine_threshold,
+            "frames_coarse": tier_counts.get(TIER_COARSE, 0),
+            "frames_refined": tier_counts.get(TIER_REFINED, 0),
+            "inference_ms": round(inference_ms, 3)
+        }
+        if all(stage in stages for stage in FULL_RESOLUTION_STAGES) and frames:
+            full_ms_per_frame = sum(stages[stage]["mean_ms"] for stage in FULL_RESOLUTION_STAGES)
+            single_tier_ms = full_ms_per_frame * frames
+            summary["full_ms_per_frame"] = round(full_ms_per_frame, 3)
+            summary["estimated_single_tier_ms"] = round(single_tier_ms, 3)
+            summary["time_saved_ms"] = round(single_tier_ms - inference_ms, 3)
+            summary["time_saved_pct"] = round((single_tier_ms - inference_ms) / single_tier_ms * 100, 2)
+        return summary
+    
+    def mask_from_logits(self, prediction, original_size):
+        """
+        Ubah output model (2D numpy) menjadi mask biner seukuran frame asli
+        
+        Args:
+            prediction: Output model untuk satu frame (H x W)
+            original_size (tuple): (width, height) frame asli
+            
+        Returns:
+            numpy array: Mask biner (0 atau 255)
+        """
+        # Convert to binary mask
+        binary_mask = (prediction > self.threshold).astype(np.uint8) * 255
+        
+        # Resize back to original frame size
+        return cv2.resize(binary_mask, original_size)
+    
     def calculate_diameter(self, mask, pixel_to_mm_ratio=0.1):
         """
         Hitung diameter dari mask
@@ -331,7 +967,11 @@ class VideoProcessor:
         
         return overlay
     
-    def process_video_with_diameter(self, video_path, output_path, plot_path, csv_path):
+    def process_video_with_diameter(self, video_path, output_path, plot_path, csv_path,
+                                    progress_callback=None, event_log_path=None, event_stream=None,
+                                    report_path=None, pressure_csv_path=None, timestamps_csv_path=None,
+                                    overlay=True, overlay_scale=1.0, overlay_frame_step=1,
+                                    mask_output=None, mask_path=None):
         """
         Proses video dengan overlay segmentasi dan hitung diameter (sesuai notebook)
         Includes timestamp integration if available
@@ -341,11 +981,28 @@ class VideoProcessor:
             output_path (str): Path untuk video output
             plot_path (str): Path untuk plot diameter
             csv_path (str): Path untuk file CSV
+            progress_callback (callable): Dipanggil dengan event progress (dict) per frame (optional)
+            event_log_path (str): Path log event JSON lines (default: *_events.jsonl di sebelah CSV)
+            event_stream: File-like untuk menulis event JSON lines, mis. stdout sebagai pipe (optional)
+            report_path (str): Path JSON run report latency per tahap (default: *_report.json di sebelah CSV)
+            pressure_csv_path (str): CSV data tekanan; jika ada, tekanan diinterpolasi per frame
+                berdasarkan timestamp nyata dan ditulis sebagai kolom 'pressure' di CSV yang sama (optional)
+            timestamps_csv_path (str): CSV timestamp frame (default: data_uji/<subjek>/timestamps.csv)
+            overlay (bool): Tulis video overlay ke output_path
+            overlay_scale (float): Skala resolusi video overlay (mis. 0.5 = setengah lebar/tinggi)
+            overlay_frame_step (int): Tulis 1 dari setiap N frame ke video overlay (fps ikut turun)
+            mask_output (str): None, "video" (lossless FFV1 .mkv) atau "images" (PNG per frame)
+            mask_path (str): Path video mask / folder PNG (default: di sebelah output_path)
+        
+        Dengan two-tier inference CSV mendapat kolom Tier dan Confidence; ringkasan run
+        (frame per tier, estimasi waktu yang dihemat) disimpan di *_two_tier.json di sebelah CSV.
+        
+        Returns:
+            dict: Path output yang benar-benar ditulis run ini (video, mask, csv, plot, report,
+                two_tier, plot_with_pressure, correlation_plot)
         """
-        # Parameter Kalibrasi sesuai notebook
-        depth_mm = 50               # Depth pengambilan citra (dalam mm)
-        image_height_px = 1048      # Resolusi vertikal citra (dalam pixel)
-        scale_mm_per_pixel = depth_mm / image_height_px  # Konversi pixel ke mm
+        # Kalibrasi dari model bundle (default: parameter notebook)
+        scale_mm_per_pixel = self.scale_mm_per_pixel
         
         # Open video
         cap = cv2.VideoCapture(video_path)
@@ -361,40 +1018,60 @@ class VideoProcessor:
         print(f"Video properties: {width}x{height}, {fps} FPS, {total_frames} frames")
         print(f"Scale: {scale_mm_per_pixel:.6f} mm/pixel")
         
-        # Try to load timestamp data for integration
-        timestamp_data = None
-        try:
-            # Extract subject name from video path
-            video_dir = os.path.dirname(video_path)
-            subject_name = os.path.basename(video_dir)
+        # Load frame timestamps (Frame Number -> HH:MM:SS.mmm) if available
+        if timestamps_csv_path is None:
+            subject_name = os.path.basename(os.path.dirname(video_path))
             timestamps_csv_path = os.path.join("data_uji", subject_name, "timestamps.csv")
-            
-            if os.path.exists(timestamps_csv_path):
-                timestamp_data = pd.read_csv(timestamps_csv_path)
-                print(f"[OK] Found timestamp data: {len(timestamp_data)} entries")
-                print(f"Timestamp columns: {list(timestamp_data.columns)}")
-                
-                # Ensure consistent column names
-                if 'Frame Number' in timestamp_data.columns:
-                    timestamp_data['Frame'] = timestamp_data['Frame Number']
-                elif 'frame' in timestamp_data.columns:
-                    timestamp_data['Frame'] = timestamp_data['frame']
-                elif 'Frame' not in timestamp_data.columns:
-                    # If no Frame column, create one based on index
-                    timestamp_data['Frame'] = timestamp_data.index
-                    
-            else:
-                print(f"[WARN] No timestamp data found at: {timestamps_csv_path}")
-        except Exception as e:
-            print(f"[WARN] Warning: Could not load timestamp data: {e}")
-            timestamp_data = None
+        timestamp_map = self.load_frame_timestamps(timestamps_csv_path)
+        
+        # Pressure is aligned by real timestamp while frames are produced
+        pressure_interpolator = None
+        if pressure_csv_path:
+            frame_seconds = {frame: parse_clock_seconds(ts) for frame, ts in timestamp_map.items()}
+            pressure_interpolator = self.load_pressure_interpolator(pressure_csv_path, frame_seconds)
         
-        # Setup video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-          # Lists to store data
+        # Setup video writer (overlay can be reduced in resolution and frame rate)
+        out = None
+        overlay_frame_step = max(1, int(overlay_frame_step))
+        if overlay:
+            overlay_size = (width, height)
+            if overlay_scale != 1.0:
+                # Even dimensions keep the mp4v encoder happy
+                overlay_size = (max(2, int(width * overlay_scale) // 2 * 2),
+                                max(2, int(height * overlay_scale) // 2 * 2))
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps / overlay_frame_step, overlay_size)
+            if overlay_size != (width, height) or overlay_frame_step > 1:
+                print(f"Overlay video: {overlay_size[0]}x{overlay_size[1]} @ {fps / overlay_frame_step:g} FPS")
+        
+        # Lossless mask-only output for viewers that composite overlays themselves
+        mask_writer = None
+        if mask_output:
+            if mask_path is None:
+                suffix = "_mask.mkv" if mask_output == "video" else "_masks"
+                mask_path = os.path.splitext(output_path)[0] + suffix
+            mask_writer = MaskWriter(mask_path, mask_output, fps, (width, height))
+        
+        # Structured progress events (callback, JSON-lines log and optional pipe)
+        if event_log_path is None:
+            event_log_path = os.path.splitext(csv_path)[0] + "_events.jsonl"
+        events = InferenceEventEmitter(progress_callback, event_log_path, event_stream)
+        events.emit("start", video=video_path, total_frames=total_frames, video_fps=fps,
+                    width=width, height=height)
+        meter = ThroughputMeter(total_frames)
+        timer = StageTimer()
+        if report_path is None:
+            report_path = os.path.splitext(csv_path)[0] + "_report.json"
+        two_tier_path = os.path.splitext(csv_path)[0] + "_two_tier.json" if self.coarse_size is not None else None
+        
+        # Lists to store data
         frame_diameters_mm = []
         frame_numbers = []
+        frame_pressures = []
+        frame_tiers = []
+        frame_confidences = []
+        two_tier = self.coarse_size is not None
+        tier_counts = {}
         
         frame_idx = 0
         
@@ -402,103 +1079,168 @@ class VideoProcessor:
         print(f"Total frames to process: {total_frames}")
         
         while True:
+            timer.start()
             ret, frame = cap.read()
             if not ret:
                 break
+            timer.mark("decode")
             
-            # Predict mask
-            mask = self.predict_mask(frame)
+            # Predict mask (preprocess, forward, postprocess)
+            tier = confidence = None
+            if two_tier:
+                # First frame always refined: calibrates the full-resolution cost for the time-saved estimate
+                mask, tier, confidence = self.predict_mask_two_tier(frame, timer, force_refine=frame_idx == 0)
+                tier_counts[tier] = tier_counts.get(tier, 0) + 1
+            else:
+                mask = self.predict_mask(frame, timer)
             
             # Calculate diameter menggunakan scale yang benar
             diameter_mm = self.calculate_diameter(mask, scale_mm_per_pixel)
+            timer.mark("diameter")
             
-            # Draw overlay
-            overlay = self.draw_overlay(frame, mask, diameter_mm)
+            # Draw overlay (only for frames that go into the overlay video)
+            write_overlay = out is not None and frame_idx % overlay_frame_step == 0
+            if write_overlay:
+                if overlay_size != (width, height):
+                    overlay_frame = self.draw_overlay(
+                        cv2.resize(frame, overlay_size, interpolation=cv2.INTER_AREA),
+                        cv2.resize(mask, overlay_size, interpolation=cv2.INTER_NEAREST),
+                        diameter_mm)
+                else:
+                    overlay_frame = self.draw_overlay(frame, mask, diameter_mm)
+            timer.mark("overlay")
+            
+            pressure = None
+            if pressure_interpolator is not None:
+                pressure = pressure_interpolator.value_at(frame_seconds.get(frame_idx))
             
             # Store data
             if diameter_mm > 0:  # Only store valid measurements
                 frame_diameters_mm.append(diameter_mm)
                 frame_numbers.append(frame_idx)
+                frame_pressures.append(pressure)
+                frame_tiers.append(tier)
+                frame_confidences.append(confidence)
             
             # Write frame
-            out.write(overlay)
-              # Enhanced progress display with percentage
-            if frame_idx % 25 == 0 or frame_idx == total_frames - 1:  # More frequent updates
-                progress_pct = (frame_idx + 1) / total_frames * 100
-                remaining_frames = total_frames - (frame_idx + 1)
-                
-                # Create simple progress bar
-                bar_length = 30
-                filled_length = int(bar_length * (frame_idx + 1) // total_frames)
-                bar = '█' * filled_length + '░' * (bar_length - filled_length)
-                
-                print(f"[PROGRESS] {bar} {progress_pct:.1f}% ({frame_idx + 1}/{total_frames}) - Diameter: {diameter_mm:.2f}mm")
+            if write_overlay:
+                out.write(overlay_frame)
+            timer.mark("encode")
+            
+            if mask_writer is not None:
+                mask_writer.write(frame_idx, mask)
+                timer.mark("mask")
+            
+            processing_fps, eta_seconds = meter.update()
+            event = events.emit(
+                "frame",
+                frame=frame_idx,
+                total_frames=total_frames,
+                fps=round(processing_fps, 3),
+                eta_seconds=round(eta_seconds, 1) if eta_seconds is not None else None,
+                diameter_mm=round(diameter_mm, 4),
+                pressure=round(pressure, 4) if pressure is not None else None,
+                tier=tier,
+                latency_ms=timer.last_ms()
+            )
+            
+            # Human-readable progress line for the console
+            if frame_idx % 25 == 0 or frame_idx == total_frames - 1:
+                print(format_progress(event))
             
             frame_idx += 1
-          # Release resources
+        
+        # Release resources
+        written = {}
         cap.release()
-        out.release()
-        print(f"Video saved to: {output_path}")        # Save CSV data with timestamp integration
+        if out is not None:
+            out.release()
+            written["video"] = output_path
+        if mask_writer is not None:
+            mask_writer.release()
+            # MaskWriter falls back to PNG images when FFV1 is unavailable
+            written["mask"] = mask_writer.path
+            print(f"Mask output saved to: {mask_writer.path}")
+        elapsed_seconds = meter.elapsed
+        run_fps = round(frame_idx / elapsed_seconds, 3) if elapsed_seconds > 0 else 0.0
+        two_tier_summary = self.summarize_two_tier(timer, tier_counts) if two_tier and frame_idx > 0 else None
+        
+        # Latency report per stage (p50/p95/p99/total)
+        if frame_idx > 0:
+            write_run_report(report_path, timer,
+                             video=video_path, device=str(self.device),
+                             resolution=[width, height], video_fps=fps,
+                             frames=frame_idx, valid_frames=len(frame_diameters_mm),
+                             elapsed_seconds=round(elapsed_seconds, 3), fps=run_fps,
+                             two_tier=two_tier_summary)
+            print("\nStage latency:")
+            print(timer.format_table())
+            print(f"Run report saved to: {report_path}")
+            written["report"] = report_path
+        
+        if two_tier_summary is not None:
+            print(f"[INFO] Two-tier: {two_tier_summary['frames_coarse']} frames at {self.coarse_size}px, "
+                  f"{two_tier_summary['frames_refined']} refined at {self.input_size}px")
+            if "time_saved_ms" in two_tier_summary:
+                print(f"[INFO] Estimated time saved vs full resolution: "
+                      f"{two_tier_summary['time_saved_ms'] / 1000:.2f}s ({two_tier_summary['time_saved_pct']:.1f}%)")
+            # Run-level two-tier summary next to the per-frame CSV (Tier/Confidence columns)
+            with open(two_tier_path, "w", encoding="utf-8") as f:
+                json.dump(dict(two_tier_summary, csv=os.path.basename(csv_path)), f, indent=2)
+            print(f"Two-tier summary saved to: {two_tier_path}")
+            written["two_tier"] = two_tier_path
+        
+        events.emit("end", frames=frame_idx, valid_frames=len(frame_diameters_mm),
+                    elapsed_seconds=round(elapsed_seconds, 3), fps=run_fps,
+                    stages=timer.summary() if frame_idx > 0 else {},
+                    two_tier=two_tier_summary,
+                    outputs={"video": output_path if out is not None else None, "csv": csv_path,
+                             "plot": plot_path, "report": report_path,
+                             "mask": mask_writer.path if mask_writer is not None else None,
+                             "two_tier": two_tier_path if two_tier_summary is not None else None})
+        events.close()
+        print(f"Event log saved to: {event_log_path}")
+        if out is not None:
+            print(f"Video saved to: {output_path}")
+        
+        # Save CSV data with timestamp integration
         if frame_diameters_mm:
             # Prepare data for CSV
             csv_data = []
             
-            # Create timestamp mapping if available
-            timestamp_map = {}
-            if timestamp_data is not None:
-                print(f"Creating timestamp mapping from {len(timestamp_data)} timestamp entries...")
-                
-                # Try different column combinations
-                frame_col = None
-                timestamp_col = None
-                
-                # Find frame column
-                if 'Frame' in timestamp_data.columns:
-                    frame_col = 'Frame'
-                elif 'Frame Number' in timestamp_data.columns:
-                    frame_col = 'Frame Number'
-                elif 'frame' in timestamp_data.columns:
-                    frame_col = 'frame'
-                
-                # Find timestamp column
-                if 'Timestamp' in timestamp_data.columns:
-                    timestamp_col = 'Timestamp'
-                elif 'timestamp' in timestamp_data.columns:
-                    timestamp_col = 'timestamp'
-                elif 'Time' in timestamp_data.columns:
-                    timestamp_col = 'Time'
-                
-                if frame_col and timestamp_col:
-                    for _, row in timestamp_data.iterrows():
-                        try:
-                            frame_num = int(row[frame_col])
-                            timestamp = row[timestamp_col]
-                            timestamp_map[frame_num] = timestamp
-                        except (ValueError, TypeError) as e:
-                            print(f"Warning: Could not parse row {row.name}: {e}")
-                    print(f"Created timestamp mapping for {len(timestamp_map)} frames")
-                else:
-                    print(f"Warning: Could not find appropriate columns. Available: {list(timestamp_data.columns)}")
-                    print(f"Frame column: {frame_col}, Timestamp column: {timestamp_col}")
-            
-            # Write CSV with enhanced data
+            # Write CSV with enhanced data (single combined output)
             with open(csv_path, mode='w', newline='', encoding='utf-8') as file:
                 writer = csv.writer(file)
-                  # Header - include timestamp if available
+                  # Header - include timestamp and pressure if available
+                header = ["Frame", "Diameter (mm)"]
+                if timestamp_map:
+                    header.append("Timestamp")
+                if pressure_interpolator is not None:
+                    header.append("pressure")
+                if two_tier:
+                    header += ["Tier", "Confidence"]
+                writer.writerow(header)
                 if timestamp_map:
-                    writer.writerow(["Frame", "Diameter (mm)", "Timestamp"])
-                    print("[OK] Creating CSV with Frame, Diameter, and Timestamp columns")
+                    print(f"[OK] Creating CSV with columns: {', '.join(header)}")
                 else:
-                    writer.writerow(["Frame", "Diameter (mm)"])
-                    print("[WARN] Creating CSV with Frame and Diameter columns only (no timestamps)")
+                    print("[WARN] Creating CSV without timestamps")
                   # Data rows
-                for frame, diameter_mm in zip(frame_numbers, frame_diameters_mm):
-                    if timestamp_map and frame in timestamp_map:
-                        writer.writerow([frame, f"{diameter_mm:.4f}", timestamp_map[frame]])
-                    else:
-                        writer.writerow([frame, f"{diameter_mm:.4f}"])
+                for frame, diameter_mm, pressure, tier, confidence in zip(
+                        frame_numbers, frame_diameters_mm, frame_pressures, frame_tiers, frame_confidences):
+                    row = [frame, f"{diameter_mm:.4f}"]
+                    if timestamp_map:
+                        row.append(timestamp_map.get(frame, ""))
+                    if pressure_interpolator is not None:
+                        row.append(f"{pressure:.4f}" if pressure is not None else "")
+                    if two_tier:
+                        row += [tier, f"{confidence:.4f}"]
+                    writer.writerow(row)
             
             print(f"[OK] Diameter data saved to: {csv_path}")
+            written["csv"] = csv_path
+            if pressure_interpolator is not None:
+                matched_pressure = sum(1 for pressure in frame_pressures if pressure is not None)
+                print(f"[INFO] Pressure integration: {matched_pressure}/{len(frame_pressures)} frames have pressure")
             if timestamp_map:
                 matched_timestamps = sum(1 for frame in frame_numbers if frame in timestamp_map)
                 print(f"[INFO] Timestamp integration: {matched_timestamps}/{len(frame_numbers)} frames have timestamps")
@@ -528,7 +1270,9 @@ class VideoProcessor:
             
             plt.savefig(plot_path, dpi=300, bbox_inches='tight')
             plt.show()
+            plt.close()
             print(f"Plot saved to: {plot_path}")
+            written["plot"] = plot_path
             
             # Print summary
             print(f"\nProcessing Summary:")
@@ -537,8 +1281,21 @@ class VideoProcessor:
             print(f"Average diameter: {avg_diameter:.2f} mm")
             print(f"Diameter range: {min_diameter:.2f} - {max_diameter:.2f} mm")
             
+            # Pressure plots straight from the in-memory series (no CSV re-read)
+            if pressure_interpolator is not None:
+                combined_df = pd.DataFrame({
+                    "Frame": frame_numbers,
+                    "Diameter (mm)": frame_diameters_mm,
+                    "pressure": [np.nan if pressure is None else pressure for pressure in frame_pressures]
+                }).dropna(subset=["pressure"])
+                if len(combined_df) > 1:
+                    written.update(self.create_diameter_pressure_plot(combined_df, plot_path))
+                else:
+                    print("[WARN] Not enough frames with pressure for pressure plots")
+            
         else:
             print("No valid diameter measurements detected.")
+        return written
     
     def process_single_frame(self, frame_path, output_path):
         """
@@ -567,158 +1324,117 @@ class VideoProcessor:
         print(f"Processed frame saved to: {output_path}")
         print(f"Detected diameter: {diameter_mm:.2f} mm")
 
-    def load_and_sync_pressure_data(self, pressure_csv_path, timestamps_csv_path):
+    def load_frame_timestamps(self, timestamps_csv_path):
         """
-        Load dan sinkronisasi data tekanan dengan timestamp
+        Load timestamp per frame dari timestamps.csv
         
         Args:
-            pressure_csv_path (str): Path ke file CSV data tekanan
-            timestamps_csv_path (str): Path ke file CSV timestamp
+            timestamps_csv_path (str): Path ke file CSV timestamp ('Frame Number', 'Timestamp')
             
         Returns:
-            tuple: (pressure_data, timestamps_data) atau (None, None) jika error
+            dict: {frame: timestamp string}, kosong jika tidak tersedia
         """
+        timestamp_map = {}
+        if not os.path.exists(timestamps_csv_path):
+            print(f"[WARN] No timestamp data found at: {timestamps_csv_path}")
+            return timestamp_map
+        
         try:
-            # Load pressure data
-            if os.path.exists(pressure_csv_path):
-                pressure_df = pd.read_csv(pressure_csv_path)
-                print(f"Loaded pressure data: {len(pressure_df)} entries")
-                print(f"Pressure columns: {pressure_df.columns.tolist()}")
-                
-                # Rename columns for consistency
-                if 'Sensor Value' in pressure_df.columns:
-                    pressure_df = pressure_df.rename(columns={'Sensor Value': 'pressure'})
-                if 'Timestamp (s)' in pressure_df.columns:
-                    pressure_df = pressure_df.rename(columns={'Timestamp (s)': 'timestamp'})
-                    
-            else:
+            timestamp_data = pd.read_csv(timestamps_csv_path)
+            print(f"[OK] Found timestamp data: {len(timestamp_data)} entries")
+            print(f"Timestamp columns: {list(timestamp_data.columns)}")
+            
+            # Find frame column (fallback: row index)
+            frame_col = next((col for col in ('Frame Number', 'Frame', 'frame') if col in timestamp_data.columns), None)
+            # Find timestamp column
+            timestamp_col = next((col for col in ('Timestamp', 'timestamp', 'Time') if col in timestamp_data.columns), None)
+            
+            if timestamp_col is None:
+                print(f"Warning: Could not find timestamp column. Available: {list(timestamp_data.columns)}")
+                return timestamp_map
+            
+            frames = timestamp_data[frame_col] if frame_col else timestamp_data.index
+            for frame_num, timestamp in zip(frames, timestamp_data[timestamp_col]):
+                try:
+                    timestamp_map[int(frame_num)] = timestamp
+                except (ValueError, TypeError) as e:
+                    print(f"Warning: Could not parse frame {frame_num}: {e}")
+            print(f"Created timestamp mapping for {len(timestamp_map)} frames")
+        except Exception as e:
+            print(f"[WARN] Warning: Could not load timestamp data: {e}")
+        
+        return timestamp_map
+    
+    def load_pressure_interpolator(self, pressure_csv_path, frame_seconds):
+        """
+        Load data tekanan dan siapkan interpolasi berdasarkan timestamp nyata
+        
+        Args:
+            pressure_csv_path (str): Path ke file CSV tekanan (kolom 1: HH-MM-SS-mmm, kolom 2: nilai sensor)
+            frame_seconds (dict): {frame: detik sejak tengah malam} dari timestamps.csv
+            
+        Returns:
+            PressureInterpolator atau None jika data tidak bisa dipakai
+        """
+        try:
+            if not os.path.exists(pressure_csv_path):
                 print(f"Pressure data not found: {pressure_csv_path}")
-                return None, None
+                return None
             
-            # Load timestamps
-            if os.path.exists(timestamps_csv_path):
-                timestamps_df = pd.read_csv(timestamps_csv_path)
-                print(f"Loaded timestamps: {len(timestamps_df)} entries")
-                print(f"Timestamp columns: {timestamps_df.columns.tolist()}")
-                
-                # Rename columns for consistency
-                if 'Frame Number' in timestamps_df.columns:
-                    timestamps_df = timestamps_df.rename(columns={'Frame Number': 'frame'})
-                if 'Timestamp' in timestamps_df.columns:
-                    timestamps_df = timestamps_df.rename(columns={'Timestamp': 'timestamp'})
-                    
-            else:
-                print(f"Timestamps not found: {timestamps_csv_path}")
-                return pressure_df, None
+            pressure_df = pd.read_csv(pressure_csv_path)
+            print(f"Loaded pressure data: {len(pressure_df)} entries")
+            print(f"Pressure columns: {pressure_df.columns.tolist()}")
+            
+            pressure_times = pressure_df.iloc[:, 0].map(parse_clock_seconds)
+            pressure_values = pd.to_numeric(pressure_df.iloc[:, 1], errors='coerce')
+            valid = pressure_times.notna() & pressure_values.notna()
+            if valid.sum() < 2:
+                print("[WARN] Insufficient pressure samples with valid timestamps for interpolation")
+                return None
             
-            return pressure_df, timestamps_df
+            valid_frame_seconds = [t for t in frame_seconds.values() if t is not None]
+            if not valid_frame_seconds:
+                print("[WARN] No parseable frame timestamps - pressure cannot be aligned")
+                return None
+            
+            interpolator = PressureInterpolator(pressure_times[valid].to_numpy(dtype=float),
+                                                pressure_values[valid].to_numpy(dtype=float))
+            interpolator.align_to(min(valid_frame_seconds), max(valid_frame_seconds))
+            return interpolator
             
         except Exception as e:
-            print(f"Error loading pressure/timestamp data: {str(e)}")
-            return None, None
+            print(f"Error loading pressure data: {str(e)}")
+            return None
 
     def process_video_with_pressure_integration(self, video_path, output_path, plot_path, csv_path, 
-                                              pressure_csv_path=None, timestamps_csv_path=None):
+                                              pressure_csv_path=None, timestamps_csv_path=None,
+                                              **event_options):
         """
-        Proses video dengan integrasi data tekanan
+        Proses video dengan integrasi data tekanan dalam satu pass: tekanan diinterpolasi
+        per frame berdasarkan timestamp saat frame diproses, lalu ditulis ke satu CSV gabungan
         
         Args:
             video_path (str): Path ke video input
             output_path (str): Path untuk video output
             plot_path (str): Path untuk plot diameter
-            csv_path (str): Path untuk file CSV
+            csv_path (str): Path untuk file CSV (Frame, Diameter, Timestamp, pressure)
             pressure_csv_path (str): Path ke file CSV data tekanan
             timestamps_csv_path (str): Path ke file CSV timestamp
-        """
-        # Load pressure and timestamp data
-        pressure_df = None
-        timestamps_df = None
-        
-        if pressure_csv_path and timestamps_csv_path:
-            pressure_df, timestamps_df = self.load_and_sync_pressure_data(
-                pressure_csv_path, timestamps_csv_path
-            )
+            **event_options: Diteruskan ke process_video_with_diameter
+                (progress_callback, event_log_path, event_stream, report_path)
         
-        # Process video normally first
-        self.process_video_with_diameter(video_path, output_path, plot_path, csv_path)
-          # If pressure data available, create enhanced analysis
-        if pressure_df is not None:
-            try:
-                self.create_enhanced_analysis_with_pressure(
-                    csv_path, pressure_df, timestamps_df, plot_path
-                )
-            except Exception as e:
-                print(f"Warning: Could not create enhanced pressure analysis: {str(e)}")
-    
-    def create_enhanced_analysis_with_pressure(self, diameter_csv_path, pressure_df, timestamps_df, base_plot_path):
+        Returns:
+            dict: Path output yang ditulis (lihat process_video_with_diameter)
         """
-        Buat analisis enhanced dengan data tekanan
+        # Older runs wrote a separate *_with_pressure.csv; remove it so viewers don't pick stale data
+        legacy_csv_path = csv_path.replace('.csv', '_with_pressure.csv')
+        if os.path.exists(legacy_csv_path):
+            os.remove(legacy_csv_path)
         
-        Args:
-            diameter_csv_path (str): Path ke file CSV diameter yang sudah dibuat
-            pressure_df (DataFrame): Data tekanan
-            timestamps_df (DataFrame): Data timestamp
-            base_plot_path (str): Base path untuk plot
-        """
-        try:
-            # Load diameter data
-            diameter_df = pd.read_csv(diameter_csv_path)
-            print(f"Loaded diameter data for pressure integration: {len(diameter_df)} frames")
-            print(f"Diameter CSV columns: {list(diameter_df.columns)}")
-            
-            # Prepare data for synchronization
-            if timestamps_df is not None and pressure_df is not None:
-                # Convert timestamps to consistent format
-                if 'timestamp' in timestamps_df.columns and 'timestamp' in pressure_df.columns:
-                    # Simple approach: interpolate pressure to match frame numbers
-                    frame_count = len(diameter_df)
-                    pressure_count = len(pressure_df)
-                    
-                    # Create interpolation function
-                    pressure_indices = np.linspace(0, pressure_count-1, pressure_count)
-                    frame_indices = np.linspace(0, pressure_count-1, frame_count)
-                    
-                    if len(pressure_df['pressure']) > 1:
-                        pressure_interpolator = interp1d(
-                            pressure_indices, 
-                            pressure_df['pressure'], 
-                            kind='linear', 
-                            bounds_error=False, 
-                            fill_value='extrapolate'
-                        )
-                        
-                        # Interpolate pressure for each frame
-                        interpolated_pressure = pressure_interpolator(frame_indices)
-                        
-                        # Add pressure to diameter data (preserving existing columns including timestamp)
-                        diameter_df['pressure'] = interpolated_pressure
-                        
-                        # Save enhanced CSV with all columns preserved
-                        enhanced_csv_path = diameter_csv_path.replace('.csv', '_with_pressure.csv')
-                        diameter_df.to_csv(enhanced_csv_path, index=False)
-                        
-                        print(f"Enhanced CSV with pressure saved: {enhanced_csv_path}")
-                        print(f"Enhanced CSV columns: {list(diameter_df.columns)}")
-                        
-                        # Verify timestamp preservation
-                        if 'Timestamp' in diameter_df.columns:
-                            valid_timestamps = diameter_df['Timestamp'].notna().sum()
-                            print(f"Timestamps preserved: {valid_timestamps}/{len(diameter_df)} frames")
-                        
-                        # Create dual-axis plot
-                        self.create_diameter_pressure_plot(diameter_df, base_plot_path)
-                        
-                    else:
-                        print("Insufficient pressure data for interpolation")
-                else:
-                    print("Missing timestamp columns for synchronization")
-            else:
-                print("Pressure or timestamp data not available for synchronization")
-                
-        except Exception as e:
-            print(f"Error in enhanced pressure analysis: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        return self.process_video_with_diameter(video_path, output_path, plot_path, csv_path,
+                                                pressure_csv_path=pressure_csv_path,
+                                                timestamps_csv_path=timestamps_csv_path,
+                                                **event_options)
 
     def create_diameter_pressure_plot(self, combined_df, base_plot_path):
         """
@@ -727,7 +1443,11 @@ class VideoProcessor:
         Args:
             combined_df (DataFrame): Data gabungan diameter dan tekanan
             base_plot_path (str): Base path untuk plot
+            
+        Returns:
+            dict: Path plot yang berhasil disimpan (plot_with_pressure, correlation_plot)
         """
+        written = {}
         try:
             # Create figure with dual y-axis
             fig, ax1 = plt.subplots(figsize=(15, 8))
@@ -782,16 +1502,23 @@ Correlation: {combined_df[diameter_col].corr(combined_df['pressure']):.3f}'''
             plt.savefig(enhanced_plot_path, dpi=300, bbox_inches='tight')
             plt.close()
             print(f"Enhanced plot with pressure saved: {enhanced_plot_path}")
+            written["plot_with_pressure"] = enhanced_plot_path
             
             # Create correlation analysis
-            self.create_correlation_analysis(combined_df, diameter_col, base_plot_path)
+            correlation_plot_path = self.create_correlation_analysis(combined_df, diameter_col, base_plot_path)
+            if correlation_plot_path is not None:
+                written["correlation_plot"] = correlation_plot_path
             
         except Exception as e:
             print(f"Error creating diameter-pressure plot: {str(e)}")
+        return written
 
     def create_correlation_analysis(self, combined_df, diameter_col, base_plot_path):
         """
         Buat analisis korelasi diameter-tekanan
+        
+        Returns:
+            str: Path plot (None jika gagal)
         """
         try:
             fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
@@ -830,9 +1557,11 @@ Correlation: {combined_df[diameter_col].corr(combined_df['pressure']):.3f}'''
             plt.savefig(correlation_plot_path, dpi=300, bbox_inches='tight')
             plt.close()
             print(f"Correlation analysis saved: {correlation_plot_path}")
+            return correlation_plot_path
             
         except Exception as e:
             print(f"Error creating correlation analysis: {str(e)}")
+            return None
 
 def process_all_subjects():
     """
@@ -867,20 +1596,54 @@ def process_all_subjects():
         else:
             print(f"Video file not found for Subject {subject_num}: {video_path}")
 
-def process_selected_subject(subject_name):
+def build_subject_paths(subject_name, output_dir="inference_results"):
+    """
+    Susun path input dan output standar untuk satu subjek di data_uji
+    
+    Args:
+        subject_name (str): Nama subjek (misal: "Subjek1")
+        output_dir (str): Folder root untuk hasil inference
+    
+    Returns:
+        dict: Path video, pressure, timestamps dan file output
+    """
+    subject_dir = os.path.join("data_uji", subject_name)
+    subject_output_dir = os.path.join(output_dir, subject_name)
+    
+    return {
+        "video": os.path.join(subject_dir, f"{subject_name}.mp4"),
+        "pressure": os.path.join(subject_dir, f"subject{subject_name[-1]}.csv"),
+        "timestamps": os.path.join(subject_dir, "timestamps.csv"),
+        "directory": subject_output_dir,
+        "output_video": os.path.join(subject_output_dir, f"{subject_name}_segmented_video.mp4"),
+        "mask_video": os.path.join(subject_output_dir, f"{subject_name}_mask.mkv"),
+        "mask_images": os.path.join(subject_output_dir, f"{subject_name}_masks"),
+        "plot": os.path.join(subject_output_dir, f"{subject_name}_diameter_plot.png"),
+        "csv": os.path.join(subject_output_dir, f"{subject_name}_diameter_data.csv")
+    }
+
+def process_selected_subject(subject_name, model_path="UNet_25Mei_Sore.pth", use_pressure=False, processor=None,
+                             progress_callback=None, event_stream=None, profile=False, output_options=None):
     """
     Process video inference untuk subjek tertentu
     
     Args:
         subject_name (str): Nama subjek (misal: "Subjek1")
+        model_path (str): Path ke model, dipakai jika processor tidak diberikan
+        use_pressure (bool): Gunakan integrasi data tekanan jika tersedia
+        processor (VideoProcessor): Processor yang sudah ter-load (optional),
+            misalnya dari inference service agar model tidak di-load ulang
+        progress_callback (callable): Dipanggil dengan event progress per frame (optional)
+        event_stream: File-like untuk menulis event JSON lines (optional)
+        profile (bool): Simpan cProfile dump run ini (*.prof di sebelah CSV)
+        output_options (dict): Override DEFAULT_OUTPUT_OPTIONS: overlay, overlay_scale,
+            overlay_frame_step dan mask_output ("video"/"images")
     
     Returns:
         dict: Status dan path hasil processing
     """
-    model_path = "UNet_25Mei_Sore.pth"
-    
     # Check if model exists
-    if not os.path.exists(model_path):
+    if processor is None and not os.path.exists(model_path):
         return {
             "status": "error",
             "message": f"Model file not found: {model_path}",
@@ -888,48 +1651,101 @@ def process_selected_subject(subject_name):
         }
     
     try:
-        processor = VideoProcessor(model_path)
-        
-        # Create output directory
-        output_dir = "inference_results"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            print(f"Created output directory: {output_dir}")
+        paths = build_subject_paths(subject_name)
         
         # Check if subject video exists
-        video_path = f"data_uji\\{subject_name}\\{subject_name}.mp4"
+        video_path = paths["video"]
         if not os.path.exists(video_path):
             return {
                 "status": "error", 
                 "message": f"Video file not found: {video_path}",
                 "output_paths": {}
             }
+        
+        if processor is None:
+            processor = VideoProcessor(model_path)
+        
         # Create subject-specific output directory
-        subject_output_dir = os.path.join(output_dir, subject_name)
+        subject_output_dir = paths["directory"]
         if not os.path.exists(subject_output_dir):
             os.makedirs(subject_output_dir)
+            print(f"Created output directory: {subject_output_dir}")
         
-        output_path = os.path.join(subject_output_dir, f"{subject_name}_segmented_video.mp4")
-        plot_path = os.path.join(subject_output_dir, f"{subject_name}_diameter_plot.png")
-        csv_path = os.path.join(subject_output_dir, f"{subject_name}_diameter_data.csv")
+        output_path = paths["output_video"]
+        plot_path = paths["plot"]
+        csv_path = paths["csv"]
         
-        print(f"Processing {subject_name}...")
-        processor.process_video_with_diameter(
-            video_path=video_path,
-            output_path=output_path,
-            plot_path=plot_path,
-            csv_path=csv_path
-        )
+        event_log_path = os.path.splitext(csv_path)[0] + "_events.jsonl"
+        report_path = os.path.splitext(csv_path)[0] + "_report.json"
+        profile_path = os.path.splitext(csv_path)[0] + ".prof"
+        event_options = {
+            "progress_callback": progress_callback,
+            "event_log_path": event_log_path,
+            "event_stream": event_stream,
+            "report_path": report_path
+        }
+        
+        options = dict(DEFAULT_OUTPUT_OPTIONS)
+        options.update(output_options or {})
+        if options["mask_output"] and options["mask_output"] not in MASK_OUTPUT_MODES:
+            raise ValueError(f"Unknown mask output mode: {options['mask_output']}")
+        mask_path = paths["mask_video"] if options["mask_output"] == "video" else paths["mask_images"]
+        event_options.update(options, mask_path=mask_path)
+        
+        profiler = cProfile.Profile() if profile else None
+        if profiler:
+            profiler.enable()
+        try:
+            print(f"Processing {subject_name}...")
+            has_pressure = os.path.exists(paths["pressure"]) and os.path.exists(paths["timestamps"])
+            if use_pressure and has_pressure:
+                print("Found pressure and timestamp data - using enhanced processing...")
+                written = processor.process_video_with_pressure_integration(
+                    video_path=video_path,
+                    output_path=output_path,
+                    plot_path=plot_path,
+                    csv_path=csv_path,
+                    pressure_csv_path=paths["pressure"],
+                    timestamps_csv_path=paths["timestamps"],
+                    **event_options
+                )
+            else:
+                if use_pressure:
+                    print("Enhanced processing requested but pressure/timestamp data not found - using standard processing...")
+                written = processor.process_video_with_diameter(
+                    video_path=video_path,
+                    output_path=output_path,
+                    plot_path=plot_path,
+                    csv_path=csv_path,
+                    **event_options
+                )
+        finally:
+            # Profile is stopped and dumped even when processing fails
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+                print(f"cProfile dump saved to: {profile_path}")
+                pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(15)
+        
+        output_paths = {
+            "plot": plot_path,
+            "csv": csv_path,
+            "events": event_log_path,
+            "report": report_path,
+            "directory": subject_output_dir
+        }
+        if profiler:
+            output_paths["profile"] = profile_path
+        # Video, mask (video or PNG fallback), two-tier summary and pressure plots as written by
+        # this run - files left over from an earlier run are not reported
+        for key in ("video", "mask", "two_tier", "plot_with_pressure", "correlation_plot"):
+            if key in written:
+                output_paths[key] = written[key]
         
         return {
             "status": "success",
             "message": f"Processing completed for {subject_name}",
-            "output_paths": {
-                "video": output_path,
-                "plot": plot_path,
-                "csv": csv_path,
-                "directory": subject_output_dir
-            }
+            "output_paths": output_paths
         }
         
     except Exception as e:
@@ -997,97 +1813,103 @@ def main():
                        help='Use enhanced processing with pressure integration when available')
     parser.add_argument('--subject', type=str, default='Subjek1',
                        help='Subject name to process (default: Subjek1)')
+    parser.add_argument('--events', type=str, default=None,
+                       help='Write JSON-lines progress events to this file, or "-" for stdout '
+                            '(console messages then go to stderr)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Save a cProfile dump of the run next to the CSV (*.prof)')
+    parser.add_argument('--no_overlay', action='store_true',
+                       help='Do not write the overlay video')
+    parser.add_argument('--overlay_scale', type=float, default=1.0,
+                       help='Overlay video resolution scale, e.g. 0.5 (default: 1.0)')
+    parser.add_argument('--overlay_frame_step', type=int, default=1,
+                       help='Write every N-th frame to the overlay video (default: 1)')
+    parser.add_argument('--mask_output', choices=MASK_OUTPUT_MODES, default=None,
+                       help='Also write lossless masks: FFV1 video or PNG image sequence')
+    parser.add_argument('--coarse_size', type=int, default=None,
+                       help='Two-tier inference: run every frame at this size (e.g. 256) and refine '
+                            'low-confidence frames at 512')
+    parser.add_argument('--refine_threshold', type=float, default=DEFAULT_REFINE_THRESHOLD,
+                       help=f'Boundary confidence below which a frame is refined (default: {DEFAULT_REFINE_THRESHOLD})')
     args = parser.parse_args()
     
-    # Example usage - process one subject
-    model_path = "UNet_25Mei_Sore.pth"
-    
-    # Check if model exists
-    if not os.path.exists(model_path):
-        print(f"Model file not found: {model_path}")
-        print("Please ensure you have trained the model using training_model.py first.")
-        return
-    
-    processor = VideoProcessor(model_path)
-    
-    # Create output directory
-    output_dir = "inference_results"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Created output directory: {output_dir}")
+    original_stdout = sys.stdout
+    owns_stream = False
+    if args.events == '-':
+        # stdout becomes a clean machine-readable event pipe
+        event_stream = sys.stdout
+        sys.stdout = sys.stderr
+    elif args.events:
+        event_stream = open(args.events, 'w', encoding='utf-8')
+        owns_stream = True
+    else:
+        event_stream = None
     
-    # Process specified subject
-    subject_name = args.subject
-    video_path = f"data_uji\\{subject_name}\\{subject_name}.mp4"
+    try:
+        # Example usage - process one subject
+        model_path = "UNet_25Mei_Sore.pth"
     
-    # Create subject-specific output directory
-    subject_output_dir = os.path.join(output_dir, subject_name)
-    if not os.path.exists(subject_output_dir):
-        os.makedirs(subject_output_dir)
+        # Check if model exists
+        if not os.path.exists(model_path):
+            print(f"Model file not found: {model_path}")
+            print("Please ensure you have trained the model using training_model.py first.")
+            return
     
-    output_path = os.path.join(subject_output_dir, f"{subject_name}_segmented_video.mp4")
-    plot_path = os.path.join(subject_output_dir, f"{subject_name}_diameter_plot.png")
-    csv_path = os.path.join(subject_output_dir, f"{subject_name}_diameter_data.csv")
+        # Process specified subject
+        subject_name = args.subject
+        paths = build_subject_paths(subject_name)
     
-    if os.path.exists(video_path):
-        print(f"Processing {subject_name}...")
-        
-        # Check for pressure and timestamp files
-        pressure_csv_path = f"data_uji\\{subject_name}\\subject{subject_name[-1]}.csv"
-        timestamps_csv_path = f"data_uji\\{subject_name}\\timestamps.csv"
-        
-        # Use enhanced processing with pressure integration if requested and available
-        if args.use_pressure and os.path.exists(pressure_csv_path) and os.path.exists(timestamps_csv_path):
-            print("Found pressure and timestamp data - using enhanced processing...")
-            processor.process_video_with_pressure_integration(
-                video_path=video_path,
-                output_path=output_path,
-                plot_path=plot_path,
-                csv_path=csv_path,
-                pressure_csv_path=pressure_csv_path,
-                timestamps_csv_path=timestamps_csv_path
-            )
+        if os.path.exists(paths["video"]):
+            processor = VideoProcessor(model_path, coarse_size=args.coarse_size,
+                                       refine_threshold=args.refine_threshold)
+            result = process_selected_subject(subject_name, use_pressure=args.use_pressure,
+                                              processor=processor, event_stream=event_stream,
+                                              profile=args.profile,
+                                              output_options={
+                                                  "overlay": not args.no_overlay,
+                                                  "overlay_scale": args.overlay_scale,
+                                                  "overlay_frame_step": args.overlay_frame_step,
+                                                  "mask_output": args.mask_output
+                                              })
+        
+            if result["status"] != "success":
+                print(f"[ERROR] {result['message']}")
+                return
+        
+            output_paths = result["output_paths"]
+            print(f"[SUCCESS] Processing completed!")
+            if "video" in output_paths:
+                print(f"Output video: {output_paths['video']}")
+            if "mask" in output_paths:
+                print(f"Mask output: {output_paths['mask']}")
+            print(f"Plot saved: {output_paths['plot']}")
+            print(f"CSV data: {output_paths['csv']}")
+            print(f"Run report: {output_paths['report']}")
+            if "profile" in output_paths:
+                print(f"cProfile dump: {output_paths['profile']} (view with: python -m pstats {output_paths['profile']})")
+        
+            # Check for enhanced outputs
+            if "plot_with_pressure" in output_paths:
+                print(f"Enhanced plot with pressure: {output_paths['plot_with_pressure']}")
+            if "correlation_plot" in output_paths:
+                print(f"Correlation analysis: {output_paths['correlation_plot']}")
         else:
-            if args.use_pressure:
-                print("Enhanced processing requested but pressure/timestamp data not found - using standard processing...")
+            print(f"Video file not found: {paths['video']}")
+            print("Available subjects in data_uji:")
+            if os.path.exists("data_uji"):
+                subjects = [d for d in os.listdir("data_uji") if os.path.isdir(os.path.join("data_uji", d))]
+                for subj in subjects:
+                    subj_path = os.path.join("data_uji", subj)
+                    videos = [f for f in os.listdir(subj_path) if f.endswith('.mp4')]
+                    print(f"  - {subj}: {videos}")
             else:
-                print("Using standard processing...")
-            processor.process_video_with_diameter(
-                video_path=video_path,
-                output_path=output_path,
-                plot_path=plot_path,
-                csv_path=csv_path
-            )
-            
-        print(f"[SUCCESS] Processing completed!")
-        print(f"Output video: {output_path}")
-        print(f"Plot saved: {plot_path}")
-        print(f"CSV data: {csv_path}")
-        
-        # Check for enhanced outputs
-        enhanced_csv = csv_path.replace('.csv', '_with_pressure.csv')
-        enhanced_plot = plot_path.replace('.png', '_with_pressure.png')
-        correlation_plot = plot_path.replace('.png', '_correlation_analysis.png');
-        
-        if os.path.exists(enhanced_csv):
-            print(f"Enhanced CSV with pressure: {enhanced_csv}")
-        if os.path.exists(enhanced_plot):
-            print(f"Enhanced plot with pressure: {enhanced_plot}")
-        if os.path.exists(correlation_plot):
-            print(f"Correlation analysis: {correlation_plot}")
-    else:
-        print(f"Video file not found: {video_path}")
-        print("Available subjects in data_uji:")
-        if os.path.exists("data_uji"):
-            subjects = [d for d in os.listdir("data_uji") if os.path.isdir(os.path.join("data_uji", d))]
-            for subj in subjects:
-                subj_path = os.path.join("data_uji", subj)
-                videos = [f for f in os.listdir(subj_path) if f.endswith('.mp4')]
-                print(f"  - {subj}: {videos}")
-        else:
-            print("  data_uji directory not found!")
+                print("  data_uji directory not found!")
             
-    print("\\nTo process all subjects, uncomment the process_all_subjects() call.")
+        print("\\nTo process all subjects, uncomment the process_all_subjects() call.")
+    finally:
+        sys.stdout = original_stdout
+        if owns_stream:
+            event_stream.close()
     
     # Uncomment to process all subjects
     # process_all_subjects()